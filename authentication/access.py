@@ -0,0 +1,202 @@
+import time
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth import SESSION_KEY
+from django.contrib.auth.signals import user_logged_in
+from django.contrib.auth.views import redirect_to_login
+from django.core.cache import cache
+from django.http import JsonResponse
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.shortcuts import redirect
+
+from main.metrics import Metrics
+from .models import UserProfile
+
+
+ACCESS_SESSION_KEY = '_access_state'
+
+
+def _version_key(user_id):
+    return f'access-state:{user_id}'
+
+
+def get_access_state(request):
+    """Role and disclaimer status for the session's user, or None if logged out
+
+    With a cache shared by all workers this is resolved from the session
+    without touching the user or profile tables. The cached copy is
+    reloaded when a profile signal bumps the user's version in the cache,
+    or after ACCESS_STATE_TTL seconds. The TTL defaults to 0 unless workers
+    share a cache backend, since a per-process cache only sees the bumps
+    made by its own worker; the state is then read from ``request.user``,
+    whose profile ProfileModelBackend already joined in.
+    """
+    if hasattr(request, '_access_state'):
+        return request._access_state
+
+    state = None
+    user_id = request.session.get(SESSION_KEY)
+    if user_id is not None:
+        user_id = str(user_id)
+        ttl = getattr(settings, 'ACCESS_STATE_TTL', 0)
+        if ttl <= 0:
+            state = _state_from_user(request, user_id)
+        else:
+            cached = request.session.get(ACCESS_SESSION_KEY)
+            fresh = (cached and cached['user_id'] == user_id
+                     and time.time() - cached['loaded_at'] < ttl)
+
+            # A worker that has never seen this user adopts the session's version
+            # rather than minting its own
+            version = _current_version(user_id, cached['version'] if fresh else None)
+
+            hit = fresh and cached['version'] == version
+            Metrics().cache_lookup('access_state', hit)
+            if hit:
+                state = cached
+            else:
+                state = _store_state(request, user_id, _load_profile(user_id), version)
+
+    request._access_state = state
+    return state
+
+
+def _current_version(user_id, default=None):
+    cache.add(_version_key(user_id), default or uuid.uuid4().hex, None)
+    return cache.get(_version_key(user_id))
+
+
+def _state_from_user(request, user_id):
+    user = getattr(request, 'user', None)
+    if user is None:
+        # AuthenticationMiddleware isn't installed
+        return _state(user_id, _load_profile(user_id), None)
+    if not user.is_authenticated:
+        return None
+    try:
+        profile = {'role': user.profile.role, 'disclaimer_accepted': user.profile.disclaimer_accepted}
+    except UserProfile.DoesNotExist:
+        profile = None
+    return _state(user_id, profile, None)
+
+
+def _load_profile(user_id):
+    return UserProfile.objects.filter(user_id=user_id).values('role', 'disclaimer_accepted').first()
+
+
+def _state(user_id, profile, version):
+    return {
+        'user_id': user_id,
+        'role': profile['role'] if profile else None,
+        'disclaimer_accepted': profile['disclaimer_accepted'] if profile else False,
+        'version': version,
+        'loaded_at': time.time(),
+    }
+
+
+def _store_state(request, user_id, profile, version):
+    state = request.session[ACCESS_SESSION_KEY] = _state(user_id, profile, version)
+    return state
+
+
+def check_access(request, policy):
+    """Return a redirect (or JSON error) response if the request fails ``policy``, else None"""
+    request._access_checked = True
+    state = get_access_state(request)
+
+    if state is None:
+        return _deny(request, policy, 401) or redirect_to_login(request.get_full_path())
+
+    if policy['roles'] and state['role'] not in policy['roles']:
+        return _deny(request, policy, 403) or _redirect_with_message(request, policy)
+
+    if policy['require_disclaimer'] and not state['disclaimer_accepted']:
+        return _deny(request, policy, 403, 'Disclaimer not accepted') or redirect('accept_disclaimer')
+
+    return None
+
+
+def _deny(request, policy, status, error=None):
+    """JSON error for API views; None for pages, which redirect instead"""
+    if not policy['json']:
+        return None
+    return JsonResponse({'error': error or ('Login required' if status == 401 else policy['message'])}, status=status)
+
+
+def _redirect_with_message(request, policy):
+    messages.error(request, policy['message'])
+    return redirect(policy['redirect_to'])
+
+
+def role_required(*roles, message='Access denied.', redirect_to='drug_home', require_disclaimer=True, json=False):
+    """Restrict a view to logged-in users with one of ``roles``
+
+    Replaces login_required on the view. AccessPolicyMiddleware enforces the
+    policy before the view runs; the wrapper enforces it as well when the
+    middleware isn't installed. With ``json=True`` a denied request gets a
+    401/403 JSON error instead of a redirect.
+    """
+    policy = {
+        'roles': set(roles),
+        'message': message,
+        'redirect_to': redirect_to,
+        'require_disclaimer': require_disclaimer,
+        'json': json,
+    }
+
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapped(request, *args, **kwargs):
+            if not getattr(request, '_access_checked', False):
+                denied = check_access(request, policy)
+                if denied is not None:
+                    return denied
+            # Session looked valid; make sure it still authenticates
+            if not request.user.is_authenticated:
+                return _deny(request, policy, 401) or redirect_to_login(request.get_full_path())
+            return view_func(request, *args, **kwargs)
+
+        wrapped.access_policy = policy
+        return wrapped
+
+    return decorator
+
+
+class AccessPolicyMiddleware:
+    """Short-circuit requests to policy-decorated views before the view runs"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        policy = getattr(view_func, 'access_policy', None)
+        if policy is None:
+            return None
+        return check_access(request, policy)
+
+
+@receiver(user_logged_in)
+def seed_access_state(sender, request, user, **kwargs):
+    """Cache the state at login, where the profile is usually already loaded"""
+    if request is None or not hasattr(request, 'session'):
+        return
+    try:
+        profile = {'role': user.profile.role, 'disclaimer_accepted': user.profile.disclaimer_accepted}
+    except UserProfile.DoesNotExist:
+        profile = None
+    user_id = str(user.pk)
+    request._access_state = _store_state(request, user_id, profile, _current_version(user_id))
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_access_state(sender, instance, **kwargs):
+    """Force sessions of this user to reload their role/disclaimer state"""
+    cache.set(_version_key(str(instance.user_id)), uuid.uuid4().hex, None)
@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import UserProfile, CaregiverPatientRelationship, SymptomRecord
+from .models import (
+    UserProfile, CaregiverPatientRelationship, SymptomRecord, PatientSymptomSummary,
+    SymptomDailyRollup, OutboundEmail
+)
 
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
@@ -19,15 +22,13 @@ class CaregiverPatientRelationshipAdmin(admin.ModelAdmin):
     actions = ['approve_relationships', 'reject_relationships']
     
     def approve_relationships(self, request, queryset):
-        for relationship in queryset:
-            relationship.approve()
-        self.message_user(request, f'{queryset.count()} relationships approved.')
+        updated = queryset.approve()
+        self.message_user(request, f'{updated} relationships approved.')
     approve_relationships.short_description = 'Approve selected relationships'
     
     def reject_relationships(self, request, queryset):
-        for relationship in queryset:
-            relationship.reject()
-        self.message_user(request, f'{queryset.count()} relationships rejected.')
+        updated = queryset.reject()
+        self.message_user(request, f'{updated} relationships rejected.')
     reject_relationships.short_description = 'Reject selected relationships'
 
 
@@ -40,3 +41,30 @@ class SymptomRecordAdmin(admin.ModelAdmin):
     ordering = ('-recorded_at',)
     readonly_fields = ('recorded_at', 'is_concerning')
 
+
+@admin.register(PatientSymptomSummary)
+class PatientSymptomSummaryAdmin(admin.ModelAdmin):
+    list_display = ('patient', 'total_count', 'concerning_count', 'max_severity', 'last_recorded_at', 'updated_at')
+    search_fields = ('patient__username',)
+    ordering = ('-last_recorded_at',)
+    readonly_fields = ('total_count', 'concerning_count', 'max_severity', 'daily_counts',
+                       'type_counts', 'last_recorded_at', 'updated_at')
+
+
+@admin.register(SymptomDailyRollup)
+class SymptomDailyRollupAdmin(admin.ModelAdmin):
+    list_display = ('patient', 'day', 'symptom_type', 'count', 'concerning_count', 'max_severity')
+    list_filter = ('symptom_type', 'day')
+    search_fields = ('patient__username',)
+    ordering = ('-day',)
+    readonly_fields = ('count', 'concerning_count', 'severity_sum', 'max_severity')
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'recipient', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('recipient', 'subject')
+    date_hierarchy = 'created_at'
+    ordering = ('-created_at',)
+    readonly_fields = ('created_at', 'sent_at', 'attempts', 'last_error')
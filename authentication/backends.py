@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+
+# Backends that earlier sessions may have been logged in through
+LEGACY_BACKENDS = ('django.contrib.auth.backends.ModelBackend',)
+
+
+class ProfileModelBackend(ModelBackend):
+    """ModelBackend that loads the UserProfile together with the user
+
+    ``request.user`` is resolved through ``get_user`` on every request, so
+    joining the profile here means ``request.user.profile.role`` and the
+    disclaimer checks cost no extra query. Login goes through the inherited
+    ``authenticate``.
+    """
+
+    def get_user(self, user_id):
+        UserModel = get_user_model()
+        try:
+            user = UserModel._default_manager.select_related('profile').get(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
+
+
+class SessionBackendMiddleware:
+    """Move sessions logged in through a legacy backend onto the current one
+
+    Keeps those sessions valid without listing the legacy backend in
+    AUTHENTICATION_BACKENDS, where it would repeat every failed login's
+    lookup and password hash. Must run before AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.session.get(BACKEND_SESSION_KEY) in LEGACY_BACKENDS:
+            request.session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        return self.get_response(request)
@@ -0,0 +1,241 @@
+import csv
+import json
+import time
+from itertools import islice
+from pathlib import Path
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from authentication.models import (
+    UserProfile, CaregiverPatientRelationship, SymptomRecord, PatientSymptomSummary
+)
+
+
+def read_rows(path):
+    """Stream dict rows from a .csv or .ndjson/.jsonl file
+
+    A malformed NDJSON line is yielded as None so the caller can count it
+    as skipped and carry on with the rest of the file.
+    """
+    path = Path(path)
+    if not path.exists():
+        raise CommandError(f'File not found: {path}')
+
+    with path.open(newline='', encoding='utf-8') as f:
+        if path.suffix.lower() == '.csv':
+            yield from csv.DictReader(f)
+        elif path.suffix.lower() in ('.ndjson', '.jsonl'):
+            for line in f:
+                if line.strip():
+                    try:
+                        row = json.loads(line)
+                    except json.JSONDecodeError:
+                        row = None
+                    yield row if isinstance(row, dict) else None
+        else:
+            raise CommandError(f'Unsupported file type (use .csv or .ndjson): {path}')
+
+
+def batched(rows, size):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def parse_timestamp(value):
+    """Parse an ISO timestamp, treating naive values as the current timezone
+
+    Returns None for a blank value and raises ValueError for one that isn't
+    a valid timestamp.
+    """
+    if not value:
+        return None
+    parsed = parse_datetime(str(value))
+    if parsed is None:
+        raise ValueError(f'Invalid timestamp: {value!r}')
+    if parsed is not None and timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def parse_bool(value):
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'y')
+
+
+class Command(BaseCommand):
+    help = (
+        'Import a partner clinic: users, caregiver-patient relationships and symptom history '
+        'from CSV or NDJSON files, streamed in batches of bulk_create inserts.\n\n'
+        'users: username, email, role (patient|caregiver), [phone_number], [disclaimer_accepted]\n'
+        'relationships: caregiver, patient, [status], [request_message], [approved_date]\n'
+        'symptoms: patient, symptom_type, severity, [notes], [recorded_at]\n\n'
+        'Imported accounts get unusable passwords.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', help='Users file (.csv/.ndjson)')
+        parser.add_argument('--relationships', help='Relationships file (.csv/.ndjson)')
+        parser.add_argument('--symptoms', help='Symptom history file (.csv/.ndjson)')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per transaction')
+
+    def handle(self, *args, **options):
+        if not any(options[k] for k in ('users', 'relationships', 'symptoms')):
+            raise CommandError('Nothing to import: pass --users, --relationships and/or --symptoms')
+
+        self.batch_size = options['batch_size']
+        start = time.time()
+        if options['users']:
+            self.import_users(options['users'])
+        if options['relationships']:
+            self.import_relationships(options['relationships'])
+        if options['symptoms']:
+            self.import_symptoms(options['symptoms'])
+        self.stdout.write(self.style.SUCCESS(f'✅ Import finished in {time.time() - start:.1f}s'))
+
+    def resolve_users(self, usernames):
+        """Map usernames to ids with one query per batch"""
+        return dict(User.objects.filter(username__in=set(usernames)).values_list('username', 'id'))
+
+    def import_users(self, path):
+        roles = {role for role, _ in UserProfile.ROLE_CHOICES}
+        # Hashing is the expensive part of make_password; one unusable hash is shared
+        unusable_password = make_password(None)
+        created = skipped = 0
+
+        for batch in batched(read_rows(path), self.batch_size):
+            # First row wins when a username repeats within the batch
+            rows = {}
+            for row in batch:
+                if row and row.get('username') and row.get('role') in roles:
+                    rows.setdefault(row['username'], row)
+            rows = list(rows.values())
+            skipped += len(batch) - len(rows)
+
+            with transaction.atomic():
+                existing = self.resolve_users(row['username'] for row in rows)
+                new_rows = [row for row in rows if row['username'] not in existing]
+                User.objects.bulk_create([
+                    User(username=row['username'], email=row.get('email') or '', password=unusable_password)
+                    for row in new_rows
+                ], ignore_conflicts=True)
+
+                ids = self.resolve_users(row['username'] for row in new_rows)
+                UserProfile.objects.bulk_create([
+                    UserProfile(
+                        user_id=ids[row['username']],
+                        role=row['role'],
+                        phone_number=row.get('phone_number') or '',
+                        disclaimer_accepted=parse_bool(row.get('disclaimer_accepted', '')),
+                    )
+                    for row in new_rows if row['username'] in ids
+                ], ignore_conflicts=True)
+
+            created += len(new_rows)
+            skipped += len(rows) - len(new_rows)
+
+        self.stdout.write(f'👤 Users: {created:,} created, {skipped:,} skipped')
+
+    def import_relationships(self, path):
+        statuses = {status for status, _ in CaregiverPatientRelationship.STATUS_CHOICES}
+        created = skipped = 0
+
+        for batch in batched(read_rows(path), self.batch_size):
+            ids = self.resolve_users(
+                name for row in batch if row for name in (row.get('caregiver'), row.get('patient'))
+            )
+            existing = set(CaregiverPatientRelationship.objects.filter(
+                caregiver_id__in=ids.values(), patient_id__in=ids.values()
+            ).values_list('caregiver_id', 'patient_id'))
+            now = timezone.now()
+            relationships = []
+            for row in batch:
+                status = (row.get('status') or 'active') if row else None
+                if not row or row.get('caregiver') not in ids or row.get('patient') not in ids or status not in statuses:
+                    skipped += 1
+                    continue
+                try:
+                    approved_date = parse_timestamp(row.get('approved_date'))
+                except ValueError:
+                    skipped += 1
+                    continue
+                pair = (ids[row['caregiver']], ids[row['patient']])
+                if pair in existing:
+                    skipped += 1
+                    continue
+                existing.add(pair)
+                relationships.append(CaregiverPatientRelationship(
+                    caregiver_id=ids[row['caregiver']],
+                    patient_id=ids[row['patient']],
+                    status=status,
+                    request_message=row.get('request_message') or '',
+                    approved_date=approved_date or (now if status == 'active' else None),
+                ))
+
+            with transaction.atomic():
+                CaregiverPatientRelationship.objects.bulk_create(relationships, ignore_conflicts=True)
+            created += len(relationships)
+
+        self.stdout.write(f'🤝 Relationships: {created:,} imported, {skipped:,} skipped')
+
+    def import_symptoms(self, path):
+        symptom_types = {value for value, _ in SymptomRecord.SYMPTOM_CATEGORIES}
+        severities = {value for value, _ in SymptomRecord.SEVERITY_LEVELS}
+        touched_patients = set()
+        created = skipped = 0
+
+        # Earlier batches are committed as they go, so their summaries are
+        # rebuilt even if a later batch fails
+        try:
+            for batch in batched(read_rows(path), self.batch_size):
+                ids = self.resolve_users(row.get('patient') for row in batch if row)
+                now = timezone.now()
+
+                # Validate and coerce the whole batch, then flag concerning rows in one pass
+                patient_ids, types, levels, notes, recorded = [], [], [], [], []
+                for row in batch:
+                    try:
+                        severity = int(row.get('severity'))
+                        recorded_at = parse_timestamp(row.get('recorded_at')) or now
+                    except (AttributeError, TypeError, ValueError):
+                        skipped += 1
+                        continue
+                    if row.get('patient') not in ids or row.get('symptom_type') not in symptom_types or severity not in severities:
+                        skipped += 1
+                        continue
+                    patient_ids.append(ids[row['patient']])
+                    types.append(row['symptom_type'])
+                    levels.append(severity)
+                    notes.append(row.get('notes') or '')
+                    recorded.append(recorded_at)
+
+                flags = [SymptomRecord.concerning(t, s) for t, s in zip(types, levels)]
+
+                with transaction.atomic():
+                    SymptomRecord.objects.bulk_create([
+                        SymptomRecord(
+                            patient_id=patient_id, symptom_type=symptom_type, severity=severity,
+                            notes=note, recorded_at=recorded_at, is_concerning=flag,
+                        )
+                        for patient_id, symptom_type, severity, note, recorded_at, flag
+                        in zip(patient_ids, types, levels, notes, recorded, flags)
+                    ])
+                touched_patients.update(patient_ids)
+                created += len(patient_ids)
+        finally:
+            # bulk_create bypasses SymptomRecord.save, so refresh the rollups once at the end
+            touched = sorted(touched_patients)
+            for offset in range(0, len(touched), 500):
+                PatientSymptomSummary.rebuild_for(touched[offset:offset + 500])
+
+        self.stdout.write(
+            f'📝 Symptoms: {created:,} imported, {skipped:,} skipped, '
+            f'{len(touched):,} patient summaries rebuilt'
+        )
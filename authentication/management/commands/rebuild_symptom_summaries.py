@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from authentication.models import SymptomRecord, PatientSymptomSummary, SymptomDailyRollup
+
+
+class Command(BaseCommand):
+    help = 'Rebuild PatientSymptomSummary and SymptomDailyRollup rows from SymptomRecord in bulk'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Patients per rebuild batch')
+        parser.add_argument('--patient', type=int, action='append', dest='patients',
+                            help='Only rebuild this patient id (repeatable)')
+
+    def handle(self, *args, **options):
+        start = time.time()
+        batch_size = options['batch_size']
+
+        if options['patients']:
+            patient_ids = iter(options['patients'])
+        else:
+            # Summaries for patients whose records are all gone
+            stale, _ = PatientSymptomSummary.objects.filter(patient__symptom_records__isnull=True).delete()
+            stale += SymptomDailyRollup.objects.filter(patient__symptom_records__isnull=True).delete()[0]
+            if stale:
+                self.stdout.write(f'🧹 Removed {stale} empty summary/rollup rows')
+            patient_ids = (
+                SymptomRecord.objects.order_by('patient_id')
+                .values_list('patient_id', flat=True).distinct().iterator(chunk_size=batch_size)
+            )
+
+        rebuilt = 0
+        batch = []
+        for patient_id in patient_ids:
+            batch.append(patient_id)
+            if len(batch) >= batch_size:
+                PatientSymptomSummary.rebuild_for(batch)
+                rebuilt += len(batch)
+                batch = []
+        if batch:
+            PatientSymptomSummary.rebuild_for(batch)
+            rebuilt += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Rebuilt {rebuilt:,} symptom summaries in {time.time() - start:.2f}s'
+        ))
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from authentication.models import OutboundEmail
+
+
+class Command(BaseCommand):
+    help = (
+        'Send queued OutboundEmail messages in batches over a single SMTP connection. '
+        'Runs until the outbox is drained, or forever with --loop.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50, help='Messages per connection')
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new messages')
+        parser.add_argument('--interval', type=float, default=10.0, help='Seconds between polls with --loop')
+
+    def handle(self, *args, **options):
+        total_sent = total_failed = 0
+        while True:
+            sent, failed = OutboundEmail.send_due(options['batch_size'])
+            if sent or failed:
+                total_sent += sent
+                total_failed += failed
+                continue
+
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(f'📧 Outbox: {total_sent} sent, {total_failed} failed')
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0003_rename_request_date_caregiverpatientrelationship_created_at_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PatientSymptomSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_count', models.PositiveIntegerField(default=0)),
+                ('concerning_count', models.PositiveIntegerField(default=0)),
+                ('max_severity', models.PositiveSmallIntegerField(default=0)),
+                ('daily_counts', models.JSONField(blank=True, default=dict, help_text='ISO date -> number of records')),
+                ('type_counts', models.JSONField(blank=True, default=dict, help_text='Symptom type -> number of records')),
+                ('last_recorded_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('patient', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='symptom_summary', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Patient Symptom Summary',
+                'verbose_name_plural': 'Patient Symptom Summaries',
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:33
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0005_outboundemail'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='symptomrecord',
+            name='recorded_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
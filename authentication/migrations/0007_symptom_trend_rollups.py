@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:46
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0006_symptomrecord_recorded_at_default'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SymptomDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('symptom_type', models.CharField(choices=[('depressed_mood', 'Depressed Mood'), ('loss_of_interest', 'Loss of Interest or Pleasure'), ('fatigue', 'Fatigue or Loss of Energy'), ('sleep_disturbance', 'Sleep Disturbance (Insomnia/Hypersomnia)'), ('appetite_change', 'Appetite or Weight Change'), ('concentration_difficulty', 'Difficulty Concentrating'), ('feelings_worthlessness', 'Feelings of Worthlessness or Guilt'), ('psychomotor_agitation', 'Psychomotor Agitation or Retardation'), ('suicidal_thoughts', 'Suicidal Thoughts'), ('excessive_worry', 'Excessive Worry'), ('restlessness', 'Restlessness or Feeling On Edge'), ('irritability', 'Irritability'), ('muscle_tension', 'Muscle Tension'), ('panic_attacks', 'Panic Attacks'), ('social_anxiety', 'Social Anxiety'), ('social_withdrawal', 'Social Withdrawal'), ('self_harm', 'Self-Harm Behavior'), ('substance_use', 'Substance Use'), ('mood_swings', 'Mood Swings'), ('headaches', 'Headaches'), ('body_aches', 'Body Aches'), ('digestive_issues', 'Digestive Issues'), ('other', 'Other')], max_length=50)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('concerning_count', models.PositiveIntegerField(default=0)),
+                ('severity_sum', models.PositiveIntegerField(default=0)),
+                ('max_severity', models.PositiveSmallIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Symptom Daily Rollup',
+                'verbose_name_plural': 'Symptom Daily Rollups',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='symptomrecord',
+            index=models.Index(fields=['patient', 'recorded_at'], name='symptom_patient_recorded_idx'),
+        ),
+        migrations.AddField(
+            model_name='symptomdailyrollup',
+            name='patient',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='symptom_daily_rollups', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterUniqueTogether(
+            name='symptomdailyrollup',
+            unique_together={('patient', 'day', 'symptom_type')},
+        ),
+    ]
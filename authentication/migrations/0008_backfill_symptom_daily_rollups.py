@@ -0,0 +1,58 @@
+from django.db import migrations, models
+from django.db.models.functions import TruncDate
+
+
+BATCH_SIZE = 1000
+
+
+def backfill_rollups(apps, schema_editor):
+    """Group existing SymptomRecord history into SymptomDailyRollup rows
+
+    0007 created the table empty, so trends for history recorded before it
+    were missing. Upserts, so days already touched by new records are
+    recomputed from the full history.
+    """
+    SymptomRecord = apps.get_model('authentication', 'SymptomRecord')
+    SymptomDailyRollup = apps.get_model('authentication', 'SymptomDailyRollup')
+    db = schema_editor.connection.alias
+
+    grouped = SymptomRecord.objects.using(db).order_by().annotate(day=TruncDate('recorded_at')).values(
+        'patient_id', 'day', 'symptom_type'
+    ).annotate(
+        n=models.Count('id'),
+        concerning=models.Count('id', filter=models.Q(is_concerning=True)),
+        severity_sum=models.Sum('severity'),
+        max_severity=models.Max('severity'),
+    )
+
+    def flush(rows):
+        SymptomDailyRollup.objects.using(db).bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['patient', 'day', 'symptom_type'],
+            update_fields=['count', 'concerning_count', 'severity_sum', 'max_severity'],
+        )
+
+    rows = []
+    for row in grouped.iterator(chunk_size=BATCH_SIZE):
+        rows.append(SymptomDailyRollup(
+            patient_id=row['patient_id'], day=row['day'], symptom_type=row['symptom_type'],
+            count=row['n'], concerning_count=row['concerning'],
+            severity_sum=row['severity_sum'], max_severity=row['max_severity'],
+        ))
+        if len(rows) >= BATCH_SIZE:
+            flush(rows)
+            rows = []
+    if rows:
+        flush(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0007_symptom_trend_rollups'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
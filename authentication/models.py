@@ -1,4 +1,9 @@
-from django.db import models
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import models, transaction
+from django.db.models.functions import Greatest, TruncDate
 from django.contrib.auth.models import User
 from django.db.models.signals import post_save
 from django.dispatch import receiver
@@ -30,6 +35,42 @@ class UserProfile(models.Model):
         self.save()
 
 
+class CaregiverPatientRelationshipQuerySet(models.QuerySet):
+    # Target status -> statuses a relationship may move from
+    ALLOWED_TRANSITIONS = {
+        'active': ['pending'],
+        'rejected': ['pending', 'active'],
+        'removed': ['pending', 'active'],
+    }
+    
+    def _transition(self, status, **fields):
+        """Move every eligible row to ``status`` in one UPDATE; returns rows changed"""
+        fields.setdefault('updated_at', timezone.now())
+        return self.filter(
+            status__in=self.ALLOWED_TRANSITIONS[status]
+        ).update(status=status, **fields)
+    
+    def approve(self):
+        """Approve all pending relationships in the queryset"""
+        now = timezone.now()
+        return self._transition('active', approved_date=now, updated_at=now)
+    
+    def reject(self):
+        """Reject pending requests and revoke active relationships"""
+        return self._transition('rejected')
+    
+    def remove(self):
+        """Remove pending or active relationships"""
+        return self._transition('removed')
+    
+    def status_counts(self):
+        """Count relationships per status in a single aggregate query"""
+        return self.aggregate(**{
+            f'{status}_count': models.Count('pk', filter=models.Q(status=status))
+            for status, _ in CaregiverPatientRelationship.STATUS_CHOICES
+        })
+
+
 class CaregiverPatientRelationship(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending Approval'),
@@ -46,6 +87,8 @@ class CaregiverPatientRelationship(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     approved_date = models.DateTimeField(null=True, blank=True)
     
+    objects = CaregiverPatientRelationshipQuerySet.as_manager()
+    
     class Meta:
         unique_together = ('caregiver', 'patient')
         verbose_name = 'Caregiver-Patient Relationship'
@@ -54,21 +97,27 @@ class CaregiverPatientRelationship(models.Model):
     def __str__(self):
         return f"{self.caregiver.username} → {self.patient.username} ({self.status})"
     
+    def _transition(self, status, **fields):
+        """Apply a guarded status change to this row; False if the transition isn't allowed"""
+        fields['updated_at'] = timezone.now()
+        changed = CaregiverPatientRelationship.objects.filter(pk=self.pk)._transition(status, **fields)
+        if changed:
+            self.status = status
+            for name, value in fields.items():
+                setattr(self, name, value)
+        return bool(changed)
+    
     def approve(self):
         """Approve the relationship"""
-        self.status = 'active'
-        self.approved_date = timezone.now()
-        self.save()
+        return self._transition('active', approved_date=timezone.now())
     
     def reject(self):
         """Reject the relationship"""
-        self.status = 'rejected'
-        self.save()
+        return self._transition('rejected')
     
     def remove(self):
         """Remove the relationship"""
-        self.status = 'removed'
-        self.save()
+        return self._transition('removed')
 
 
 class SymptomRecord(models.Model):
@@ -115,11 +164,16 @@ class SymptomRecord(models.Model):
         (4, 'Critical'),
     ]
     
+    # Always concerning regardless of severity
+    CONCERNING_SYMPTOM_TYPES = frozenset(['suicidal_thoughts', 'self_harm', 'panic_attacks'])
+    CONCERNING_SEVERITY = 3
+    
     patient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='symptom_records')
     symptom_type = models.CharField(max_length=50, choices=SYMPTOM_CATEGORIES)
     severity = models.IntegerField(choices=SEVERITY_LEVELS)
     notes = models.TextField(blank=True, help_text="Additional details about the symptom")
-    recorded_at = models.DateTimeField(auto_now_add=True)
+    # default rather than auto_now_add so bulk imports can keep historical timestamps
+    recorded_at = models.DateTimeField(default=timezone.now, editable=False)
     
     # Flag for concerning symptoms that need caregiver notification
     is_concerning = models.BooleanField(default=False)
@@ -127,19 +181,430 @@ class SymptomRecord(models.Model):
     
     class Meta:
         ordering = ['-recorded_at']
+        indexes = [
+            models.Index(fields=['patient', 'recorded_at'], name='symptom_patient_recorded_idx'),
+        ]
         verbose_name = 'Symptom Record'
         verbose_name_plural = 'Symptom Records'
     
     def __str__(self):
         return f"{self.patient.username} - {self.get_symptom_type_display()} ({self.get_severity_display()})"
     
+    @classmethod
+    def concerning(cls, symptom_type, severity):
+        """Critical severity or suicidal thoughts/self-harm are always concerning"""
+        return severity >= cls.CONCERNING_SEVERITY or symptom_type in cls.CONCERNING_SYMPTOM_TYPES
+    
     def save(self, *args, **kwargs):
-        """Auto-flag concerning symptoms"""
-        # Critical severity or suicidal thoughts/self-harm are always concerning
-        if (self.severity >= 3 or 
-            self.symptom_type in ['suicidal_thoughts', 'self_harm', 'panic_attacks']):
+        """Auto-flag concerning symptoms and keep the patient's summary current"""
+        if self.concerning(self.symptom_type, self.severity):
             self.is_concerning = True
+        adding = self._state.adding
         super().save(*args, **kwargs)
+        if adding:
+            PatientSymptomSummary.record(self)
+    
+    def delete(self, *args, **kwargs):
+        """Back the record out of the patient's summary
+        
+        Only direct deletes come through here. Records removed along with
+        their patient are fast-deleted together with the summary, and
+        queryset deletes are reconciled by ``manage.py rebuild_symptom_summaries``.
+        """
+        result = super().delete(*args, **kwargs)
+        PatientSymptomSummary.unrecord(self)
+        return result
+
+
+class PatientSymptomSummary(models.Model):
+    """Per-patient symptom rollup so dashboards read one row instead of scanning history
+
+    Updated incrementally when a SymptomRecord is created or deleted. Records
+    written with bulk_create or edited in place are reconciled by
+    ``manage.py rebuild_symptom_summaries``.
+    """
+    
+    patient = models.OneToOneField(User, on_delete=models.CASCADE, related_name='symptom_summary')
+    total_count = models.PositiveIntegerField(default=0)
+    concerning_count = models.PositiveIntegerField(default=0)
+    max_severity = models.PositiveSmallIntegerField(default=0)
+    daily_counts = models.JSONField(default=dict, blank=True, help_text="ISO date -> number of records")
+    type_counts = models.JSONField(default=dict, blank=True, help_text="Symptom type -> number of records")
+    last_recorded_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Patient Symptom Summary'
+        verbose_name_plural = 'Patient Symptom Summaries'
+    
+    # Days kept in daily_counts, the window my_symptoms shows
+    RECENT_DAYS = 30
+    
+    def __str__(self):
+        return f"{self.patient.username} - {self.total_count} symptoms"
+    
+    def recent_count(self, days=RECENT_DAYS):
+        """Number of records in the ``days`` days up to now
+        
+        Whole days are summed from ``daily_counts``; only the partly covered
+        first day of the window is counted from the records themselves.
+        """
+        since = timezone.now() - timedelta(days=days)
+        records = SymptomRecord.objects.filter(patient_id=self.patient_id, recorded_at__gte=since)
+        if days > self.RECENT_DAYS:
+            # daily_counts doesn't reach back that far
+            return records.count()
+        first_day = timezone.localdate(since)
+        next_day = timezone.make_aware(datetime.combine(first_day + timedelta(days=1), datetime.min.time()))
+        partial = records.filter(recorded_at__lt=next_day).count()
+        return partial + sum(count for day, count in self.daily_counts.items() if day > first_day.isoformat())
+    
+    @classmethod
+    def for_patient(cls, patient):
+        """Return the patient's summary, computed without saving if it doesn't exist yet
+        
+        The row is written by the patient's next record or by
+        ``manage.py rebuild_symptom_summaries``, never by a page view.
+        """
+        summary = cls.objects.filter(patient=patient).first()
+        if summary is None:
+            summary = cls._compute([patient.pk], SymptomDailyRollup.compute_for([patient.pk]))[patient.pk]
+        return summary
+    
+    @classmethod
+    def record(cls, symptom):
+        """Fold a newly created SymptomRecord into its patient's summary"""
+        with transaction.atomic():
+            summary, created = cls.objects.select_for_update().get_or_create(patient_id=symptom.patient_id)
+            if created:
+                # Patient may have history from before summaries existed
+                cls.rebuild_for([symptom.patient_id])
+                return
+            
+            day = timezone.localdate(symptom.recorded_at).isoformat()
+            summary.total_count += 1
+            summary.concerning_count += int(symptom.is_concerning)
+            summary.max_severity = max(summary.max_severity, symptom.severity)
+            summary.daily_counts[day] = summary.daily_counts.get(day, 0) + 1
+            summary.daily_counts = cls._trim(summary.daily_counts)
+            summary.type_counts[symptom.symptom_type] = summary.type_counts.get(symptom.symptom_type, 0) + 1
+            if summary.last_recorded_at is None or symptom.recorded_at > summary.last_recorded_at:
+                summary.last_recorded_at = symptom.recorded_at
+            summary.save()
+            SymptomDailyRollup.add(symptom)
+    
+    @classmethod
+    def unrecord(cls, symptom):
+        """Remove a deleted SymptomRecord from its patient's summary"""
+        with transaction.atomic():
+            summary = cls.objects.select_for_update().filter(patient_id=symptom.patient_id).first()
+            if summary is None:
+                return
+            if symptom.severity >= summary.max_severity or symptom.recorded_at >= (summary.last_recorded_at or symptom.recorded_at):
+                # Max/latest can't be decremented; recompute from what is left
+                cls.rebuild_for([symptom.patient_id])
+                return
+            
+            day = timezone.localdate(symptom.recorded_at).isoformat()
+            summary.total_count = max(summary.total_count - 1, 0)
+            summary.concerning_count = max(summary.concerning_count - int(symptom.is_concerning), 0)
+            for counts, key in ((summary.daily_counts, day), (summary.type_counts, symptom.symptom_type)):
+                if counts.get(key, 0) > 1:
+                    counts[key] -= 1
+                else:
+                    counts.pop(key, None)
+            summary.save()
+            SymptomDailyRollup.refresh(symptom.patient_id, timezone.localdate(symptom.recorded_at), symptom.symptom_type)
+    
+    @classmethod
+    def rebuild_for(cls, patient_ids):
+        """Recompute summaries (and daily rollups) for the given patients
+        
+        Everything but the latest timestamp is folded from the rollup's
+        per-day grouped rows, so history is only scanned twice.
+        """
+        patient_ids = list(patient_ids)
+        summaries = cls._compute(patient_ids, SymptomDailyRollup.rebuild_for(patient_ids))
+        
+        # Upsert in place so existing rows keep their primary keys
+        cls.objects.bulk_create(
+            summaries.values(),
+            update_conflicts=True,
+            unique_fields=['patient'],
+            update_fields=['total_count', 'concerning_count', 'max_severity',
+                           'daily_counts', 'type_counts', 'last_recorded_at', 'updated_at'],
+        )
+    
+    @classmethod
+    def _compute(cls, patient_ids, rollups):
+        """Unsaved summaries for ``patient_ids`` folded from their daily rollup rows"""
+        summaries = {pk: cls(patient_id=pk, daily_counts={}, type_counts={}) for pk in patient_ids}
+        for rollup in rollups:
+            summary = summaries[rollup.patient_id]
+            day = rollup.day.isoformat()
+            summary.total_count += rollup.count
+            summary.concerning_count += rollup.concerning_count
+            summary.max_severity = max(summary.max_severity, rollup.max_severity)
+            summary.daily_counts[day] = summary.daily_counts.get(day, 0) + rollup.count
+            summary.type_counts[rollup.symptom_type] = summary.type_counts.get(rollup.symptom_type, 0) + rollup.count
+        
+        for patient_id, last_recorded_at in SymptomRecord.objects.filter(
+            patient_id__in=patient_ids
+        ).order_by().values('patient_id').annotate(last=models.Max('recorded_at')).values_list('patient_id', 'last'):
+            summaries[patient_id].last_recorded_at = last_recorded_at
+        
+        for summary in summaries.values():
+            summary.daily_counts = cls._trim(summary.daily_counts)
+        return summaries
+    
+    @classmethod
+    def _trim(cls, daily_counts):
+        """Drop days older than RECENT_DAYS (plus the partly covered first day)"""
+        oldest = (timezone.localdate() - timedelta(days=cls.RECENT_DAYS + 1)).isoformat()
+        return {day: count for day, count in daily_counts.items() if day >= oldest}
+
+
+class SymptomDailyRollup(models.Model):
+    """Per-patient, per-day, per-symptom-type aggregates for trend charts
+    
+    Maintained alongside PatientSymptomSummary so trend queries read
+    pre-grouped rows instead of truncating timestamps over raw history.
+    ``severity_sum`` is stored rather than an average so days fold into
+    weeks exactly.
+    """
+    
+    patient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='symptom_daily_rollups')
+    day = models.DateField()
+    symptom_type = models.CharField(max_length=50, choices=SymptomRecord.SYMPTOM_CATEGORIES)
+    count = models.PositiveIntegerField(default=0)
+    concerning_count = models.PositiveIntegerField(default=0)
+    severity_sum = models.PositiveIntegerField(default=0)
+    max_severity = models.PositiveSmallIntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['patient', 'day', 'symptom_type']
+        verbose_name = 'Symptom Daily Rollup'
+        verbose_name_plural = 'Symptom Daily Rollups'
+    
+    def __str__(self):
+        return f"{self.patient_id} {self.day} {self.symptom_type}: {self.count}"
+    
+    @classmethod
+    def add(cls, symptom):
+        """Fold one new SymptomRecord into its day's row"""
+        day = timezone.localdate(symptom.recorded_at)
+        updated = cls.objects.filter(
+            patient_id=symptom.patient_id, day=day, symptom_type=symptom.symptom_type
+        ).update(
+            count=models.F('count') + 1,
+            concerning_count=models.F('concerning_count') + int(symptom.is_concerning),
+            severity_sum=models.F('severity_sum') + symptom.severity,
+            max_severity=Greatest('max_severity', models.Value(symptom.severity)),
+        )
+        if not updated:
+            cls.objects.create(
+                patient_id=symptom.patient_id, day=day, symptom_type=symptom.symptom_type,
+                count=1, concerning_count=int(symptom.is_concerning),
+                severity_sum=symptom.severity, max_severity=symptom.severity,
+            )
+    
+    @classmethod
+    def refresh(cls, patient_id, day, symptom_type):
+        """Recompute one row from the remaining records, deleting it when empty
+        
+        Never inserts, so it is safe to call while a patient is being cascade-deleted.
+        """
+        row = SymptomRecord.objects.filter(
+            patient_id=patient_id, symptom_type=symptom_type, recorded_at__date=day,
+        ).aggregate(**cls._aggregates())
+        rows = cls.objects.filter(patient_id=patient_id, day=day, symptom_type=symptom_type)
+        if not row['n']:
+            rows.delete()
+        else:
+            rows.update(count=row['n'], concerning_count=row['concerning'],
+                        severity_sum=row['severity_sum'], max_severity=row['max_severity'])
+    
+    @classmethod
+    def compute_for(cls, patient_ids):
+        """Unsaved rows for the given patients, grouped from their records in one query"""
+        return [
+            cls(patient_id=row['patient_id'], day=row['day'], symptom_type=row['symptom_type'],
+                count=row['n'], concerning_count=row['concerning'],
+                severity_sum=row['severity_sum'], max_severity=row['max_severity'])
+            for row in cls._grouped(SymptomRecord.objects.filter(patient_id__in=patient_ids))
+        ]
+    
+    @classmethod
+    def rebuild_for(cls, patient_ids):
+        """Recompute all rows for the given patients with one grouped query and return them"""
+        patient_ids = list(patient_ids)
+        rows = cls.compute_for(patient_ids)
+        with transaction.atomic():
+            # Upsert, then drop days that no longer have records
+            cls.objects.bulk_create(
+                rows,
+                batch_size=1000,
+                update_conflicts=True,
+                unique_fields=['patient', 'day', 'symptom_type'],
+                update_fields=['count', 'concerning_count', 'severity_sum', 'max_severity'],
+            )
+            live = {(row.patient_id, row.day, row.symptom_type) for row in rows}
+            stale = [
+                pk for pk, patient_id, day, symptom_type in cls.objects.filter(
+                    patient_id__in=patient_ids
+                ).values_list('pk', 'patient_id', 'day', 'symptom_type')
+                if (patient_id, day, symptom_type) not in live
+            ]
+            cls.objects.filter(pk__in=stale).delete()
+        return rows
+    
+    @staticmethod
+    def _grouped(records):
+        return records.order_by().annotate(day=TruncDate('recorded_at')).values(
+            'patient_id', 'day', 'symptom_type'
+        ).annotate(**SymptomDailyRollup._aggregates())
+    
+    @staticmethod
+    def _aggregates():
+        return {
+            'n': models.Count('id'),
+            'concerning': models.Count('id', filter=models.Q(is_concerning=True)),
+            'severity_sum': models.Sum('severity'),
+            'max_severity': models.Max('severity'),
+        }
+
+
+class OutboundEmail(models.Model):
+    """DB-backed email outbox, drained by ``manage.py send_outbox``
+
+    Views enqueue rows instead of talking to SMTP inside the request. The
+    worker claims due rows by pushing ``next_attempt_at`` forward (a lease),
+    sends them over one connection and reschedules failures with
+    exponential backoff until ``MAX_ATTEMPTS`` is reached.
+    """
+    
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+    
+    MAX_ATTEMPTS = 5
+    RETRY_BASE_SECONDS = 60
+    LEASE_SECONDS = 300
+    
+    recipient = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.subject} → {self.recipient} ({self.status})"
+    
+    @classmethod
+    def enqueue(cls, subject, body, recipients):
+        """Queue one message per recipient (blank addresses are skipped)
+
+        With OUTBOX_SEND_ON_COMMIT the new messages are also sent once the
+        enclosing transaction commits, or straight away outside one (views
+        don't run in ATOMIC_REQUESTS), so the send happens inside the
+        request. Anything that fails is retried by the next send_outbox run.
+        """
+        messages = cls.objects.bulk_create([
+            cls(recipient=recipient, subject=subject, body=body)
+            for recipient in recipients if recipient
+        ])
+        if messages and getattr(settings, 'OUTBOX_SEND_ON_COMMIT', False):
+            pks = [message.pk for message in messages]
+            transaction.on_commit(lambda: cls.send_now(pks))
+        return messages
+    
+    @classmethod
+    def send_now(cls, pks):
+        """Best-effort immediate delivery of just-queued messages"""
+        try:
+            cls.send_batch(cls.claim_due(len(pks), pks=pks))
+        except Exception as e:
+            print(f'⚠️ Outbox: immediate send failed, leaving messages for send_outbox: {e}')
+    
+    @classmethod
+    def send_due(cls, limit):
+        """Claim and send one batch of due messages; returns (sent, failed)"""
+        return cls.send_batch(cls.claim_due(limit))
+    
+    @classmethod
+    def claim_due(cls, limit, pks=None):
+        """Lease up to ``limit`` due messages (optionally only ``pks``) to the calling worker"""
+        now = timezone.now()
+        with transaction.atomic():
+            due = cls.objects.select_for_update(skip_locked=True).filter(status='pending', next_attempt_at__lte=now)
+            if pks is not None:
+                due = due.filter(pk__in=pks)
+            batch = list(due.order_by('next_attempt_at')[:limit])
+            cls.objects.filter(pk__in=[m.pk for m in batch]).update(
+                next_attempt_at=now + timedelta(seconds=cls.LEASE_SECONDS)
+            )
+        return batch
+    
+    @staticmethod
+    def send_batch(batch):
+        """Send claimed messages over one connection; returns (sent, failed)"""
+        if not batch:
+            return 0, 0
+        sent = failed = 0
+        connection = get_connection(fail_silently=False)
+        try:
+            connection.open()
+        except Exception as e:
+            for message in batch:
+                message.mark_failed(e)
+            return 0, len(batch)
+        
+        try:
+            for message in batch:
+                email = EmailMessage(
+                    message.subject, message.body, settings.DEFAULT_FROM_EMAIL,
+                    [message.recipient], connection=connection,
+                )
+                try:
+                    email.send()
+                    message.mark_sent()
+                    sent += 1
+                except Exception as e:
+                    message.mark_failed(e)
+                    failed += 1
+        finally:
+            connection.close()
+        return sent, failed
+    
+    def mark_sent(self):
+        self.status = 'sent'
+        self.attempts += 1
+        self.sent_at = timezone.now()
+        self.last_error = ''
+        self.save(update_fields=['status', 'attempts', 'sent_at', 'last_error'])
+    
+    def mark_failed(self, error):
+        """Reschedule with exponential backoff, or give up after MAX_ATTEMPTS"""
+        self.attempts += 1
+        self.last_error = str(error)
+        if self.attempts >= self.MAX_ATTEMPTS:
+            self.status = 'failed'
+        else:
+            delay = self.RETRY_BASE_SECONDS * 2 ** (self.attempts - 1)
+            self.next_attempt_at = timezone.now() + timedelta(seconds=delay)
+        self.save(update_fields=['status', 'attempts', 'last_error', 'next_attempt_at'])
 
 
 # Signal removed - profile creation now handled in views to set correct role
@@ -0,0 +1,46 @@
+from django.core import signing
+from django.utils.dateparse import parse_datetime
+
+
+CURSOR_SALT = 'authentication.pagination.cursor'
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor token is malformed or has been tampered with"""
+
+
+def encode_cursor(obj, field):
+    """Opaque token pointing just past ``obj`` in a (field, pk) ordering"""
+    return signing.dumps([getattr(obj, field).isoformat(), obj.pk], salt=CURSOR_SALT)
+
+
+def decode_cursor(token):
+    """Return the (timestamp, pk) pair stored in a cursor token"""
+    try:
+        value, pk = signing.loads(token, salt=CURSOR_SALT)
+        timestamp = parse_datetime(value)
+        pk = int(pk)
+    except (signing.BadSignature, TypeError, ValueError):
+        raise InvalidCursor('Invalid cursor')
+    if timestamp is None:
+        raise InvalidCursor('Invalid cursor')
+    return timestamp, pk
+
+
+def keyset_page(queryset, field, cursor=None, page_size=20):
+    """Newest-first page of ``queryset`` after ``cursor``, as (items, next_cursor)
+
+    Seeks on (field, pk) instead of using OFFSET, so page 1,000 costs the same
+    index range scan as page 1. ``next_cursor`` is None on the last page.
+    """
+    queryset = queryset.order_by(f'-{field}', '-pk')
+    if cursor:
+        value, pk = decode_cursor(cursor)
+        # field <= value keeps the index range seek; ties are broken on pk
+        queryset = queryset.filter(**{f'{field}__lte': value}).exclude(**{field: value, 'pk__gte': pk})
+
+    items = list(queryset[:page_size + 1])
+    if len(items) <= page_size:
+        return items, None
+    items = items[:page_size]
+    return items, encode_cursor(items[-1], field)
@@ -1,3 +1,626 @@
-from django.test import TestCase
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+from smtplib import SMTPException
 
-# Create your tests here.
+from django.contrib.auth import BACKEND_SESSION_KEY
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from main.testing import plain_static_storage
+from .models import (
+    UserProfile, CaregiverPatientRelationship, SymptomRecord, PatientSymptomSummary,
+    SymptomDailyRollup, OutboundEmail
+)
+
+
+class FailingEmailBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        raise SMTPException('connection refused')
+
+
+def make_user(username, role, disclaimer_accepted=True):
+    user = User.objects.create_user(username, f'{username}@example.com')
+    UserProfile.objects.create(user=user, role=role, disclaimer_accepted=disclaimer_accepted)
+    return user
+
+
+@plain_static_storage
+class CaregiverDashboardQueryTests(TestCase):
+    def setUp(self):
+        self.caregiver = make_user('carol', 'caregiver')
+        self.client.force_login(self.caregiver)
+
+    def add_patients(self, count, status='active'):
+        start = User.objects.count()
+        for i in range(start, start + count):
+            patient = make_user(f'patient_{i}', 'patient')
+            CaregiverPatientRelationship.objects.create(
+                caregiver=self.caregiver, patient=patient, status=status
+            )
+            for severity in (3, 4, 1):
+                SymptomRecord.objects.create(patient=patient, symptom_type='fatigue', severity=severity)
+
+    def test_query_count_is_independent_of_patient_count(self):
+        self.add_patients(1)
+        with self.assertNumQueries(5):
+            self.client.get(reverse('caregiver_dashboard'))
+
+        self.add_patients(10)
+        self.add_patients(3, status='pending')
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('caregiver_dashboard'))
+
+        self.assertEqual(response.context['active_count'], 11)
+        self.assertEqual(response.context['pending_count'], 3)
+        # Two concerning records per active patient, capped at 20 overall
+        self.assertEqual(len(response.context['concerning_symptoms']), 20)
+
+    def test_concerning_symptoms_are_capped_per_patient(self):
+        self.add_patients(1)
+        patient = User.objects.get(username='patient_1')
+        for _ in range(10):
+            SymptomRecord.objects.create(patient=patient, symptom_type='self_harm', severity=2)
+
+        response = self.client.get(reverse('caregiver_dashboard'))
+        self.assertEqual(len(response.context['concerning_symptoms']), 5)
+
+    def test_patient_requests_counts(self):
+        patient = make_user('pat', 'patient')
+        for i, status in enumerate(['active', 'pending', 'pending', 'rejected']):
+            CaregiverPatientRelationship.objects.create(
+                caregiver=make_user(f'cg{i}', 'caregiver'), patient=patient, status=status
+            )
+        self.client.force_login(patient)
+
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('patient_requests'))
+        self.assertEqual(response.context['active_count'], 1)
+        self.assertEqual(response.context['pending_count'], 2)
+
+
+@plain_static_storage
+class ProfileQueryTests(TestCase):
+    """request.user.profile comes from the same query as the user"""
+
+    def setUp(self):
+        self.caregiver = make_user('carol', 'caregiver')
+        self.patient = make_user('pat', 'patient')
+
+    def test_role_gated_views_do_not_query_profile_separately(self):
+        self.client.force_login(self.caregiver)
+        # session + user/profile
+        with self.assertNumQueries(2):
+            self.client.get(reverse('add_patient'))
+
+        self.client.force_login(self.patient)
+        with self.assertNumQueries(2):
+            self.client.get(reverse('record_symptom'))
+        # Denied by the role check on the same session + user/profile queries
+        with self.assertNumQueries(2):
+            self.client.get(reverse('caregiver_dashboard'))
+
+    def test_login_looks_up_the_user_once(self):
+        self.patient.set_password('secret')
+        self.patient.save()
+        for password, status in (('secret', 302), ('wrong', 200)):
+            self.client.logout()
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(reverse('login'), {'username': 'pat', 'password': password})
+            self.assertEqual(response.status_code, status)
+            user_lookups = [q['sql'] for q in queries if q['sql'].startswith('SELECT') and 'FROM "auth_user"' in q['sql']]
+            self.assertEqual(len(user_lookups), 1)
+
+    def test_legacy_backend_sessions_stay_logged_in(self):
+        self.client.force_login(self.patient, backend='django.contrib.auth.backends.ModelBackend')
+        self.assertEqual(self.client.get(reverse('record_symptom')).status_code, 200)
+        self.assertEqual(self.client.session[BACKEND_SESSION_KEY], 'authentication.backends.ProfileModelBackend')
+
+
+# Caching behaviour needs a TTL; without a shared cache it defaults to 0
+@override_settings(ACCESS_STATE_TTL=300)
+@plain_static_storage
+class AccessPolicyTests(TestCase):
+    def setUp(self):
+        self.patient = make_user('pat', 'patient')
+        self.client.force_login(self.patient)
+
+    def test_denied_request_short_circuits_on_cached_state(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('add_patient'))
+        self.assertRedirects(response, reverse('drug_home'), fetch_redirect_response=False)
+
+    def test_profile_change_invalidates_cached_state(self):
+        self.client.get(reverse('my_symptoms'))
+
+        profile = self.patient.profile
+        profile.role = 'caregiver'
+        profile.save()
+
+        response = self.client.get(reverse('add_patient'))
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(reverse('my_symptoms'))
+        self.assertRedirects(response, reverse('drug_home'), fetch_redirect_response=False)
+
+    def test_disclaimer_must_be_accepted(self):
+        newcomer = make_user('new', 'patient', disclaimer_accepted=False)
+        self.client.force_login(newcomer)
+        response = self.client.get(reverse('record_symptom'))
+        self.assertRedirects(response, reverse('accept_disclaimer'), fetch_redirect_response=False)
+
+        self.client.post(reverse('accept_disclaimer'), {'accept_disclaimer': 'on'})
+        self.assertEqual(self.client.get(reverse('record_symptom')).status_code, 200)
+
+    @override_settings(ACCESS_STATE_TTL=0)
+    def test_without_a_shared_cache_state_is_reloaded_every_request(self):
+        self.client.get(reverse('my_symptoms'))
+        # Saved by another worker: this process's cache never sees the bump
+        UserProfile.objects.filter(user=self.patient).update(role='caregiver')
+        response = self.client.get(reverse('my_symptoms'))
+        self.assertRedirects(response, reverse('drug_home'), fetch_redirect_response=False)
+
+    def test_json_endpoints_get_json_errors(self):
+        response = self.client.get(reverse('symptom_trends_api'))
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.json(), {'error': 'Access denied. Caregivers only.'})
+
+        self.client.logout()
+        response = self.client.get(reverse('symptom_trends_api'))
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json(), {'error': 'Login required'})
+
+    def test_anonymous_users_are_sent_to_login(self):
+        self.client.logout()
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('my_symptoms'))
+        self.assertTrue(response['Location'].startswith('/auth/login'))
+
+
+@plain_static_storage
+class PatientSymptomSummaryTests(TestCase):
+    def setUp(self):
+        self.patient = make_user('pat', 'patient')
+
+    def record(self, symptom_type, severity):
+        return SymptomRecord.objects.create(patient=self.patient, symptom_type=symptom_type, severity=severity)
+
+    def snapshot(self):
+        summary = PatientSymptomSummary.objects.get(patient=self.patient)
+        return (summary.total_count, summary.concerning_count, summary.max_severity,
+                summary.daily_counts, summary.type_counts)
+
+    def test_incremental_updates_match_rebuild(self):
+        self.record('fatigue', 1)
+        self.record('fatigue', 3)
+        extra = self.record('self_harm', 2)
+        self.record('headaches', 4)
+        extra.delete()
+
+        summary = PatientSymptomSummary.objects.get(patient=self.patient)
+        self.assertEqual(summary.total_count, 3)
+        self.assertEqual(summary.concerning_count, 2)
+        self.assertEqual(summary.max_severity, 4)
+        self.assertEqual(summary.type_counts, {'fatigue': 2, 'headaches': 1})
+        self.assertEqual(summary.recent_count(), 3)
+
+        incremental = self.snapshot()
+        call_command('rebuild_symptom_summaries', stdout=StringIO())
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_rebuild_picks_up_bulk_created_records(self):
+        SymptomRecord.objects.bulk_create([
+            SymptomRecord(patient=self.patient, symptom_type='fatigue', severity=2)
+            for _ in range(4)
+        ])
+        call_command('rebuild_symptom_summaries', stdout=StringIO())
+        self.assertEqual(self.snapshot()[:3], (4, 0, 2))
+
+    def test_my_symptoms_reads_summary(self):
+        for _ in range(5):
+            self.record('fatigue', 3)
+        self.client.force_login(self.patient)
+
+        response = self.client.get(reverse('my_symptoms'))
+        self.assertEqual(response.context['total_symptoms'], 5)
+        self.assertEqual(response.context['concerning_count'], 5)
+        self.assertEqual(response.context['recent_count'], 5)
+
+    def test_recent_count_is_a_rolling_window(self):
+        from datetime import timedelta
+        from django.utils import timezone
+
+        now = timezone.now()
+        SymptomRecord.objects.bulk_create([
+            SymptomRecord(patient=self.patient, symptom_type='fatigue', severity=1, recorded_at=now - age)
+            for age in (timedelta(days=30, hours=1), timedelta(days=29, hours=23), timedelta(days=2))
+        ])
+        PatientSymptomSummary.rebuild_for([self.patient.pk])
+        summary = PatientSymptomSummary.objects.get(patient=self.patient)
+        self.assertEqual(summary.recent_count(), 2)
+        self.assertEqual(summary.recent_count(days=60), 3)
+
+    def test_my_symptoms_does_not_write_a_missing_summary(self):
+        SymptomRecord.objects.bulk_create([
+            SymptomRecord(patient=self.patient, symptom_type='fatigue', severity=2) for _ in range(3)
+        ])
+        self.client.force_login(self.patient)
+
+        response = self.client.get(reverse('my_symptoms'))
+        self.assertEqual(response.context['total_symptoms'], 3)
+        self.assertFalse(PatientSymptomSummary.objects.filter(patient=self.patient).exists())
+
+    def test_deleting_a_patient_does_not_rebuild_per_record(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        def delete_cost(patient, records):
+            for _ in range(records):
+                SymptomRecord.objects.create(patient=patient, symptom_type='fatigue', severity=2)
+            with CaptureQueriesContext(connection) as queries:
+                patient.delete()
+            return len(queries)
+
+        self.assertEqual(delete_cost(self.patient, 1), delete_cost(make_user('pat2', 'patient'), 20))
+
+
+class OutboundEmailTests(TestCase):
+    def setUp(self):
+        self.patient = make_user('pat', 'patient')
+        self.caregivers = [make_user(f'cg{i}', 'caregiver') for i in range(3)]
+        for caregiver, status in zip(self.caregivers, ['active', 'active', 'pending']):
+            CaregiverPatientRelationship.objects.create(caregiver=caregiver, patient=self.patient, status=status)
+
+    def test_concerning_symptom_fans_out_to_active_caregivers(self):
+        self.client.force_login(self.patient)
+        self.client.post(reverse('record_symptom'), {'symptom_type': 'self_harm', 'severity': '2'})
+
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertTrue(SymptomRecord.objects.get().caregiver_notified)
+
+        call_command('send_outbox', stdout=StringIO())
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), ['cg0@example.com', 'cg1@example.com'])
+        self.assertFalse(OutboundEmail.objects.exclude(status='sent').exists())
+
+    def test_add_patient_queues_request_email(self):
+        other = make_user('newpat', 'patient')
+        self.client.force_login(self.caregivers[2])
+        self.client.post(reverse('add_patient'), {'username': 'newpat', 'email': other.email})
+
+        self.assertEqual(len(mail.outbox), 0)
+        call_command('send_outbox', stdout=StringIO())
+        self.assertEqual(mail.outbox[0].to, ['newpat@example.com'])
+
+    @override_settings(EMAIL_BACKEND='authentication.tests.FailingEmailBackend')
+    def test_failures_back_off_then_give_up(self):
+        OutboundEmail.enqueue('Subject', 'Body', ['x@example.com'])
+
+        call_command('send_outbox', stdout=StringIO())
+        message = OutboundEmail.objects.get()
+        self.assertEqual((message.status, message.attempts), ('pending', 1))
+        self.assertIn('connection refused', message.last_error)
+
+        # Not due again until the backoff has elapsed
+        call_command('send_outbox', stdout=StringIO())
+        message.refresh_from_db()
+        self.assertEqual(message.attempts, 1)
+
+        for _ in range(OutboundEmail.MAX_ATTEMPTS - 1):
+            OutboundEmail.objects.update(next_attempt_at=message.created_at)
+            call_command('send_outbox', stdout=StringIO())
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts), ('failed', OutboundEmail.MAX_ATTEMPTS))
+
+
+    @override_settings(OUTBOX_SEND_ON_COMMIT=True)
+    def test_send_on_commit_delivers_without_a_worker(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            OutboundEmail.enqueue('Subject', 'Body', ['x@example.com'])
+        self.assertEqual(mail.outbox[0].to, ['x@example.com'])
+        self.assertEqual(OutboundEmail.objects.get().status, 'sent')
+
+    @override_settings(CRON_SECRET='s3cret')
+    def test_cron_endpoint_sends_one_batch_with_the_secret(self):
+        OutboundEmail.enqueue('Subject', 'Body', ['x@example.com', 'y@example.com'])
+        self.assertEqual(self.client.get(reverse('send_outbox')).status_code, 403)
+        self.assertEqual(
+            self.client.get(reverse('send_outbox'), HTTP_AUTHORIZATION='Bearer wrong').status_code, 403
+        )
+
+        response = self.client.get(reverse('send_outbox'), HTTP_AUTHORIZATION='Bearer s3cret')
+        self.assertEqual(response.json(), {'sent': 2, 'failed': 0})
+        self.assertEqual(len(mail.outbox), 2)
+
+        with self.settings(CRON_SECRET=''):
+            self.assertEqual(self.client.get(reverse('send_outbox'), HTTP_AUTHORIZATION='Bearer ').status_code, 403)
+
+
+class RelationshipTransitionTests(TestCase):
+    def setUp(self):
+        self.caregiver = make_user('carol', 'caregiver')
+        self.relationships = {
+            status: CaregiverPatientRelationship.objects.create(
+                caregiver=self.caregiver, patient=make_user(f'{status}_pat', 'patient'), status=status
+            )
+            for status in ['pending', 'active', 'rejected', 'removed']
+        }
+
+    def statuses(self):
+        return dict(CaregiverPatientRelationship.objects.values_list('patient__username', 'status'))
+
+    def test_bulk_approve_is_one_guarded_update(self):
+        with self.assertNumQueries(1):
+            updated = CaregiverPatientRelationship.objects.all().approve()
+        self.assertEqual(updated, 1)
+        self.assertEqual(self.statuses(), {
+            'pending_pat': 'active', 'active_pat': 'active',
+            'rejected_pat': 'rejected', 'removed_pat': 'removed',
+        })
+        self.assertIsNotNone(CaregiverPatientRelationship.objects.get(patient__username='pending_pat').approved_date)
+        self.assertIsNone(CaregiverPatientRelationship.objects.get(patient__username='active_pat').approved_date)
+
+    def test_bulk_reject(self):
+        self.assertEqual(CaregiverPatientRelationship.objects.all().reject(), 2)
+        self.assertEqual(set(self.statuses().values()), {'rejected', 'removed'})
+
+    def test_instance_transition_respects_guards(self):
+        rejected = self.relationships['rejected']
+        self.assertFalse(rejected.approve())
+        self.assertEqual(rejected.status, 'rejected')
+
+        pending = self.relationships['pending']
+        self.assertTrue(pending.approve())
+        self.assertEqual(pending.status, 'active')
+        self.assertIsNotNone(pending.approved_date)
+
+
+class ImportClinicTests(TestCase):
+    def test_import_users_relationships_and_symptoms(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            (tmp / 'users.csv').write_text(
+                'username,email,role,disclaimer_accepted\n'
+                'dr_who,who@clinic.test,caregiver,true\n'
+                'amy,amy@clinic.test,patient,true\n'
+                'rory,rory@clinic.test,patient,false\n'
+                'nobody,nobody@clinic.test,admin,true\n'
+            )
+            (tmp / 'relationships.csv').write_text(
+                'caregiver,patient,status\n'
+                'dr_who,amy,active\n'
+                'dr_who,rory,pending\n'
+                'dr_who,missing,active\n'
+            )
+            (tmp / 'symptoms.ndjson').write_text('\n'.join(json.dumps(row) for row in [
+                {'patient': 'amy', 'symptom_type': 'fatigue', 'severity': 1, 'recorded_at': '2025-01-02T08:00:00'},
+                {'patient': 'amy', 'symptom_type': 'self_harm', 'severity': 1, 'recorded_at': '2025-01-03T08:00:00'},
+                {'patient': 'amy', 'symptom_type': 'headaches', 'severity': 4, 'recorded_at': '2025-01-03T09:00:00'},
+                {'patient': 'rory', 'symptom_type': 'fatigue', 'severity': 9},
+            ]))
+
+            call_command(
+                'import_clinic', users=str(tmp / 'users.csv'),
+                relationships=str(tmp / 'relationships.csv'),
+                symptoms=str(tmp / 'symptoms.ndjson'), batch_size=2, stdout=StringIO()
+            )
+
+        self.assertEqual(set(UserProfile.objects.values_list('user__username', 'role')), {
+            ('dr_who', 'caregiver'), ('amy', 'patient'), ('rory', 'patient'),
+        })
+        self.assertFalse(User.objects.get(username='amy').has_usable_password())
+        self.assertEqual(
+            dict(CaregiverPatientRelationship.objects.values_list('patient__username', 'status')),
+            {'amy': 'active', 'rory': 'pending'}
+        )
+
+        amy = User.objects.get(username='amy')
+        records = SymptomRecord.objects.filter(patient=amy).order_by('recorded_at')
+        self.assertEqual([r.is_concerning for r in records], [False, True, True])
+        self.assertEqual(records[0].recorded_at.year, 2025)
+        self.assertFalse(SymptomRecord.objects.filter(patient__username='rory').exists())
+
+        summary = PatientSymptomSummary.objects.get(patient=amy)
+        self.assertEqual((summary.total_count, summary.concerning_count, summary.max_severity), (3, 2, 4))
+        # Days before the recent window aren't kept
+        self.assertEqual(summary.daily_counts, {})
+
+    def test_counts_only_rows_actually_inserted(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            users = Path(tmp) / 'users.ndjson'
+            users.write_text('\n'.join(json.dumps(row) for row in [
+                {'username': 'amy', 'email': None, 'role': 'patient'},
+                {'username': 'amy', 'email': 'amy@clinic.test', 'role': 'patient'},
+                {'username': 'dr_who', 'email': 'who@clinic.test', 'role': 'caregiver'},
+            ]))
+            relationships = Path(tmp) / 'relationships.csv'
+            relationships.write_text('caregiver,patient\ndr_who,amy\ndr_who,amy\n')
+
+            first, second = StringIO(), StringIO()
+            call_command('import_clinic', users=str(users), relationships=str(relationships), stdout=first)
+            call_command('import_clinic', users=str(users), relationships=str(relationships), stdout=second)
+
+        self.assertIn('Users: 2 created, 1 skipped', first.getvalue())
+        self.assertIn('Relationships: 1 imported, 1 skipped', first.getvalue())
+        self.assertIn('Users: 0 created, 3 skipped', second.getvalue())
+        self.assertIn('Relationships: 0 imported, 2 skipped', second.getvalue())
+        self.assertEqual(User.objects.get(username='amy').email, '')
+
+    def test_bad_rows_are_skipped_without_aborting_the_file(self):
+        amy = make_user('amy', 'patient')
+        make_user('dr_who', 'caregiver')
+        with tempfile.TemporaryDirectory() as tmp:
+            symptoms = Path(tmp) / 'symptoms.ndjson'
+            symptoms.write_text('\n'.join([
+                json.dumps({'patient': 'amy', 'symptom_type': 'fatigue', 'severity': 2}),
+                '{"patient": "amy", "symptom_type": ',
+                json.dumps({'patient': 'amy', 'symptom_type': 'fatigue', 'severity': 2, 'recorded_at': '2025-02-30T08:00:00'}),
+                json.dumps({'patient': 'amy', 'symptom_type': 'fatigue', 'severity': 2, 'recorded_at': 'yesterday'}),
+                json.dumps(['not', 'an', 'object']),
+                json.dumps({'patient': 'amy', 'symptom_type': 'headaches', 'severity': 4}),
+            ]))
+            relationships = Path(tmp) / 'relationships.csv'
+            relationships.write_text('caregiver,patient,approved_date\ndr_who,amy,2025-13-01\n')
+
+            out = StringIO()
+            call_command('import_clinic', symptoms=str(symptoms), relationships=str(relationships),
+                         batch_size=2, stdout=out)
+
+        self.assertIn('Relationships: 0 imported, 1 skipped', out.getvalue())
+        self.assertIn('Symptoms: 2 imported, 4 skipped, 1 patient summaries rebuilt', out.getvalue())
+        summary = PatientSymptomSummary.objects.get(patient=amy)
+        self.assertEqual((summary.total_count, summary.max_severity), (2, 4))
+
+
+class SymptomTrendApiTests(TestCase):
+    def setUp(self):
+        self.caregiver = make_user('carol', 'caregiver')
+        self.client.force_login(self.caregiver)
+
+    def add_patient(self, username, status='active'):
+        patient = make_user(username, 'patient')
+        CaregiverPatientRelationship.objects.create(caregiver=self.caregiver, patient=patient, status=status)
+        return patient
+
+    def record(self, patient, symptom_type, severity, when):
+        return SymptomRecord.objects.create(
+            patient=patient, symptom_type=symptom_type, severity=severity, recorded_at=when,
+        )
+
+    def test_daily_and_weekly_buckets(self):
+        from datetime import datetime, timezone as dt_timezone
+
+        amy = self.add_patient('amy')
+        hidden = self.add_patient('pending_pat', status='pending')
+        for day, severity in [(6, 1), (6, 3), (7, 2), (8, 4)]:
+            self.record(amy, 'fatigue', severity, datetime(2025, 1, day, 12, tzinfo=dt_timezone.utc))
+        self.record(hidden, 'fatigue', 4, datetime(2025, 1, 6, 12, tzinfo=dt_timezone.utc))
+
+        url = reverse('symptom_trends_api')
+        data = self.client.get(url, {'start': '2025-01-01', 'end': '2025-01-31'}).json()
+        self.assertEqual([p['username'] for p in data['patients']], ['amy'])
+        points = data['patients'][0]['series'][0]['points']
+        self.assertEqual(points[0], {
+            'period': '2025-01-06', 'count': 2, 'concerning': 1, 'avg_severity': 2.0, 'max_severity': 3,
+        })
+        self.assertEqual(len(points), 3)
+
+        data = self.client.get(url, {'start': '2025-01-01', 'end': '2025-01-31', 'bucket': 'week'}).json()
+        points = data['patients'][0]['series'][0]['points']
+        self.assertEqual(points, [{
+            'period': '2025-01-06', 'count': 4, 'concerning': 2, 'avg_severity': 2.5, 'max_severity': 4,
+        }])
+
+    def test_query_count_is_flat_across_many_patients(self):
+        from django.utils import timezone
+
+        for i in range(200):
+            self.record(self.add_patient(f'p{i}'), 'headaches', 2, timezone.now())
+
+        # session, user, active patients, rollup rows
+        with self.assertNumQueries(4):
+            data = self.client.get(reverse('symptom_trends_api'), {'bucket': 'week'}).json()
+        self.assertEqual(len(data['patients']), 200)
+
+    def test_rollup_follows_deletes_and_rebuilds(self):
+        from datetime import datetime, timezone as dt_timezone
+
+        amy = self.add_patient('amy')
+        when = datetime(2025, 1, 6, 12, tzinfo=dt_timezone.utc)
+        self.record(amy, 'fatigue', 1, when)
+        worst = self.record(amy, 'fatigue', 4, when)
+        rollup = SymptomDailyRollup.objects.get(patient=amy)
+        self.assertEqual((rollup.count, rollup.severity_sum, rollup.max_severity), (2, 5, 4))
+
+        worst.delete()
+        rollup.refresh_from_db()
+        self.assertEqual((rollup.count, rollup.severity_sum, rollup.max_severity), (1, 1, 1))
+
+        # bulk_create skips save(); rebuild_for reconciles and drops empty days
+        SymptomRecord.objects.filter(patient=amy).delete()
+        SymptomRecord.objects.bulk_create([SymptomRecord(patient=amy, symptom_type='digestive_issues', severity=2, recorded_at=when)])
+        PatientSymptomSummary.rebuild_for([amy.pk])
+        self.assertEqual(
+            list(SymptomDailyRollup.objects.filter(patient=amy).values_list('symptom_type', 'count')),
+            [('digestive_issues', 1)],
+        )
+
+    def test_rejects_bad_parameters(self):
+        url = reverse('symptom_trends_api')
+        self.assertEqual(self.client.get(url, {'bucket': 'hour'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'start': '2025-02-01', 'end': '2025-01-01'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'start': 'last-week'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'end': '2025-02-30'}).status_code, 400)
+
+
+@plain_static_storage
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        from datetime import datetime, timezone as dt_timezone
+
+        self.patient = make_user('pat', 'patient')
+        # Pairs of identical timestamps exercise the id tie-break
+        base = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+        SymptomRecord.objects.bulk_create([
+            SymptomRecord(patient=self.patient, symptom_type='fatigue', severity=1,
+                          recorded_at=base.replace(hour=i // 2 % 24, day=1 + i // 48))
+            for i in range(120)
+        ])
+        self.client.force_login(self.patient)
+
+    def test_cursor_walks_every_record_once(self):
+        from .pagination import keyset_page
+
+        records = SymptomRecord.objects.filter(patient=self.patient)
+        seen, cursor = [], None
+        while True:
+            items, cursor = keyset_page(records, 'recorded_at', cursor=cursor, page_size=50)
+            seen += [s.pk for s in items]
+            if cursor is None:
+                break
+
+        expected = list(records.order_by('-recorded_at', '-pk').values_list('pk', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_page_and_feed_continue_each_other(self):
+        page = self.client.get(reverse('my_symptoms'))
+        self.assertEqual(len(page.context['symptoms']), 50)
+        data = self.client.get(reverse('my_symptoms_feed'), {'cursor': page.context['next_cursor']}).json()
+        self.assertEqual(data['html'].count('border-l-4'), 50)
+        last = self.client.get(reverse('my_symptoms_feed'), {'cursor': data['next_cursor']}).json()
+        self.assertEqual(last['html'].count('border-l-4'), 20)
+        self.assertIsNone(last['next_cursor'])
+
+    def test_deep_pages_cost_the_same_as_the_first(self):
+        first = self.client.get(reverse('my_symptoms_feed')).json()
+        with CaptureQueriesContext(connection) as shallow:
+            second = self.client.get(reverse('my_symptoms_feed'), {'cursor': first['next_cursor']}).json()
+        with CaptureQueriesContext(connection) as deep:
+            self.client.get(reverse('my_symptoms_feed'), {'cursor': second['next_cursor']})
+        self.assertEqual(len(shallow), len(deep))
+        self.assertNotIn('OFFSET', deep.captured_queries[-1]['sql'])
+
+    def test_tampered_cursor_is_rejected(self):
+        response = self.client.get(reverse('my_symptoms_feed'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_activity_feed_requires_active_relationship(self):
+        from drug_checker.models import DrugSearch
+
+        caregiver = make_user('carol', 'caregiver')
+        DrugSearch.objects.bulk_create([DrugSearch(user=self.patient, drug_name=f'Drug {i}') for i in range(25)])
+        self.client.force_login(caregiver)
+        url = reverse('patient_activity_feed', args=[self.patient.pk, 'searches'])
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+        CaregiverPatientRelationship.objects.create(caregiver=caregiver, patient=self.patient, status='active')
+        page = self.client.get(reverse('patient_activity', args=[self.patient.pk]))
+        self.assertEqual(len(page.context['searches']), 20)
+        data = self.client.get(url, {'cursor': page.context['searches_cursor']}).json()
+        self.assertEqual(data['html'].count('Drug '), 5)
+        self.assertIsNone(data['next_cursor'])
@@ -15,6 +15,10 @@ urlpatterns = [
     path('reject-caregiver/<int:relationship_id>/', views.reject_caregiver, name='reject_caregiver'),
     path('remove-patient/<int:relationship_id>/', views.remove_patient, name='remove_patient'),
     path('patient-activity/<int:patient_id>/', views.patient_activity, name='patient_activity'),
+    path('patient-activity/<int:patient_id>/<str:kind>/', views.patient_activity_feed, name='patient_activity_feed'),
     path('record-symptom/', views.record_symptom, name='record_symptom'),
     path('my-symptoms/', views.my_symptoms, name='my_symptoms'),
+    path('my-symptoms/more/', views.my_symptoms_feed, name='my_symptoms_feed'),
+    path('api/symptom-trends/', views.symptom_trends_api, name='symptom_trends_api'),
+    path('outbox/send/', views.send_outbox, name='send_outbox'),
 ]
@@ -1,14 +1,42 @@
+import hmac
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
-from django.contrib import messages
-from django.core.mail import send_mail
 from django.conf import settings
+from django.contrib import messages
+from django.http import JsonResponse, Http404
+from django.template.loader import render_to_string
 from django.urls import reverse
 from django import forms
-from .models import UserProfile, CaregiverPatientRelationship, SymptomRecord
+from .access import role_required
+from .pagination import keyset_page, InvalidCursor
+from .models import (
+    UserProfile, CaregiverPatientRelationship, SymptomRecord, PatientSymptomSummary,
+    SymptomDailyRollup, OutboundEmail
+)
+
+
+# Cap on concerning symptoms shown per patient on the caregiver dashboard
+CONCERNING_SYMPTOMS_PER_PATIENT = 5
+
+# Default window for the symptom trend API
+TREND_DEFAULT_DAYS = 30
+
+# Rows per page for the infinite-scroll histories
+SYMPTOM_PAGE_SIZE = 50
+ACTIVITY_PAGE_SIZE = 20
+
+# kind -> (model name, timestamp field, loaded fields, item template)
+ACTIVITY_FEEDS = {
+    'searches': ('DrugSearch', 'searched_at', ('drug_name', 'searched_at'),
+                 'auth/_activity_searches.html'),
+    'interactions': ('DrugInteractionCheck', 'checked_at',
+                     ('drug1_name', 'drug2_name', 'severity', 'description', 'checked_at'),
+                     'auth/_activity_interactions.html'),
+}
 
 
 class CustomUserCreationForm(UserCreationForm):
@@ -48,11 +76,9 @@ def register(request):
             print(f"DEBUG: User created with role: {profile.role}")
             print(f"DEBUG: Profile role verification: {user.profile.role}")
             
-            # Auto-login after registration
+            # Auto-login after registration (user.profile is already cached from create())
             login(request, user)
             
-            # Refresh user from database to ensure profile is loaded
-            request.user.refresh_from_db()
             messages.success(request, f'Welcome to Happy Healthy, {user.username}!')
             
             # Redirect to disclaimer if not accepted
@@ -100,9 +126,6 @@ def custom_login(request):
         if user is not None:
             login(request, user)
             
-            # Refresh user from database to ensure profile is loaded
-            request.user.refresh_from_db()
-            
             print(f"DEBUG: Login - User {user.username} has role: {user.profile.role}")
             
             # Check if disclaimer accepted
@@ -147,32 +170,26 @@ This link will expire in 24 hours.
 Thank you,
 Happy Healthy Team'''
     
-    send_mail(
+    OutboundEmail.enqueue(
         'Verify Your Email - Happy Healthy',
         email_message,
-        settings.DEFAULT_FROM_EMAIL,
         [request.user.email],
-        fail_silently=False,
     )
     
     messages.success(request, f'Verification email sent to {request.user.email}')
     return redirect('home')
 
 
-@login_required
+@role_required('caregiver', message='Only caregivers can add patients.')
 def add_patient(request):
     """Caregiver adds a patient by username and email confirmation"""
-    if request.user.profile.role != 'caregiver':
-        messages.error(request, 'Only caregivers can add patients.')
-        return redirect('drug_home')
-    
     if request.method == 'POST':
         username = request.POST.get('username', '').strip()
         email = request.POST.get('email', '').strip()
         request_message = request.POST.get('request_message', '').strip()
         
         try:
-            patient = User.objects.get(username=username, email=email)
+            patient = User.objects.select_related('profile').get(username=username, email=email)
             
             # Check if patient is actually a patient
             if patient.profile.role != 'patient':
@@ -202,22 +219,17 @@ def add_patient(request):
                     request_message=request_message
                 )
                 
-                # Send notification email to patient
-                try:
-                    send_mail(
-                        'Caregiver Monitoring Request - Happy Healthy',
-                        f'Hello {patient.username},\n\n'
-                        f'{request.user.username} ({request.user.email}) has requested to monitor your health on Happy Healthy.\n\n'
-                        f'{f"Message: {request_message}" if request_message else ""}\n\n'
-                        f'Please log in to your account to approve or reject this request.\n\n'
-                        f'Best regards,\nHappy Healthy Team',
-                        settings.DEFAULT_FROM_EMAIL,
-                        [patient.email],
-                        fail_silently=True,
-                    )
-                    messages.success(request, f'Monitoring request sent to {username}. They will receive an email notification.')
-                except Exception as e:
-                    messages.success(request, f'Monitoring request sent to {username}. (Email notification may not have been sent)')
+                # Queue notification email to patient (sent by the outbox worker)
+                OutboundEmail.enqueue(
+                    'Caregiver Monitoring Request - Happy Healthy',
+                    f'Hello {patient.username},\n\n'
+                    f'{request.user.username} ({request.user.email}) has requested to monitor your health on Happy Healthy.\n\n'
+                    f'{f"Message: {request_message}" if request_message else ""}\n\n'
+                    f'Please log in to your account to approve or reject this request.\n\n'
+                    f'Best regards,\nHappy Healthy Team',
+                    [patient.email],
+                )
+                messages.success(request, f'Monitoring request sent to {username}. They will receive an email notification.')
             
             return redirect('caregiver_dashboard')
             
@@ -228,54 +240,60 @@ def add_patient(request):
     return render(request, 'auth/add_patient.html')
 
 
-@login_required
+@role_required('caregiver', message='Access denied. Caregivers only.')
 def caregiver_dashboard(request):
     """Dashboard for caregivers to manage patients"""
-    if request.user.profile.role != 'caregiver':
-        messages.error(request, 'Access denied. Caregivers only.')
-        return redirect('drug_home')
-    
     relationships = CaregiverPatientRelationship.objects.filter(
         caregiver=request.user
     ).select_related('patient', 'patient__profile').order_by('-created_at')
+    counts = relationships.status_counts()
     
     # Get concerning symptoms for all active patients
     from django.utils import timezone
     from datetime import timedelta
+    from django.db.models import F, Window
+    from django.db.models.functions import RowNumber
     
-    active_patients = relationships.filter(status='active').values_list('patient_id', flat=True)
     seven_days_ago = timezone.now() - timedelta(days=7)
     
+    # Latest few per patient (window query) so one patient can't crowd out the rest
     concerning_symptoms = SymptomRecord.objects.filter(
-        patient_id__in=active_patients,
+        patient__caregivers_assigned__caregiver=request.user,
+        patient__caregivers_assigned__status='active',
         is_concerning=True,
         recorded_at__gte=seven_days_ago
+    ).annotate(
+        patient_rank=Window(
+            RowNumber(),
+            partition_by=F('patient_id'),
+            order_by=F('recorded_at').desc()
+        )
+    ).filter(
+        patient_rank__lte=CONCERNING_SYMPTOMS_PER_PATIENT
     ).select_related('patient').order_by('-recorded_at')[:20]
     
     context = {
         'relationships': relationships,
-        'active_count': relationships.filter(status='active').count(),
-        'pending_count': relationships.filter(status='pending').count(),
+        'active_count': counts['active_count'],
+        'pending_count': counts['pending_count'],
         'concerning_symptoms': concerning_symptoms,
     }
     return render(request, 'auth/caregiver_dashboard.html', context)
 
 
-@login_required
+@role_required('patient', message='Access denied. Patients only.')
 def patient_requests(request):
     """View for patients to see and manage caregiver requests"""
-    if request.user.profile.role != 'patient':
-        messages.error(request, 'Access denied. Patients only.')
-        return redirect('drug_home')
-    
     requests = CaregiverPatientRelationship.objects.filter(
         patient=request.user
     ).select_related('caregiver', 'caregiver__profile').order_by('-created_at')
     
+    counts = requests.status_counts()
+    
     context = {
         'requests': requests,
-        'pending_count': requests.filter(status='pending').count(),
-        'active_count': requests.filter(status='active').count(),
+        'pending_count': counts['pending_count'],
+        'active_count': counts['active_count'],
     }
     return render(request, 'auth/patient_requests.html', context)
 
@@ -284,13 +302,15 @@ def patient_requests(request):
 def approve_caregiver(request, relationship_id):
     """Patient approves a caregiver monitoring request"""
     relationship = get_object_or_404(
-        CaregiverPatientRelationship, 
+        CaregiverPatientRelationship.objects.select_related('caregiver'), 
         id=relationship_id, 
         patient=request.user
     )
     
-    relationship.approve()
-    messages.success(request, f'{relationship.caregiver.username} can now monitor your medications.')
+    if relationship.approve():
+        messages.success(request, f'{relationship.caregiver.username} can now monitor your medications.')
+    else:
+        messages.info(request, f'This request is {relationship.get_status_display().lower()} and can no longer be approved.')
     return redirect('patient_requests')
 
 
@@ -298,13 +318,15 @@ def approve_caregiver(request, relationship_id):
 def reject_caregiver(request, relationship_id):
     """Patient rejects a caregiver monitoring request"""
     relationship = get_object_or_404(
-        CaregiverPatientRelationship, 
+        CaregiverPatientRelationship.objects.select_related('caregiver'), 
         id=relationship_id, 
         patient=request.user
     )
     
-    relationship.reject()
-    messages.success(request, f'Monitoring request from {relationship.caregiver.username} rejected.')
+    if relationship.reject():
+        messages.success(request, f'Monitoring request from {relationship.caregiver.username} rejected.')
+    else:
+        messages.info(request, f'This request is already {relationship.get_status_display().lower()}.')
     return redirect('patient_requests')
 
 
@@ -312,23 +334,21 @@ def reject_caregiver(request, relationship_id):
 def remove_patient(request, relationship_id):
     """Caregiver removes a patient from monitoring"""
     relationship = get_object_or_404(
-        CaregiverPatientRelationship, 
+        CaregiverPatientRelationship.objects.select_related('patient'), 
         id=relationship_id, 
         caregiver=request.user
     )
     
-    relationship.remove()
-    messages.success(request, f'Stopped monitoring {relationship.patient.username}.')
+    if relationship.remove():
+        messages.success(request, f'Stopped monitoring {relationship.patient.username}.')
+    else:
+        messages.info(request, f'You are not monitoring {relationship.patient.username}.')
     return redirect('caregiver_dashboard')
 
 
-@login_required
+@role_required('caregiver', message='Access denied.', redirect_to='home')
 def patient_activity(request, patient_id):
     """View patient's drug activity (for caregivers only)"""
-    if request.user.profile.role != 'caregiver':
-        messages.error(request, 'Access denied.')
-        return redirect('home')
-    
     # Verify caregiver has active relationship with patient
     relationship = get_object_or_404(
         CaregiverPatientRelationship,
@@ -337,23 +357,71 @@ def patient_activity(request, patient_id):
         status='active'
     )
     
-    from drug_checker.models import DrugSearch, DrugInteractionCheck, SavedDrug
+    from drug_checker.models import InteractionAlert, SavedDrug
     
     patient = relationship.patient
-    searches = DrugSearch.objects.filter(user=patient).order_by('-searched_at')[:20]
-    interactions = DrugInteractionCheck.objects.filter(user=patient).order_by('-checked_at')[:20]
-    saved_drugs = SavedDrug.objects.filter(user=patient).order_by('-created_at')
+    searches, searches_cursor = _activity_page(patient_id, 'searches')
+    interactions, interactions_cursor = _activity_page(patient_id, 'interactions')
+    saved_drugs = SavedDrug.objects.filter(user=patient).only(
+        'drug_name', 'drugbank_id', 'notes', 'created_at'
+    ).order_by('-created_at')
     
     context = {
         'patient': patient,
         'relationship': relationship,
         'searches': searches,
+        'searches_cursor': searches_cursor,
+        'searches_feed_url': reverse('patient_activity_feed', args=[patient_id, 'searches']),
         'interactions': interactions,
+        'interactions_cursor': interactions_cursor,
+        'interactions_feed_url': reverse('patient_activity_feed', args=[patient_id, 'interactions']),
         'saved_drugs': saved_drugs,
+        'interaction_alerts': InteractionAlert.for_user(patient),
     }
     return render(request, 'auth/patient_activity.html', context)
 
 
+@role_required('caregiver', message='Access denied.', redirect_to='home', json=True)
+def patient_activity_feed(request, patient_id, kind):
+    """Next page of a patient's searches or interaction checks for infinite scroll"""
+    if kind not in ACTIVITY_FEEDS:
+        raise Http404('Unknown activity feed')
+    if not CaregiverPatientRelationship.objects.filter(
+        caregiver=request.user, patient_id=patient_id, status='active'
+    ).exists():
+        raise Http404('No active relationship with this patient')
+    
+    try:
+        items, next_cursor = _activity_page(patient_id, kind, request.GET.get('cursor'))
+    except InvalidCursor as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    html = render_to_string(ACTIVITY_FEEDS[kind][3], {kind: items}, request=request)
+    return JsonResponse({'html': html, 'next_cursor': next_cursor})
+
+
+def _activity_page(patient_id, kind, cursor=None):
+    from django.apps import apps
+    
+    model_name, field, fields, _ = ACTIVITY_FEEDS[kind]
+    model = apps.get_model('drug_checker', model_name)
+    return keyset_page(
+        model.objects.filter(user_id=patient_id).only(*fields),
+        field, cursor=cursor, page_size=ACTIVITY_PAGE_SIZE
+    )
+
+
+def send_outbox(request):
+    """Send one batch of queued email; called by the Vercel cron with CRON_SECRET"""
+    secret = settings.CRON_SECRET
+    authorization = request.headers.get('Authorization', '')
+    if not secret or not hmac.compare_digest(authorization.encode(), f'Bearer {secret}'.encode()):
+        return JsonResponse({'error': 'Forbidden'}, status=403)
+    
+    sent, failed = OutboundEmail.send_due(settings.OUTBOX_CRON_BATCH_SIZE)
+    return JsonResponse({'sent': sent, 'failed': failed})
+
+
 def guest_continue(request):
     """Allow users to continue as guest"""
     request.session['is_guest'] = True
@@ -370,13 +438,9 @@ def logout_view(request):
     return redirect('landing')
 
 
-@login_required
+@role_required('patient', message='Only patients can record symptoms.')
 def record_symptom(request):
     """Record a new symptom (patients only)"""
-    if request.user.profile.role != 'patient':
-        messages.error(request, 'Only patients can record symptoms.')
-        return redirect('drug_home')
-    
     if request.method == 'POST':
         symptom_type = request.POST.get('symptom_type')
         severity = request.POST.get('severity')
@@ -393,17 +457,30 @@ def record_symptom(request):
             # Check if concerning and notify caregivers
             if symptom.is_concerning:
                 # Get all active caregivers
-                relationships = CaregiverPatientRelationship.objects.filter(
+                caregiver_emails = CaregiverPatientRelationship.objects.filter(
                     patient=request.user,
                     status='active'
-                )
+                ).values_list('caregiver__email', flat=True)
                 
-                # Mark as notified (in real app, send actual notifications)
-                symptom.caregiver_notified = True
-                symptom.save()
+                alerts = OutboundEmail.enqueue(
+                    f'Concerning Symptom Alert: {request.user.username} - Happy Healthy',
+                    f'Hello,\n\n'
+                    f'{request.user.username} recorded a concerning symptom on Happy Healthy:\n\n'
+                    f'{symptom.get_symptom_type_display()} ({symptom.get_severity_display()})\n'
+                    f'{f"Notes: {notes}" if notes else ""}\n\n'
+                    f'Please log in to your caregiver dashboard for details.\n\n'
+                    f'Best regards,\nHappy Healthy Team',
+                    caregiver_emails,
+                )
                 
-                messages.warning(request, 
-                    f'Symptom recorded. This is flagged as concerning - your caregivers have been notified.')
+                if alerts:
+                    symptom.caregiver_notified = True
+                    symptom.save(update_fields=['caregiver_notified'])
+                    messages.warning(request, 
+                        'Symptom recorded. This is flagged as concerning - your caregivers have been notified.')
+                else:
+                    messages.warning(request, 
+                        'Symptom recorded. This is flagged as concerning - consider adding a caregiver.')
             else:
                 messages.success(request, 'Symptom recorded successfully.')
             
@@ -416,29 +493,130 @@ def record_symptom(request):
     return render(request, 'auth/record_symptom.html', context)
 
 
-@login_required
+@role_required('patient', message='Only patients can view symptom records.')
 def my_symptoms(request):
     """View patient's symptom history"""
-    if request.user.profile.role != 'patient':
-        messages.error(request, 'Only patients can view symptom records.')
-        return redirect('drug_home')
-    
-    symptoms = SymptomRecord.objects.filter(patient=request.user).order_by('-recorded_at')
-    
-    # Get statistics
-    total_symptoms = symptoms.count()
-    concerning_count = symptoms.filter(is_concerning=True).count()
+    symptoms, next_cursor = keyset_page(
+        SymptomRecord.objects.filter(patient=request.user), 'recorded_at', page_size=SYMPTOM_PAGE_SIZE
+    )
     
-    # Recent 30 days
-    from django.utils import timezone
-    from datetime import timedelta
-    thirty_days_ago = timezone.now() - timedelta(days=30)
-    recent_symptoms = symptoms.filter(recorded_at__gte=thirty_days_ago)
+    # Statistics come from the per-patient rollup row, not a scan of the history
+    summary = PatientSymptomSummary.for_patient(request.user)
     
     context = {
-        'symptoms': symptoms[:50],  # Last 50 symptoms
-        'total_symptoms': total_symptoms,
-        'concerning_count': concerning_count,
-        'recent_count': recent_symptoms.count(),
+        'symptoms': symptoms,
+        'next_cursor': next_cursor,
+        'feed_url': reverse('my_symptoms_feed'),
+        'total_symptoms': summary.total_count,
+        'concerning_count': summary.concerning_count,
+        'recent_count': summary.recent_count(days=30),
+        'summary': summary,
     }
     return render(request, 'auth/my_symptoms.html', context)
+
+
+@role_required('patient', message='Only patients can view symptom records.', json=True)
+def my_symptoms_feed(request):
+    """Next page of the patient's symptom history for infinite scroll"""
+    try:
+        symptoms, next_cursor = keyset_page(
+            SymptomRecord.objects.filter(patient=request.user), 'recorded_at',
+            cursor=request.GET.get('cursor'), page_size=SYMPTOM_PAGE_SIZE
+        )
+    except InvalidCursor as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    html = render_to_string('auth/_symptom_items.html', {'symptoms': symptoms}, request=request)
+    return JsonResponse({'html': html, 'next_cursor': next_cursor})
+
+
+@role_required('caregiver', message='Access denied. Caregivers only.', json=True)
+def symptom_trends_api(request):
+    """Per-patient, per-symptom-type severity aggregates bucketed by day or week
+    
+    Query params: start / end (YYYY-MM-DD, inclusive), bucket (day|week),
+    patient (repeatable patient ids) and type (repeatable symptom types).
+    Reads the pre-grouped SymptomDailyRollup rows; weeks (starting Monday)
+    are folded from days since the rollup keeps severity sums.
+    """
+    from datetime import timedelta
+    from django.utils import timezone
+    from django.utils.dateparse import parse_date
+    
+    bucket = request.GET.get('bucket', 'day')
+    if bucket not in ('day', 'week'):
+        return JsonResponse({'error': 'bucket must be "day" or "week"'}, status=400)
+    
+    def date_param(name, default):
+        # Only a missing value falls back; a malformed one is an error
+        value = request.GET.get(name, '')
+        if not value:
+            return default
+        parsed = parse_date(value)
+        if parsed is None:
+            raise ValueError(value)
+        return parsed
+    
+    try:
+        end = date_param('end', timezone.localdate())
+        start = date_param('start', end - timedelta(days=TREND_DEFAULT_DAYS - 1))
+        patient_ids = [int(pk) for pk in request.GET.getlist('patient')]
+    except ValueError:
+        return JsonResponse({'error': 'Invalid date or patient id'}, status=400)
+    if start > end:
+        return JsonResponse({'error': 'start must not be after end'}, status=400)
+    
+    relationships = CaregiverPatientRelationship.objects.filter(caregiver=request.user, status='active')
+    if patient_ids:
+        relationships = relationships.filter(patient_id__in=patient_ids)
+    patients = dict(relationships.values_list('patient_id', 'patient__username'))
+    
+    rollups = SymptomDailyRollup.objects.filter(patient_id__in=list(patients), day__range=(start, end))
+    symptom_types = request.GET.getlist('type')
+    if symptom_types:
+        rollups = rollups.filter(symptom_type__in=symptom_types)
+    rows = rollups.order_by('patient_id', 'symptom_type', 'day').values_list(
+        'patient_id', 'symptom_type', 'day', 'count', 'concerning_count', 'severity_sum', 'max_severity'
+    )
+    
+    series = {pk: {} for pk in patients}
+    for patient_id, symptom_type, day, count, concerning, severity_sum, max_severity in rows:
+        period = day - timedelta(days=day.weekday()) if bucket == 'week' else day
+        points = series[patient_id].setdefault(symptom_type, [])
+        if points and points[-1][0] == period:
+            point = points[-1]
+            point[1] += count
+            point[2] += concerning
+            point[3] += severity_sum
+            point[4] = max(point[4], max_severity)
+        else:
+            points.append([period, count, concerning, severity_sum, max_severity])
+    
+    return JsonResponse({
+        'bucket': bucket,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'patients': [
+            {
+                'patient_id': pk,
+                'username': username,
+                'series': [
+                    {
+                        'symptom_type': symptom_type,
+                        'points': [
+                            {
+                                'period': period.isoformat(),
+                                'count': count,
+                                'concerning': concerning,
+                                'avg_severity': round(severity_sum / count, 2),
+                                'max_severity': max_severity,
+                            }
+                            for period, count, concerning, severity_sum, max_severity in points
+                        ],
+                    }
+                    for symptom_type, points in series[pk].items()
+                ],
+            }
+            for pk, username in patients.items()
+        ],
+    })
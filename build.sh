@@ -3,8 +3,17 @@
 # Install dependencies
 pip install -r requirements.txt
 
-# Collect static files
-python manage.py collectstatic --noinput
+# Rebuild the purged stylesheet from the templates (and the DrugBank SQLite
+# store and client-side drug search index when enabled), then collect static files
+# (the DrugBank XML is licensed data and must never be published as a static file)
+python manage.py build_css
+if [ "$DRUGBANK_BACKEND" = "sqlite" ]; then
+    python manage.py build_drugbank_sqlite
+fi
+if [ "$DRUG_CLIENT_INDEX" = "True" ]; then
+    python manage.py build_drug_index
+fi
+python manage.py collectstatic --noinput --ignore "*.xml"
 
 # Run migrations
 python manage.py migrate --noinput
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import DrugSearch, DrugInteractionCheck, SavedDrug
+from .models import DrugSearch, DrugInteractionCheck, InteractionAlert, SavedDrug
 
 @admin.register(DrugSearch)
 class DrugSearchAdmin(admin.ModelAdmin):
@@ -24,3 +24,11 @@ class SavedDrugAdmin(admin.ModelAdmin):
     search_fields = ('drug_name', 'drugbank_id', 'user__username')
     date_hierarchy = 'created_at'
     ordering = ('-created_at',)
+
+@admin.register(InteractionAlert)
+class InteractionAlertAdmin(admin.ModelAdmin):
+    list_display = ('saved_drug', 'other_drug', 'severity', 'user', 'created_at')
+    list_filter = ('severity', 'created_at')
+    search_fields = ('saved_drug__drug_name', 'other_drug__drug_name', 'user__username')
+    date_hierarchy = 'created_at'
+    ordering = ('-created_at',)
@@ -0,0 +1,117 @@
+import sys
+from bisect import bisect_left
+
+
+# Alias types, best first: a drug matched on its own name outranks one
+# matched on a brand, product or synonym spelled the same way
+ALIAS_TYPES = ('name', 'id', 'brand', 'product', 'synonym')
+_RANKS = {alias_type: rank for rank, alias_type in enumerate(ALIAS_TYPES)}
+
+
+def rank_matches(needle, candidates, limit=None):
+    """(drug ID, matched alias, alias type) per drug, best match first
+
+    ``candidates`` are (lowercased key, drug ID, type rank, alias) rows whose
+    key contains ``needle``. Exact matches come before prefix matches, which
+    come before substring matches; ties go to the better alias type, then
+    the shorter alias, then alphabetical order, so the ranking doesn't depend
+    on the order candidates arrive in.
+    """
+    best = {}
+    for key, drugbank_id, rank, alias in candidates:
+        position = 0 if key == needle else 1 if key.startswith(needle) else 2
+        score = (position, rank, len(key), key, alias)
+        if drugbank_id not in best or score < best[drugbank_id][0]:
+            best[drugbank_id] = (score, alias, rank)
+    ranked = sorted(best.items(), key=lambda item: (item[1][0], item[0]))[:limit]
+    return [(drugbank_id, alias, ALIAS_TYPES[rank]) for drugbank_id, (_, alias, rank) in ranked]
+
+
+class AliasIndex:
+    """Deduplicated alias -> DrugBank ID map over names, IDs, brands, products and synonyms
+
+    The full export repeats each product name once per package and labeller;
+    every (alias, drug) pair is kept once, with its best type, and all strings
+    are interned. Keys are lowercased and sorted, so prefix matches are a
+    binary search and substring matches one pass over the keys.
+    """
+
+    def __init__(self):
+        self.keys = []
+        self._entries = {}
+
+    @classmethod
+    def from_root(cls, root, namespace):
+        index = cls()
+        for drug in root.findall('db:drug', namespace):
+            id_elem = drug.find('db:drugbank-id[@primary="true"]', namespace)
+            if id_elem is None or not id_elem.text:
+                continue
+            drugbank_id = id_elem.text
+            index.add(drugbank_id, drug.findtext('db:name', '', namespace), 'name')
+            index.add(drugbank_id, drugbank_id, 'id')
+            for path, alias_type in (
+                ('db:international-brands/db:international-brand/db:name', 'brand'),
+                ('db:products/db:product/db:name', 'product'),
+                ('db:synonyms/db:synonym', 'synonym'),
+            ):
+                for elem in drug.findall(path, namespace):
+                    index.add(drugbank_id, elem.text, alias_type)
+        index.finish()
+        return index
+
+    def add(self, drugbank_id, alias, alias_type):
+        alias = (alias or '').strip()
+        if not alias:
+            return
+        key = sys.intern(alias.lower())
+        drugs = self._entries.setdefault(key, {})
+        rank = _RANKS[alias_type]
+        if drugbank_id not in drugs or rank < drugs[drugbank_id][0]:
+            drugs[sys.intern(drugbank_id)] = (rank, sys.intern(alias))
+
+    def finish(self):
+        """Sort the keys and pack each key's drugs into a tuple"""
+        self._entries = {
+            key: tuple((drugbank_id, rank, alias) for drugbank_id, (rank, alias) in drugs.items())
+            for key, drugs in self._entries.items()
+        }
+        self.keys = sorted(self._entries)
+
+    def search(self, query, limit=None):
+        """(drug ID, matched alias, alias type) per matching drug, best match first"""
+        needle = query.strip().lower()
+        if not needle:
+            return []
+        candidates = []
+        index = bisect_left(self.keys, needle)
+        while index < len(self.keys) and self.keys[index].startswith(needle):
+            candidates.extend((self.keys[index], *entry) for entry in self._entries[self.keys[index]])
+            index += 1
+        # Prefix matches outrank any substring match, so stop if there are enough
+        if limit is None or len({drugbank_id for _, drugbank_id, _, _ in candidates}) < limit:
+            candidates.extend(
+                (key, *entry)
+                for key in self.keys if needle in key and not key.startswith(needle)
+                for entry in self._entries[key]
+            )
+        return rank_matches(needle, candidates, limit)
+
+    def rows(self):
+        """Every (key, drug ID, type rank, alias) entry, in key order"""
+        for key in self.keys:
+            for entry in self._entries[key]:
+                yield (key, *entry)
+
+    def aliases_of(self, types=ALIAS_TYPES):
+        """Drug ID -> aliases of the given types, for building other indexes"""
+        ranks = {_RANKS[alias_type] for alias_type in types}
+        aliases = {}
+        for _, drugbank_id, rank, alias in self.rows():
+            if rank in ranks:
+                aliases.setdefault(drugbank_id, []).append(alias)
+        return aliases
+
+    @property
+    def count(self):
+        return sum(len(drugs) for drugs in self._entries.values())
@@ -0,0 +1,124 @@
+import sys
+from collections import Counter
+
+
+# Code length at each ATC level: anatomical group (B), therapeutic subgroup
+# (B01), pharmacological subgroup (B01A), chemical subgroup (B01AA), substance
+LEVEL_LENGTHS = (1, 3, 4, 5, 7)
+
+# Levels with class-to-class interaction counts precomputed at load
+SUMMARY_LEVELS = (2, 3)
+
+
+def level_of(code):
+    """ATC level (1-5) of a code, or None if its length isn't a level boundary"""
+    return LEVEL_LENGTHS.index(len(code)) + 1 if len(code) in LEVEL_LENGTHS else None
+
+
+class ATCIndex:
+    """Prefix tree over ATC codes with every drug stored once in depth-first order
+
+    Each class covers the contiguous range ``drugs[start:end]`` of drugs filed
+    under it or any subclass, so "all drugs under B01A" is one slice and costs
+    the size of the result. ``summary`` counts interacting drug pairs between
+    each two classes at SUMMARY_LEVELS.
+    """
+
+    def __init__(self):
+        self.labels = {}
+        self.codes = {}
+        self.drugs = []
+        self.summary = {}
+        self._children = {'': set()}
+        self._filed = {}
+        self._ranges = {}
+
+    @classmethod
+    def from_root(cls, root, namespace):
+        index = cls()
+        for drug in root.findall('db:drug', namespace):
+            id_elem = drug.find('db:drugbank-id[@primary="true"]', namespace)
+            if id_elem is None or not id_elem.text:
+                continue
+            for atc in drug.findall('db:atc-codes/db:atc-code', namespace):
+                index.add(id_elem.text, atc.get('code', ''), {
+                    level.get('code', ''): level.text for level in atc.findall('db:level', namespace)
+                })
+        index.finish()
+        return index
+
+    def add(self, drugbank_id, code, labels=None):
+        """File a drug under one ATC code; ``labels`` maps ancestor codes to their names"""
+        code = sys.intern(code.strip().upper())
+        if not code:
+            return
+        for level_code, label in (labels or {}).items():
+            if level_code and label:
+                self.labels.setdefault(sys.intern(level_code.strip().upper()), label)
+
+        parent = ''
+        for prefix in [code[:length] for length in LEVEL_LENGTHS if length < len(code)] + [code]:
+            prefix = sys.intern(prefix)
+            self._children[parent].add(prefix)
+            self._children.setdefault(prefix, set())
+            parent = prefix
+        self._filed.setdefault(code, []).append(drugbank_id)
+        self.codes[drugbank_id] = self.codes.get(drugbank_id, ()) + (code,)
+
+    def finish(self):
+        """Lay drugs out depth-first so each class is one contiguous range"""
+        self.drugs = []
+        self._ranges = {}
+        stack = [('', False)]
+        while stack:
+            code, done = stack.pop()
+            if done:
+                self._ranges[code] = (self._ranges[code], len(self.drugs))
+                continue
+            self._ranges[code] = len(self.drugs)
+            self.drugs.extend(self._filed.get(code, ()))
+            stack.append((code, True))
+            stack.extend((child, False) for child in sorted(self._children[code], reverse=True))
+
+    def drugs_under(self, code):
+        """Drug IDs filed under an ATC class or any of its subclasses"""
+        start, end = self._ranges.get(code.strip().upper(), (0, 0))
+        # A drug with two codes in one class appears twice in its range
+        return list(dict.fromkeys(self.drugs[start:end]))
+
+    def has_class(self, code):
+        code = code.strip().upper()
+        return bool(code) and code in self._ranges
+
+    def label(self, code):
+        return self.labels.get(code, '')
+
+    def codes_of(self, drugbank_id):
+        return self.codes.get(drugbank_id, ())
+
+    def classes_of(self, drugbank_id, level):
+        """Codes of the ATC classes a drug belongs to at one level"""
+        length = LEVEL_LENGTHS[level - 1]
+        return sorted({code[:length] for code in self.codes_of(drugbank_id) if len(code) >= length})
+
+    def summarize(self, pairs):
+        """Count interacting drug pairs between classes, given each (id, id) pair once"""
+        classes = {
+            drugbank_id: [code for level in SUMMARY_LEVELS for code in self.classes_of(drugbank_id, level)]
+            for drugbank_id in self.codes
+        }
+        counts = Counter()
+        for first, second in pairs:
+            first, second = classes.get(first), classes.get(second)
+            if first and second:
+                # One set per pair so a drug with two codes in a class counts once
+                counts.update({(a, b) if a <= b else (b, a) for a in first for b in second if len(a) == len(b)})
+        self.summary = dict(counts)
+
+    def pairs_between(self, code_1, code_2):
+        """Precomputed number of interacting drug pairs between two classes"""
+        return self.summary.get((code_1, code_2) if code_1 <= code_2 else (code_2, code_1), 0)
+
+    @property
+    def count(self):
+        return len(self._ranges) - 1
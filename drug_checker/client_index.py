@@ -0,0 +1,48 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.templatetags.static import static
+
+
+# Path of the index inside STATICFILES_DIRS; collectstatic adds the content
+# hash and the .gz/.br siblings
+INDEX_PATH = 'drugs/drug-index.json'
+
+
+def build_index(drugs, generation=None, brands=None):
+    """Compact search index: one [id, name, synonyms, type code, brand names] row per drug"""
+    brands = brands or {}
+    types = sorted({drug.get('type', 'small molecule') for drug in drugs})
+    type_codes = {name: code for code, name in enumerate(types)}
+    return {
+        'generation': generation,
+        'types': types,
+        'drugs': [
+            [drug['drugbank_id'], drug['name'], drug.get('synonyms', []),
+             type_codes[drug.get('type', 'small molecule')], brands.get(drug['drugbank_id'], [])]
+            for drug in drugs
+        ],
+    }
+
+
+def write_index(index, static_dir=None):
+    """Write the index as minified JSON under the project static directory"""
+    static_dir = Path(static_dir or settings.STATICFILES_DIRS[0])
+    path = static_dir / INDEX_PATH
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(index, separators=(',', ':'), ensure_ascii=False), encoding='utf-8')
+    return path
+
+
+def index_url():
+    """Hashed URL of the client index, or None when the mode is off or it isn't built"""
+    if not getattr(settings, 'DRUG_CLIENT_INDEX', False):
+        return None
+    if not (Path(settings.STATICFILES_DIRS[0]) / INDEX_PATH).exists():
+        return None
+    try:
+        return static(INDEX_PATH)
+    except ValueError:
+        # Built after the last collectstatic; the manifest has no entry yet
+        return None
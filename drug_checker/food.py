@@ -0,0 +1,81 @@
+import re
+import sys
+
+
+# Food keyword -> (label, pattern) for the reverse index; matched case-insensitively
+# against each <food-interaction> sentence
+FOOD_KEYWORDS = {
+    'grapefruit': ('Grapefruit', r'grapefruit'),
+    'alcohol': ('Alcohol', r'alcohol|ethanol'),
+    'caffeine': ('Caffeine', r'caffeine|coffee'),
+    'dairy': ('Dairy & calcium', r'dairy|milk|calcium'),
+    'st_johns_wort': ("St. John's Wort", r"st\.? john'?s wort"),
+    'herbal': ('Herbal supplements', r'herbs?|herbal|supplements?'),
+    'vitamin_k': ('Vitamin K', r'vitamin k'),
+    'potassium': ('Potassium', r'potassium'),
+    'iron': ('Iron', r'iron'),
+    'tyramine': ('Tyramine', r'tyramine'),
+    'with_food': ('Take with food', r'with (?:food|a meal|meals)'),
+    'empty_stomach': ('Empty stomach', r'empty stomach'),
+}
+_PATTERNS = {keyword: re.compile(rf'\b(?:{pattern})\b', re.I) for keyword, (_, pattern) in FOOD_KEYWORDS.items()}
+
+
+class FoodInteractionIndex:
+    """Per-drug food advice plus a reverse index from food keyword to drug IDs
+
+    Food sentences repeat across thousands of drugs ("Avoid alcohol."), so
+    each distinct sentence is interned and classified once.
+    """
+
+    def __init__(self):
+        self.advice = {}
+        self.by_keyword = {keyword: set() for keyword in FOOD_KEYWORDS}
+        self._keywords = {}
+
+    @classmethod
+    def from_root(cls, root, namespace):
+        index = cls()
+        for drug in root.findall('db:drug', namespace):
+            id_elem = drug.find('db:drugbank-id[@primary="true"]', namespace)
+            foods_elem = drug.find('db:food-interactions', namespace)
+            if id_elem is None or foods_elem is None:
+                continue
+            index.add(id_elem.text, [food.text for food in foods_elem.findall('db:food-interaction', namespace)])
+        return index
+
+    def add(self, drugbank_id, sentences):
+        sentences = tuple(sys.intern(text.strip()) for text in sentences if text and text.strip())
+        if not sentences:
+            return
+        self.advice[drugbank_id] = sentences
+        for text in sentences:
+            for keyword in self.keywords(text):
+                self.by_keyword[keyword].add(drugbank_id)
+
+    def keywords(self, text):
+        """Food keywords mentioned in one sentence"""
+        keywords = self._keywords.get(text)
+        if keywords is None:
+            keywords = self._keywords[text] = tuple(
+                keyword for keyword, pattern in _PATTERNS.items() if pattern.search(text)
+            )
+        return keywords
+
+    def drugs_for(self, keyword):
+        return self.by_keyword.get(keyword, set())
+
+    def check(self, drugbank_ids, foods=None):
+        """Advice for each drug in a regimen and, per food, the regimen drugs it affects"""
+        regimen = set(drugbank_ids)
+        foods = [food for food in (foods or FOOD_KEYWORDS) if food in FOOD_KEYWORDS]
+        by_food = []
+        for food in foods:
+            affected = self.by_keyword[food] & regimen
+            if affected:
+                by_food.append((food, sorted(affected)))
+        return {drugbank_id: self.advice.get(drugbank_id, ()) for drugbank_id in drugbank_ids}, by_food
+
+    @property
+    def count(self):
+        return sum(len(sentences) for sentences in self.advice.values())
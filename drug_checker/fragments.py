@@ -0,0 +1,58 @@
+import json
+
+from django.http import HttpResponse
+
+try:
+    import orjson
+except ImportError:  # Optional; the stdlib encoder gives the same JSON, more slowly
+    orjson = None
+
+
+# Per-request keys match_drugs adds to a copy of a cached drug record
+ANNOTATIONS = ('matched', 'match_type')
+
+
+def dumps(value):
+    """Encode a value as compact UTF-8 JSON bytes, with orjson when it's installed"""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+class DrugFragments:
+    """Each cached drug record's JSON, encoded on first use and reused for the dataset generation
+
+    A record annotated by match_drugs reuses its drug's fragment with the
+    annotation keys spliced in before the closing brace.
+    """
+
+    def __init__(self, generation):
+        self.generation = generation
+        self._encoded = {}
+
+    def encode(self, drug):
+        fragment = self._encoded.get(drug['drugbank_id'])
+        if fragment is None:
+            record = {key: value for key, value in drug.items() if key not in ANNOTATIONS}
+            fragment = self._encoded[drug['drugbank_id']] = dumps(record)
+        annotations = {key: drug[key] for key in ANNOTATIONS if key in drug}
+        if annotations:
+            fragment = fragment[:-1] + b',' + dumps(annotations)[1:]
+        return fragment
+
+    def __len__(self):
+        return len(self._encoded)
+
+
+class FragmentJsonResponse(HttpResponse):
+    """A JSON object response whose list values are already-encoded fragments
+
+    ``data`` holds the small dynamic part, encoded per request; each keyword
+    argument is a list of encoded values joined into an array without
+    re-encoding.
+    """
+
+    def __init__(self, data, status=200, **arrays):
+        parts = [dumps(key) + b':[' + b','.join(fragments) + b']' for key, fragments in arrays.items()]
+        parts.extend(dumps(key) + b':' + dumps(value) for key, value in data.items())
+        super().__init__(b'{' + b','.join(parts) + b'}', content_type='application/json', status=status)
@@ -0,0 +1,158 @@
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from main.metrics import Metrics
+from .models import DrugSearch, DrugInteractionCheck
+
+logger = logging.getLogger(__name__)
+
+
+class HistoryLogger:
+    """Write-behind buffer for search and interaction history (Singleton Pattern)
+
+    Views enqueue unsaved model instances in memory and a background thread
+    writes them with ``bulk_create`` every ``DRUG_HISTORY_FLUSH_SIZE`` events
+    or ``DRUG_HISTORY_FLUSH_INTERVAL`` seconds, whichever comes first. Pending
+    events are flushed at interpreter exit so a graceful worker shutdown does
+    not drop them. ``searched_at`` / ``checked_at`` are stamped at flush time,
+    so they can lag the request by up to one flush interval.
+
+    With ``DRUG_HISTORY_FLUSH_PER_REQUEST`` (the default on serverless
+    deploys, where the process can be frozen as soon as it responds) no
+    thread is started and HistoryFlushMiddleware writes each request's
+    events before its response is returned.
+    """
+
+    # Class-level shared buffer (singleton pattern)
+    _shared_pending = []
+    _buffer_lock = threading.Lock()
+    _flush_lock = threading.Lock()
+    _wakeup = threading.Event()
+    _flush_thread = None
+
+    @property
+    def flush_size(self):
+        return getattr(settings, 'DRUG_HISTORY_FLUSH_SIZE', 50)
+
+    @property
+    def flush_interval(self):
+        return getattr(settings, 'DRUG_HISTORY_FLUSH_INTERVAL', 5.0)
+
+    @property
+    def flush_per_request(self):
+        return getattr(settings, 'DRUG_HISTORY_FLUSH_PER_REQUEST', False)
+
+    def log_search(self, user, drug_name, drugbank_id=''):
+        """Queue a DrugSearch row for the given user"""
+        self._enqueue(DrugSearch(
+            user_id=user.pk if user is not None else None,
+            drug_name=drug_name[:255],
+            drugbank_id=drugbank_id[:20]
+        ))
+
+    def log_interaction(self, user, drug1_name, drug1_id, drug2_name, drug2_id,
+                        severity='minor', description=''):
+        """Queue a DrugInteractionCheck row for the given user"""
+        self._enqueue(DrugInteractionCheck(
+            user_id=user.pk if user is not None else None,
+            drug1_name=drug1_name[:255],
+            drug1_id=drug1_id[:20],
+            drug2_name=drug2_name[:255],
+            drug2_id=drug2_id[:20],
+            severity=severity,
+            description=description
+        ))
+
+    def pending_count(self):
+        """Number of events waiting to be written"""
+        return len(HistoryLogger._shared_pending)
+
+    def flush(self):
+        """Write all pending events, one bulk_create per model. Returns rows written."""
+        with HistoryLogger._flush_lock:
+            with HistoryLogger._buffer_lock:
+                pending = HistoryLogger._shared_pending
+                HistoryLogger._shared_pending = []
+
+            if not pending:
+                return 0
+
+            by_model = {}
+            for obj in pending:
+                by_model.setdefault(type(obj), []).append(obj)
+
+            written = 0
+            for model, objs in by_model.items():
+                try:
+                    model.objects.bulk_create(objs, batch_size=500)
+                    written += len(objs)
+                except Exception:
+                    logger.exception('Dropped %d %s history rows', len(objs), model.__name__)
+                    Metrics().inc('drug_history_dropped_total', len(objs), model=model.__name__)
+            return written
+
+    def _enqueue(self, obj):
+        with HistoryLogger._buffer_lock:
+            HistoryLogger._shared_pending.append(obj)
+            full = len(HistoryLogger._shared_pending) >= self.flush_size
+
+        if self.flush_interval <= 0 or self.flush_per_request:
+            # No background writer configured: flush inline once the batch is full
+            if full:
+                self.flush()
+            return
+
+        self._ensure_flush_thread()
+        if full:
+            HistoryLogger._wakeup.set()
+
+    def _ensure_flush_thread(self):
+        if HistoryLogger._flush_thread is not None and HistoryLogger._flush_thread.is_alive():
+            return
+
+        with HistoryLogger._buffer_lock:
+            # Double-check after acquiring lock
+            if HistoryLogger._flush_thread is not None and HistoryLogger._flush_thread.is_alive():
+                return
+
+            interval = self.flush_interval
+
+            def flush_periodically():
+                while True:
+                    HistoryLogger._wakeup.wait(timeout=interval)
+                    HistoryLogger._wakeup.clear()
+                    try:
+                        self.flush()
+                    finally:
+                        close_old_connections()
+
+            HistoryLogger._flush_thread = threading.Thread(
+                target=flush_periodically, name='drug-history-flush', daemon=True
+            )
+            HistoryLogger._flush_thread.start()
+
+
+class HistoryFlushMiddleware:
+    """Write buffered history before the response is returned when DRUG_HISTORY_FLUSH_PER_REQUEST is set"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        history = HistoryLogger()
+        if history.flush_per_request and history.pending_count():
+            history.flush()
+        return response
+
+
+def flush_history():
+    """Shutdown hook: write any events still buffered in this process"""
+    HistoryLogger().flush()
+
+
+atexit.register(flush_history)
@@ -0,0 +1,188 @@
+import sys
+from array import array
+from bisect import bisect_left
+
+
+# Slot markers substituted for the two drug names in an interned template
+SUBJECT = '\x001'
+PARTNER = '\x002'
+
+
+def render(template, subject, partner):
+    """Fill an interned template's slots with the two drug names"""
+    return template.replace(SUBJECT, subject).replace(PARTNER, partner)
+
+
+class InteractionStore:
+    """Drug-drug interactions as integer arrays with interned description templates
+
+    DrugBank descriptions are a few hundred sentences with the two drug
+    names filled in. Each description is stored as the id of its template
+    (the text with both names replaced by slot markers) in ``template_ids``,
+    alongside the partner's node number in ``partners``. A drug's entries
+    are the contiguous range ``row_start[node]:row_end[node]``, sorted by
+    partner so a pair lookup is a binary search. Text is rendered on demand.
+    """
+
+    def __init__(self):
+        self.ids = []
+        self.names = []
+        self._nodes = {}
+        self.in_dataset = bytearray()
+        self.row_start = array('I')
+        self.row_end = array('I')
+        self.partners = array('I')
+        self.template_ids = array('I')
+        self.templates = []
+        self._template_ids = {}
+
+    @classmethod
+    def from_root(cls, root, namespace):
+        """Index every <drug-interactions> list under ``root``"""
+        store = cls()
+        drugs = []
+        for drug in root.findall('db:drug', namespace):
+            id_elem = drug.find('db:drugbank-id[@primary="true"]', namespace)
+            name_elem = drug.find('db:name', namespace)
+            if id_elem is None or not id_elem.text:
+                continue
+            # Canonical names first, so partners that appear later in the file
+            # are already known when their interactions are factored
+            store.add_drug(id_elem.text, name_elem.text if name_elem is not None and name_elem.text else '')
+            drugs.append((id_elem.text, drug))
+
+        for drugbank_id, drug in drugs:
+            interactions_elem = drug.find('db:drug-interactions', namespace)
+            if interactions_elem is None:
+                continue
+            store.add_interactions(drugbank_id, (
+                (
+                    interaction.findtext('db:drugbank-id', '', namespace),
+                    interaction.findtext('db:name', '', namespace),
+                    interaction.findtext('db:description', '', namespace),
+                )
+                for interaction in interactions_elem.findall('db:drug-interaction', namespace)
+            ))
+        return store
+
+    def add_drug(self, drugbank_id, name):
+        node = self._node(drugbank_id, name)
+        self.in_dataset[node] = 1
+        self.names[node] = name
+        return node
+
+    def add_interactions(self, drugbank_id, interactions):
+        """Store one drug's interactions given (partner id, partner name, description) tuples"""
+        node = self._node(drugbank_id, '')
+        subject = self.names[node]
+        row = []
+        for partner_id, partner_name, description in interactions:
+            if not partner_id:
+                continue
+            partner = self._node(partner_id, partner_name)
+            row.append((partner, self._intern(self._factor(description, subject, self.names[partner]))))
+        row.sort()
+
+        self.row_start[node] = len(self.partners)
+        self.partners.extend(partner for partner, _ in row)
+        self.template_ids.extend(template for _, template in row)
+        self.row_end[node] = len(self.partners)
+
+    def has_drug(self, drugbank_id):
+        node = self._nodes.get(drugbank_id)
+        return node is not None and bool(self.in_dataset[node])
+
+    def name(self, drugbank_id):
+        node = self._nodes.get(drugbank_id)
+        return self.names[node] if node is not None else ''
+
+    def between(self, drugbank_id, partner_id):
+        """Descriptions listed on ``drugbank_id`` for ``partner_id``, in file order by partner"""
+        node, partner = self._nodes.get(drugbank_id), self._nodes.get(partner_id)
+        if node is None or partner is None:
+            return []
+        lo, hi = self.row_start[node], self.row_end[node]
+        index = bisect_left(self.partners, partner, lo, hi)
+        descriptions = []
+        while index < hi and self.partners[index] == partner:
+            descriptions.append(self._render(self.template_ids[index], self.names[node], self.names[partner]))
+            index += 1
+        return descriptions
+
+    def partners_of(self, drugbank_id):
+        """(partner id, partner name, description) for every interaction listed on a drug"""
+        node = self._nodes.get(drugbank_id)
+        if node is None:
+            return
+        for index in range(self.row_start[node], self.row_end[node]):
+            partner = self.partners[index]
+            yield (self.ids[partner], self.names[partner],
+                   self._render(self.template_ids[index], self.names[node], self.names[partner]))
+
+    def partner_ids(self, drugbank_id):
+        """IDs of the drugs listed in a drug's interactions, without rendering text"""
+        node = self._nodes.get(drugbank_id)
+        if node is None:
+            return []
+        return [self.ids[partner] for partner in dict.fromkeys(self.partners[self.row_start[node]:self.row_end[node]])]
+
+    def lists(self, drugbank_id, partner_id):
+        """True if ``drugbank_id`` lists at least one interaction with ``partner_id``"""
+        node, partner = self._nodes.get(drugbank_id), self._nodes.get(partner_id)
+        if node is None or partner is None:
+            return False
+        return self._lists(node, partner)
+
+    def pairs(self):
+        """Each interacting (id, id) pair once, whether listed on one drug or both"""
+        for node in range(len(self.ids)):
+            for partner in dict.fromkeys(self.partners[self.row_start[node]:self.row_end[node]]):
+                if node < partner or not self._lists(partner, node):
+                    yield self.ids[node], self.ids[partner]
+
+    @property
+    def count(self):
+        return len(self.partners)
+
+    def nbytes(self):
+        """Approximate memory held by the store (arrays, templates and node tables)"""
+        arrays = sum(a.itemsize * len(a) for a in (self.row_start, self.row_end, self.partners, self.template_ids))
+        strings = sum(sys.getsizeof(text) for text in self.templates)
+        nodes = sum(sys.getsizeof(text) for text in self.ids) + sum(sys.getsizeof(text) for text in self.names)
+        return arrays + strings + nodes + len(self.in_dataset)
+
+    def _node(self, drugbank_id, name):
+        node = self._nodes.get(drugbank_id)
+        if node is None:
+            node = self._nodes[drugbank_id] = len(self.ids)
+            self.ids.append(drugbank_id)
+            self.names.append(name)
+            self.in_dataset.append(0)
+            self.row_start.append(0)
+            self.row_end.append(0)
+        elif name and not self.names[node]:
+            self.names[node] = name
+        return node
+
+    def _lists(self, node, partner):
+        lo, hi = self.row_start[node], self.row_end[node]
+        index = bisect_left(self.partners, partner, lo, hi)
+        return index < hi and self.partners[index] == partner
+
+    def _intern(self, template):
+        template_id = self._template_ids.get(template)
+        if template_id is None:
+            template_id = self._template_ids[template] = len(self.templates)
+            self.templates.append(template)
+        return template_id
+
+    @staticmethod
+    def _factor(description, subject, partner):
+        # Longer name first so 'Insulin' doesn't eat part of 'Insulin glargine'
+        for name, slot in sorted(((subject, SUBJECT), (partner, PARTNER)), key=lambda pair: -len(pair[0])):
+            if name:
+                description = description.replace(name, slot)
+        return description
+
+    def _render(self, template_id, subject, partner):
+        return render(self.templates[template_id], subject, partner)
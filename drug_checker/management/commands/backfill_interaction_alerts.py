@@ -0,0 +1,36 @@
+import contextlib
+import io
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from drug_checker.models import InteractionAlert, SavedDrug
+from drug_checker.services import DrugBankService
+
+
+class Command(BaseCommand):
+    help = (
+        'Write interaction alerts for drugs saved before alerts were computed on save. Replays each '
+        "user's saved drugs in the order they were saved, checking each against the earlier ones; "
+        'existing alerts are kept.'
+    )
+
+    def handle(self, *args, **options):
+        start = time.time()
+        service = DrugBankService()
+        created = 0
+        users = 0
+        for user_id in SavedDrug.objects.values_list('user_id', flat=True).distinct().order_by('user_id'):
+            earlier = []
+            for saved in SavedDrug.objects.filter(user_id=user_id).order_by('created_at', 'pk'):
+                with contextlib.redirect_stdout(io.StringIO()):
+                    result = service.check_drug_against(saved.drugbank_id, earlier)
+                if not result['success']:
+                    raise CommandError(result['error'])
+                created += len(InteractionAlert.record(saved, result['data']))
+                earlier.append(saved.drugbank_id)
+            users += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Checked saved drugs for {users:,} users, {created:,} alerts written in {time.time() - start:.2f}s'
+        ))
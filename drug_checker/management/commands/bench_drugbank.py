@@ -0,0 +1,281 @@
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.http import JsonResponse
+from django.test import RequestFactory
+from django.test.utils import override_settings
+
+from drug_checker import fragments
+from drug_checker.services import DrugBankService
+from drug_checker.synthetic import generate_drugbank_xml
+from drug_checker.views import MAX_REGIMEN_SIZE, search_drugs_api
+from main.metrics import Metrics
+
+
+OPERATIONS = [
+    'search_drugs', 'search_drugs_api', 'get_drug_details', 'check_drug_interactions', 'check_mechanism_overlap',
+    'encode_json_stdlib', 'encode_json_fragments',
+]
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MB"""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def current_rss_mb():
+    """Resident set size right now, in MB (Linux only)"""
+    try:
+        with open('/proc/self/statm') as statm:
+            pages = int(statm.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return round(pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024), 1)
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))]
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark DrugBankService against a synthetic DrugBank XML (valid against '
+        'static/drugbank.xsd): load time, peak RSS and p50/p99 latency of search, details, '
+        'interaction and mechanism-overlap checks. Writes JSON results and can compare them with a baseline.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--drugs', type=int, default=5000, help='Synthetic drugs to generate')
+        parser.add_argument('--interactions', type=int, default=20,
+                            help='Average drug-drug interactions per synthetic drug')
+        parser.add_argument('--seed', type=int, default=0, help='Seed for the generator and query sample')
+        parser.add_argument('--samples', type=int, default=200, help='Timed calls per operation')
+        parser.add_argument('--xml', help='Benchmark this DrugBank XML instead of generating one')
+        parser.add_argument('--validate', action='store_true',
+                            help='Validate the XML against static/drugbank.xsd first (needs lxml)')
+        parser.add_argument('--backend', choices=('memory', 'sqlite'), default='memory',
+                            help='DRUGBANK_BACKEND to benchmark; sqlite builds a store from the XML first')
+        parser.add_argument('--output', default='bench_drugbank.json', help='Where to write JSON results')
+        parser.add_argument('--baseline', help='Earlier JSON results to compare against')
+        parser.add_argument('--max-regression', type=float,
+                            help='Fail if any p50 is more than this factor slower than the baseline')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with tempfile.TemporaryDirectory() as tmp:
+            if options['xml']:
+                xml_path = Path(options['xml'])
+                if not xml_path.exists():
+                    raise CommandError(f'{xml_path} does not exist')
+                partners = None
+            else:
+                xml_path = Path(tmp) / 'drugbank.xml'
+                start = time.perf_counter()
+                with open(xml_path, 'w', encoding='utf-8') as out:
+                    _, partners = generate_drugbank_xml(
+                        out, options['drugs'], options['interactions'], options['seed']
+                    )
+                self.stdout.write(
+                    f'🧪 Generated {xml_path.stat().st_size / 1024 / 1024:,.1f} MB synthetic XML with '
+                    f'{options["drugs"]:,} drugs in {time.perf_counter() - start:.2f}s'
+                )
+
+            if options['validate']:
+                self._validate(xml_path)
+
+            with override_settings(DRUGBANK_XML_PATH=str(xml_path)):
+                backend = {'DRUGBANK_BACKEND': options['backend']}
+                if options['backend'] == 'sqlite':
+                    backend['DRUGBANK_SQLITE_PATH'] = str(Path(tmp) / 'drugbank.sqlite3')
+                    start = time.perf_counter()
+                    call_command('build_drugbank_sqlite', output=backend['DRUGBANK_SQLITE_PATH'], stdout=io.StringIO())
+                    self.stdout.write(f'🗄️  Built SQLite store in {time.perf_counter() - start:.2f}s')
+                with override_settings(**backend):
+                    results = self._run(xml_path, partners, rng, options)
+
+        self._report(results)
+        Path(options['output']).write_text(json.dumps(results, indent=2) + '\n', encoding='utf-8')
+        self.stdout.write(self.style.SUCCESS(f'✅ Results written to {options["output"]}'))
+
+        if options['baseline']:
+            self._compare(results, options['baseline'], options['max_regression'])
+
+    def _validate(self, xml_path):
+        try:
+            from lxml import etree
+        except ImportError:
+            raise CommandError('--validate needs lxml (pip install lxml)')
+        schema = etree.XMLSchema(etree.parse(str(Path(settings.BASE_DIR) / 'static' / 'drugbank.xsd')))
+        if not schema.validate(etree.parse(str(xml_path))):
+            raise CommandError(f'{xml_path} is not valid against drugbank.xsd: {schema.error_log.last_error}')
+        self.stdout.write('✅ XML is valid against static/drugbank.xsd')
+
+    def _run(self, xml_path, partners, rng, options):
+        DrugBankService.reset()
+        service = DrugBankService()
+        rss_before = peak_rss_mb()
+
+        # The service narrates its own progress; keep the report readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            drugs = service.get_all_drugs()
+            load_seconds = time.perf_counter() - start
+        rss_loaded = peak_rss_mb()
+        # Phase durations as recorded by the service for /metrics (the SQLite
+        # backend has no load phases; any gauges are left from building it)
+        gauges = Metrics().snapshot()['gauges']
+        phases = {
+            dict(labels)['phase']: value
+            for name, labels, value, _ in gauges
+            if name == 'drugbank_load_phase_seconds' and options['backend'] == 'memory'
+        }
+        aliases = next((value for name, _, value, _ in gauges if name == 'drugbank_aliases'), None)
+        if not drugs:
+            raise CommandError(f'No drugs could be read from {xml_path}')
+
+        ids = [drug['drugbank_id'] for drug in drugs]
+        queries = [drug['name'][:rng.randint(3, 6)].lower() for drug in rng.choices(drugs, k=options['samples'])]
+        if partners is not None:
+            # Half the checked pairs are known to interact, half are random
+            pairs = []
+            for _ in range(options['samples']):
+                first = rng.randrange(len(ids))
+                if partners[first] and rng.random() < 0.5:
+                    second = rng.choice(sorted(partners[first]))
+                else:
+                    second = rng.randrange(len(ids))
+                pairs.append((ids[first], ids[second]))
+        else:
+            pairs = [tuple(rng.sample(ids, 2)) for _ in range(options['samples'])]
+
+        # Full-size regimens, the most the regimen checker accepts
+        regimens = [(rng.sample(ids, min(MAX_REGIMEN_SIZE, len(ids))),) for _ in range(options['samples'])]
+
+        factory = RequestFactory()
+
+        def api(query):
+            request = factory.get('/drugs/search/api/', {'q': query})
+            request.user = AnonymousUser()
+            return search_drugs_api(request)
+
+        # Response encoding alone, for the search API's result lists: the
+        # JsonResponse it used to return versus pre-encoded drug fragments
+        matches = [(service.match_drugs(q, limit=100),) for q in queries]
+
+        def encode_stdlib(drugs):
+            return JsonResponse({'results': drugs, 'total': len(drugs), 'total_in_db': len(ids)})
+
+        def encode_fragments(drugs):
+            return fragments.FragmentJsonResponse(
+                {'total': len(drugs), 'total_in_db': len(ids)}, results=service.drug_fragments(drugs)
+            )
+
+        operations = {
+            'search_drugs': (service.search_drugs, [(q,) for q in queries]),
+            'search_drugs_api': (api, [(q,) for q in queries]),
+            'get_drug_details': (service.get_drug_details, [(i,) for i in rng.choices(ids, k=options['samples'])]),
+            'check_drug_interactions': (service.check_drug_interactions, pairs),
+            'check_mechanism_overlap': (service.check_mechanism_overlap, regimens),
+            'encode_json_stdlib': (encode_stdlib, matches),
+            'encode_json_fragments': (encode_fragments, matches),
+        }
+        latency = {name: self._time(*operations[name]) for name in OPERATIONS}
+
+        return {
+            'meta': {
+                'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'xml': str(options['xml'] or 'synthetic'),
+                'xml_bytes': xml_path.stat().st_size,
+                'backend': options['backend'],
+                'json_backend': 'orjson' if fragments.orjson is not None else 'json',
+                'drugs': len(drugs),
+                'aliases': aliases,
+                'interactions_per_drug': None if options['xml'] else options['interactions'],
+                'seed': options['seed'],
+                'samples': options['samples'],
+            },
+            'load': {
+                'total_seconds': round(load_seconds, 4),
+                **{f'{phase}_seconds': round(phases[phase], 4) for phase in ('parse', 'cache', 'index') if phase in phases},
+                'peak_rss_mb': round(rss_loaded, 1) if rss_loaded is not None else None,
+                'rss_growth_mb': round(rss_loaded - rss_before, 1) if rss_loaded is not None else None,
+                'rss_after_load_mb': current_rss_mb(),
+            },
+            'latency_ms': latency,
+        }
+
+    def _time(self, call, arguments):
+        timings = []
+        for args in arguments:
+            start = time.perf_counter()
+            call(*args)
+            timings.append((time.perf_counter() - start) * 1000)
+        return {
+            'p50': round(percentile(timings, 50), 4),
+            'p99': round(percentile(timings, 99), 4),
+            'mean': round(statistics.fmean(timings), 4),
+            'max': round(max(timings), 4),
+        }
+
+    def _report(self, results):
+        load = results['load']
+        phases = ' + '.join(
+            f'{phase} {load[f"{phase}_seconds"]:.2f}s' for phase in ('parse', 'cache', 'index') if f'{phase}_seconds' in load
+        )
+        self.stdout.write(
+            f'📂 Load: {load["total_seconds"]:.2f}s ({phases}), peak RSS {load["peak_rss_mb"]} MB, '
+            f'RSS after load {load["rss_after_load_mb"]} MB'
+        )
+        self.stdout.write(f'{"operation":<26}{"p50":>11}{"p99":>11}{"max":>11}')
+        for name, timing in results['latency_ms'].items():
+            self.stdout.write(
+                f'{name:<26}{timing["p50"]:>9.3f}ms{timing["p99"]:>9.3f}ms{timing["max"]:>9.3f}ms'
+            )
+
+    def _compare(self, results, baseline_path, max_regression):
+        baseline = json.loads(Path(baseline_path).read_text(encoding='utf-8'))
+        self.stdout.write(f'\nCompared with {baseline_path} ({baseline["meta"]["drugs"]:,} drugs):')
+        self.stdout.write(f'{"metric":<34}{"baseline":>12}{"current":>12}{"change":>9}')
+
+        rows = [(f'load {key}', baseline['load'].get(key), results['load'].get(key))
+                for key in ('total_seconds', 'parse_seconds', 'cache_seconds', 'index_seconds',
+                            'peak_rss_mb', 'rss_after_load_mb')]
+        for name in OPERATIONS:
+            for stat in ('p50', 'p99'):
+                before = baseline['latency_ms'].get(name, {}).get(stat)
+                rows.append((f'{name} {stat}', before, results['latency_ms'][name][stat]))
+
+        regressions = []
+        for metric, before, after in rows:
+            if before is None or after is None:
+                continue
+            ratio = after / before if before else float('inf')
+            self.stdout.write(f'{metric:<34}{before:>12.3f}{after:>12.3f}{ratio:>8.2f}x')
+            if max_regression and metric.endswith(' p50') and ratio > max_regression:
+                regressions.append(f'{metric} {ratio:.2f}x')
+
+        if regressions:
+            raise CommandError(f'Slower than baseline by more than {max_regression}x: {", ".join(regressions)}')
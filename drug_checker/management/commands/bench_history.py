@@ -0,0 +1,173 @@
+import random
+import statistics
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.test import RequestFactory, override_settings
+from django.utils import timezone
+
+from drug_checker.models import DrugSearch, DrugInteractionCheck, SavedDrug
+from drug_checker.views import history
+
+
+BENCH_USER_PREFIX = 'bench_history_'
+
+
+@contextmanager
+def explicit_timestamps(*fields):
+    """Let bulk_create keep the timestamps we assign instead of auto_now_add"""
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class ScratchRouter:
+    """Send every query, including the history view's, to the scratch database"""
+
+    def __init__(self, alias):
+        self.alias = alias
+
+    def db_for_read(self, model, **hints):
+        return self.alias
+
+    def db_for_write(self, model, **hints):
+        return self.alias
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed synthetic DrugSearch/DrugInteractionCheck rows and time the history page '
+        'with and without the (user, timestamp) indexes. Indexes are dropped and recreated, '
+        'so it only runs against a scratch database alias other than default '
+        '(e.g. BENCH_DATABASE_URL=sqlite:////tmp/bench.sqlite3 ... --database bench).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000,
+                            help='Total history rows to seed (split between searches and checks)')
+        parser.add_argument('--users', type=int, default=1000, help='Number of synthetic users')
+        parser.add_argument('--repeat', type=int, default=50, help='History page loads per phase')
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded rows afterwards')
+        parser.add_argument('--database', required=True,
+                            help='Alias of the scratch database to seed and benchmark (never default)')
+
+    def handle(self, *args, **options):
+        self.alias = options['database']
+        self._check_scratch(self.alias)
+        call_command('migrate', database=self.alias, verbosity=0)
+        with override_settings(DATABASE_ROUTERS=[ScratchRouter(self.alias)]):
+            self._run(options)
+
+    def _check_scratch(self, alias):
+        if alias not in connections.settings:
+            raise CommandError(f'Unknown database alias "{alias}"; configure it with BENCH_DATABASE_URL')
+        target, default = connections.settings[alias], connections.settings[DEFAULT_DB_ALIAS]
+        same_database = (str(target['NAME']), target['HOST']) == (str(default['NAME']), default['HOST'])
+        if alias == DEFAULT_DB_ALIAS or same_database:
+            raise CommandError('Refusing to drop indexes on the default database; pass a scratch --database')
+
+    def _run(self, options):
+        users = self._seed(options['rows'], options['users'])
+        try:
+            sample = random.Random(0).choices(users, k=options['repeat'])
+            indexed = [
+                (model, index)
+                for model in (DrugSearch, DrugInteractionCheck, SavedDrug)
+                for index in model._meta.indexes
+            ]
+
+            with connections[self.alias].schema_editor() as editor:
+                for model, index in indexed:
+                    editor.remove_index(model, index)
+            try:
+                before = self._time_history(sample)
+            finally:
+                with connections[self.alias].schema_editor() as editor:
+                    for model, index in indexed:
+                        editor.add_index(model, index)
+            after = self._time_history(sample)
+
+            self.stdout.write(f'{"phase":<18}{"p50 ms":>10}{"p95 ms":>10}{"max ms":>10}')
+            for label, timings in (('without indexes', before), ('with indexes', after)):
+                self.stdout.write(
+                    f'{label:<18}{self._pct(timings, 50):>10.2f}'
+                    f'{self._pct(timings, 95):>10.2f}{max(timings):>10.2f}'
+                )
+        finally:
+            if not options['keep']:
+                self.stdout.write('🧹 Removing seeded rows...')
+                User.objects.filter(username__startswith=BENCH_USER_PREFIX).delete()
+
+    def _seed(self, rows, user_count):
+        self.stdout.write(f'📦 Seeding {rows:,} history rows across {user_count:,} users...')
+        start = time.time()
+        User.objects.bulk_create(
+            [User(username=f'{BENCH_USER_PREFIX}{i}') for i in range(user_count)],
+            ignore_conflicts=True
+        )
+        users = list(User.objects.filter(username__startswith=BENCH_USER_PREFIX))
+        user_ids = [u.pk for u in users]
+        rng = random.Random(42)
+        now = timezone.now()
+        batch_size = 5000
+
+        def stamp():
+            return now - timedelta(seconds=rng.randrange(365 * 24 * 3600))
+
+        with explicit_timestamps(DrugSearch._meta.get_field('searched_at'),
+                                 DrugInteractionCheck._meta.get_field('checked_at')):
+            half = rows // 2
+            for offset in range(0, half, batch_size):
+                n = min(batch_size, half - offset)
+                with transaction.atomic(using=self.alias):
+                    DrugSearch.objects.bulk_create([
+                        DrugSearch(user_id=rng.choice(user_ids), drug_name=f'Drug {rng.randrange(15000)}',
+                                   drugbank_id=f'DB{rng.randrange(15000):05d}', searched_at=stamp())
+                        for _ in range(n)
+                    ])
+            for offset in range(0, rows - half, batch_size):
+                n = min(batch_size, rows - half - offset)
+                with transaction.atomic(using=self.alias):
+                    DrugInteractionCheck.objects.bulk_create([
+                        DrugInteractionCheck(
+                            user_id=rng.choice(user_ids),
+                            drug1_name='Drug A', drug1_id=f'DB{rng.randrange(15000):05d}',
+                            drug2_name='Drug B', drug2_id=f'DB{rng.randrange(15000):05d}',
+                            severity=rng.choice(['minor', 'moderate', 'major']),
+                            description='The risk or severity of adverse effects can be increased.',
+                            checked_at=stamp()
+                        )
+                        for _ in range(n)
+                    ])
+
+        self.stdout.write(f'✅ Seeded in {time.time() - start:.1f}s')
+        return users
+
+    def _time_history(self, users):
+        factory = RequestFactory()
+        timings = []
+        for user in users:
+            request = factory.get('/drugs/history/')
+            request.user = user
+            start = time.perf_counter()
+            response = history(request)
+            timings.append((time.perf_counter() - start) * 1000)
+            assert response.status_code == 200
+        return timings
+
+    def _pct(self, values, pct):
+        if len(values) < 2:
+            return values[0]
+        return statistics.quantiles(values, n=100, method='inclusive')[pct - 1]
@@ -0,0 +1,116 @@
+import statistics
+import time
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.contrib.sessions.backends.cache import SessionStore
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from django.test.utils import override_settings
+from django.urls import resolve, reverse
+
+from authentication.models import UserProfile
+from drug_checker.services import DrugBankService
+from drug_checker.views import search_drugs, interaction_checker
+
+
+PAGES = [
+    ('search', 'search_drugs', search_drugs),
+    ('interaction_checker', 'interaction_checker', interaction_checker),
+]
+
+UNCACHED_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
+
+def synthetic_drugs(count):
+    """Drug dicts shaped like DrugBankService._cache_all_drugs output"""
+    return [
+        {
+            'name': f'Synthetic Drug {i}',
+            'drugbank_id': f'DB{i:05d}',
+            'type': 'small molecule' if i % 4 else 'biotech',
+            'synonyms': [f'Synonym {i}-{j}' for j in range(3)],
+            'description': f'Synthetic description number {i} used for template benchmarks. ' * 3,
+            'indication': 'Benchmarking',
+            'categories': [f'Category {i % 40}', f'Category {i % 17}', 'Synthetic'],
+        }
+        for i in range(count)
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        'Time the search and interaction checker pages rendered with plain template loaders and '
+        'no fragment caching versus the cached loader with fragment caching.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=200, help='Renders per page and phase')
+        parser.add_argument('--synthetic', type=int, default=15000,
+                            help='Drugs to fake when no DrugBank XML is installed')
+
+    def handle(self, *args, **options):
+        service = DrugBankService()
+        if service._find_drugbank_xml() is None:
+            self.stdout.write(f'🧪 No DrugBank XML found; using {options["synthetic"]:,} synthetic drugs')
+            DrugBankService._shared_root = object()
+            DrugBankService._shared_drugs_cache = synthetic_drugs(options['synthetic'])
+            DrugBankService._dataset_generation = 'synthetic'
+            DrugBankService._is_loaded = True
+
+        user = User(username='bench_templates')
+        user.profile = UserProfile(user=user, role='patient', disclaimer_accepted=True)
+        phases = [
+            ('before', {
+                'TEMPLATES': self._templates(UNCACHED_LOADERS),
+                'CACHES': {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}},
+            }),
+            ('after', {
+                'TEMPLATES': self._templates([('django.template.loaders.cached.Loader', UNCACHED_LOADERS)]),
+                'CACHES': {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                       'LOCATION': 'bench-templates'}},
+            }),
+        ]
+
+        results = {}
+        for phase, overrides in phases:
+            with override_settings(**overrides):
+                cache.clear()
+                for name, url_name, view in PAGES:
+                    for label, who in (('anonymous', AnonymousUser()), ('logged in', user)):
+                        results[(name, label, phase)] = self._time(view, reverse(url_name), who, options['repeat'])
+
+        self.stdout.write(f'{"page":<22}{"user":<11}{"before p50":>12}{"after p50":>11}{"speedup":>9}')
+        for name, _, _ in PAGES:
+            for label in ('anonymous', 'logged in'):
+                before = statistics.median(results[(name, label, 'before')])
+                after = statistics.median(results[(name, label, 'after')])
+                self.stdout.write(
+                    f'{name:<22}{label:<11}{before:>10.2f}ms{after:>9.2f}ms{before / after:>8.1f}x'
+                )
+
+    def _templates(self, loaders):
+        from django.conf import settings
+
+        templates = [dict(engine, OPTIONS=dict(engine['OPTIONS'])) for engine in settings.TEMPLATES]
+        templates[0]['OPTIONS']['loaders'] = loaders
+        return templates
+
+    def _time(self, view, path, user, repeat):
+        factory = RequestFactory()
+        timings = []
+        for _ in range(repeat):
+            request = factory.get(path)
+            request.user = user
+            request.session = SessionStore()
+            request._messages = FallbackStorage(request)
+            request.resolver_match = resolve(path)
+            start = time.perf_counter()
+            response = view(request)
+            timings.append((time.perf_counter() - start) * 1000)
+            assert response.status_code == 200
+        return timings
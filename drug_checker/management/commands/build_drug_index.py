@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from drug_checker.client_index import build_index, write_index
+from drug_checker.services import DrugBankService
+
+
+class Command(BaseCommand):
+    help = (
+        'Write the compact client-side drug search index (id, name, synonyms, type, brands) to '
+        'static/drugs/drug-index.json. Run before collectstatic, which adds the content hash '
+        'and gzip/brotli variants. Used by the search page when DRUG_CLIENT_INDEX=True.'
+    )
+
+    def handle(self, *args, **options):
+        start = time.time()
+        service = DrugBankService()
+        try:
+            drugs = service.get_all_drugs()
+        except FileNotFoundError as e:
+            raise CommandError(str(e))
+
+        index = build_index(drugs, service.dataset_generation(), service.brand_names())
+        path = write_index(index)
+        size = path.stat().st_size
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Wrote {path} ({len(drugs):,} drugs, {size / 1024:,.0f} KB before compression) '
+            f'in {time.time() - start:.2f}s'
+        ))
@@ -0,0 +1,45 @@
+import contextlib
+import io
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from drug_checker.services import DrugBankService
+from drug_checker.sqlite_store import build_database
+
+
+class Command(BaseCommand):
+    help = (
+        'Load the DrugBank XML once and write drugs, aliases, interactions and the food, mechanism '
+        'and ATC indexes to a SQLite file with FTS5 and pair indexes (DRUGBANK_SQLITE_PATH). '
+        'Serve it with DRUGBANK_BACKEND=sqlite.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help='Where to write the SQLite file (default: DRUGBANK_SQLITE_PATH)')
+
+    def handle(self, *args, **options):
+        path = Path(options['output'] or settings.DRUGBANK_SQLITE_PATH)
+        start = time.time()
+        # The build reads the in-memory indexes, whatever backend is configured
+        with override_settings(DRUGBANK_BACKEND='memory'):
+            DrugBankService.reset()
+            service = DrugBankService()
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    drugs = service.get_all_drugs()
+            except FileNotFoundError as e:
+                raise CommandError(str(e))
+            self.stdout.write(f'📂 Loaded {len(drugs):,} drugs in {time.time() - start:.2f}s')
+
+            build_start = time.time()
+            build_database(path, service)
+            DrugBankService.reset()
+
+        size = path.stat().st_size
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Wrote {path} ({size / 1024 / 1024:,.1f} MB) in {time.time() - build_start:.2f}s'
+        ))
@@ -0,0 +1,92 @@
+import sys
+
+
+# Protein lists on a <drug>, in XSD order
+KINDS = ('target', 'enzyme', 'carrier', 'transporter')
+
+# Perpetrator action -> what it does to a substrate sharing the protein
+EFFECTS = {
+    'inhibitor': 'increased',
+    'inducer': 'decreased',
+}
+
+
+class MechanismIndex:
+    """Inverted index from each target/enzyme/carrier/transporter to drugs by action
+
+    Proteins are keyed by gene name (CYP3A4, ABCB1) when the polypeptide
+    has one, else by their BE id. ``by_action[key][action]`` is the set of
+    drug IDs listing that action, so regimen-wide overlap is a handful of
+    set intersections per protein rather than a scan over drug pairs.
+    """
+
+    def __init__(self):
+        self.proteins = {}
+        self.by_action = {}
+        self.by_drug = {}
+
+    @classmethod
+    def from_root(cls, root, namespace):
+        index = cls()
+        for drug in root.findall('db:drug', namespace):
+            id_elem = drug.find('db:drugbank-id[@primary="true"]', namespace)
+            if id_elem is None or not id_elem.text:
+                continue
+            for kind in KINDS:
+                for protein in drug.findall(f'db:{kind}s/db:{kind}', namespace):
+                    index.add(
+                        id_elem.text, kind,
+                        protein.findtext('db:id', '', namespace),
+                        protein.findtext('db:name', '', namespace),
+                        protein.findtext('db:polypeptide/db:gene-name', '', namespace),
+                        [action.text for action in protein.findall('db:actions/db:action', namespace)],
+                    )
+        return index
+
+    def add(self, drugbank_id, kind, protein_id, name, gene, actions):
+        """Record that a drug acts on one protein with the given actions"""
+        key = sys.intern(gene or protein_id or name)
+        if key:
+            self.link(drugbank_id, key, {'kind': kind, 'name': name, 'gene': gene}, actions)
+
+    def link(self, drugbank_id, key, protein, actions):
+        """Record a drug's actions on a protein that already has its key"""
+        if key not in self.proteins:
+            self.proteins[key] = protein
+            self.by_action[key] = {}
+        actions = {sys.intern(action.strip().lower()) for action in actions if action and action.strip()}
+        # A drug with no listed action still shares the protein
+        for action in actions or {'unknown'}:
+            self.by_action[key].setdefault(action, set()).add(drugbank_id)
+            self.by_drug.setdefault(drugbank_id, set()).add(key)
+
+    def drugs_with(self, key, action):
+        return self.by_action.get(key, {}).get(action, set())
+
+    def overlap(self, drugbank_ids, kinds=None):
+        """Perpetrator-substrate pairs in a regimen that share an enzyme or transporter
+
+        Yields (protein key, perpetrator action, perpetrator id, substrate id)
+        sorted by protein and drug.
+        """
+        regimen = set(drugbank_ids)
+        kinds = set(kinds or ('enzyme', 'carrier', 'transporter'))
+        shared = set().union(*(self.by_drug.get(drugbank_id, ()) for drugbank_id in regimen))
+        pairs = []
+        for key in sorted(shared):
+            if self.proteins[key]['kind'] not in kinds:
+                continue
+            substrates = self.drugs_with(key, 'substrate') & regimen
+            if not substrates:
+                continue
+            for action in EFFECTS:
+                for perpetrator in sorted(self.drugs_with(key, action) & regimen):
+                    pairs.extend(
+                        (key, action, perpetrator, substrate)
+                        for substrate in sorted(substrates - {perpetrator})
+                    )
+        return pairs
+
+    @property
+    def count(self):
+        return sum(len(drugs) for actions in self.by_action.values() for drugs in actions.values())
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drug_checker', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='druginteractioncheck',
+            index=models.Index(fields=['user', '-checked_at'], name='interaction_user_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='drugsearch',
+            index=models.Index(fields=['user', '-searched_at'], name='drugsearch_user_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='saveddrug',
+            index=models.Index(fields=['user', '-created_at'], name='saveddrug_user_recent_idx'),
+        ),
+    ]
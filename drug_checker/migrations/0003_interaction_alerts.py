@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drug_checker', '0002_history_user_timestamp_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InteractionAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('severity', models.CharField(choices=[('major', 'Major'), ('moderate', 'Moderate'), ('minor', 'Minor')], max_length=20)),
+                ('description', models.TextField()),
+                ('interaction_count', models.PositiveSmallIntegerField(default=1)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('other_drug', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='drug_checker.saveddrug')),
+                ('saved_drug', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='interaction_alerts', to='drug_checker.saveddrug')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['user', '-created_at'], name='alert_user_recent_idx')],
+                'unique_together': {('saved_drug', 'other_drug')},
+            },
+        ),
+    ]
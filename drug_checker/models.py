@@ -10,6 +10,9 @@ class DrugSearch(models.Model):
     
     class Meta:
         ordering = ['-searched_at']
+        indexes = [
+            models.Index(fields=['user', '-searched_at'], name='drugsearch_user_recent_idx'),
+        ]
     
     def __str__(self):
         return f"{self.drug_name} - {self.searched_at.strftime('%Y-%m-%d %H:%M')}"
@@ -27,6 +30,9 @@ class DrugInteractionCheck(models.Model):
     
     class Meta:
         ordering = ['-checked_at']
+        indexes = [
+            models.Index(fields=['user', '-checked_at'], name='interaction_user_recent_idx'),
+        ]
     
     def __str__(self):
         return f"{self.drug1_name} + {self.drug2_name}"
@@ -42,6 +48,75 @@ class SavedDrug(models.Model):
     class Meta:
         ordering = ['-created_at']
         unique_together = ['user', 'drugbank_id']
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='saveddrug_user_recent_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.drug_name}"
+
+
+class InteractionAlert(models.Model):
+    """A documented interaction between two of a user's saved drugs
+
+    Written when a drug is saved, by checking only the new drug against the
+    user's existing saved drugs, so pages list alerts without re-running
+    pair checks. Deleting either saved drug removes the alert.
+    """
+    
+    SEVERITY_CHOICES = [
+        ('major', 'Major'),
+        ('moderate', 'Moderate'),
+        ('minor', 'Minor'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    saved_drug = models.ForeignKey(SavedDrug, on_delete=models.CASCADE, related_name='interaction_alerts')
+    other_drug = models.ForeignKey(SavedDrug, on_delete=models.CASCADE, related_name='+')
+    severity = models.CharField(max_length=20, choices=SEVERITY_CHOICES)
+    description = models.TextField()
+    interaction_count = models.PositiveSmallIntegerField(default=1)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        unique_together = ['saved_drug', 'other_drug']
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='alert_user_recent_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.saved_drug.drug_name} + {self.other_drug.drug_name} ({self.severity})"
+    
+    @classmethod
+    def record(cls, saved_drug, conflicts):
+        """Store alerts for a saved drug given DrugBankService.check_drug_against results"""
+        others = {
+            drug.drugbank_id: drug
+            for drug in SavedDrug.objects.filter(
+                user_id=saved_drug.user_id,
+                drugbank_id__in=[conflict['drugbank_id'] for conflict in conflicts]
+            ).exclude(pk=saved_drug.pk)
+        }
+        return cls.objects.bulk_create([
+            cls(
+                user_id=saved_drug.user_id,
+                saved_drug=saved_drug,
+                other_drug=others[conflict['drugbank_id']],
+                severity=conflict['severity'],
+                description=conflict['description'],
+                interaction_count=len(conflict['interactions'])
+            )
+            for conflict in conflicts if conflict['drugbank_id'] in others
+        ], ignore_conflicts=True)
+    
+    @classmethod
+    def for_user(cls, user):
+        """A user's alerts, most serious first"""
+        return cls.objects.filter(user=user).select_related('saved_drug', 'other_drug').order_by(
+            models.Case(*(
+                models.When(severity=severity, then=models.Value(rank))
+                for rank, (severity, _) in enumerate(cls.SEVERITY_CHOICES)
+            )),
+            '-created_at'
+        )
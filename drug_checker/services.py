@@ -5,21 +5,73 @@ import threading
 import time
 import sys
 
+from django.conf import settings
+
+from main.metrics import Metrics, timed
+from main.tracing import span, traced
+from .aliases import AliasIndex
+from .atc import SUMMARY_LEVELS, ATCIndex, level_of
+from .food import FOOD_KEYWORDS, FoodInteractionIndex
+from .fragments import DrugFragments
+from .interactions import InteractionStore
+from .mechanisms import EFFECTS, MechanismIndex
+from .sqlite_store import DrugBankDatabase
+
+
+# Interaction severities, most serious first
+SEVERITY_ORDER = ('major', 'moderate', 'minor')
+
 
 class DrugBankService:
-    """Service class to interact with DrugBank XML database (Singleton Pattern)"""
+    """Service class to interact with DrugBank XML database (Singleton Pattern)
+
+    With DRUGBANK_BACKEND='sqlite' the same methods read a prebuilt SQLite
+    file (see build_drugbank_sqlite) instead of holding the XML in memory.
+    """
     
     # Class-level shared cache (singleton pattern)
     _shared_root = None
     _shared_drugs_cache = None
     _loading_lock = threading.Lock()
     _is_loaded = False
+    _dataset_generation = None
+    _interactions = None
+    _food_index = None
+    _mechanisms = None
+    _atc = None
+    _aliases = None
+    _drugs_by_id = None
+    _database = None
+    _fragments = None
     
     def __init__(self):
         self.namespace = {'db': 'http://www.drugbank.ca'}
     
+    @classmethod
+    def reset(cls):
+        """Forget the loaded dataset so the next access parses the XML again"""
+        with cls._loading_lock:
+            cls._shared_root = None
+            cls._shared_drugs_cache = None
+            cls._dataset_generation = None
+            cls._interactions = None
+            cls._food_index = None
+            cls._mechanisms = None
+            cls._atc = None
+            cls._aliases = None
+            cls._drugs_by_id = None
+            if cls._database is not None:
+                cls._database.close()
+            cls._database = None
+            cls._fragments = None
+            cls._is_loaded = False
+    
     def _find_drugbank_xml(self):
         """Find DrugBank XML file in common locations"""
+        configured = getattr(settings, 'DRUGBANK_XML_PATH', '')
+        if configured:
+            return Path(configured) if Path(configured).exists() else None
+        
         possible_paths = [
             # Static folder (where user placed it)
             Path(__file__).parent.parent / 'static' / 'full database.xml',
@@ -41,9 +93,16 @@ class DrugBankService:
     @property
     def root(self):
         """Lazy load DrugBank XML root (Singleton - loads only once)"""
+        if getattr(settings, 'DRUGBANK_BACKEND', 'memory') == 'sqlite':
+            # No tree in this mode; the indexes are views over the SQLite file
+            self._open_database()
+            return None
+        
         # Return cached root if already loaded
         if DrugBankService._is_loaded and DrugBankService._shared_root is not None:
+            Metrics().cache_lookup('drugbank_dataset', hit=True)
             return DrugBankService._shared_root
+        Metrics().cache_lookup('drugbank_dataset', hit=False)
         
         # Use lock to prevent multiple threads loading simultaneously
         with DrugBankService._loading_lock:
@@ -85,8 +144,11 @@ class DrugBankService:
             progress_thread.start()
             
             try:
-                tree = ElementTree.parse(str(xml_path))
+                stat = xml_path.stat()
+                with span('DrugBankService.parse', path=str(xml_path)):
+                    tree = ElementTree.parse(str(xml_path))
                 DrugBankService._shared_root = tree.getroot()
+                DrugBankService._dataset_generation = f'{stat.st_mtime_ns:x}-{stat.st_size:x}'
                 
                 stop_progress.set()
                 progress_thread.join(timeout=1)
@@ -97,11 +159,40 @@ class DrugBankService:
                 # Cache all drugs
                 print("📦 Caching all drugs...", end='', flush=True)
                 cache_start = time.time()
-                self._cache_all_drugs()
+                with span('DrugBankService.cache'):
+                    self._cache_all_drugs()
                 cache_elapsed = time.time() - cache_start
                 print(f' ✅ ({cache_elapsed:.2f}s)')
                 
+                # Index interactions as integer arrays + interned templates,
+                # food interactions by drug and by food keyword,
+                # targets/enzymes/carriers/transporters by action, and
+                # ATC classes with class-to-class interaction counts, and
+                # names/brands/products/synonyms for search
+                print("🔗 Indexing interactions...", end='', flush=True)
+                index_start = time.time()
+                with span('DrugBankService.index'):
+                    self._build_interaction_index()
+                    self._build_food_index()
+                    self._build_mechanism_index()
+                    self._build_atc_index()
+                    self._build_alias_index()
+                index_elapsed = time.time() - index_start
+                print(f' ✅ ({index_elapsed:.2f}s, {DrugBankService._interactions.count:,} interactions, '
+                      f'{len(DrugBankService._interactions.templates):,} templates, '
+                      f'{len(DrugBankService._mechanisms.proteins):,} proteins, '
+                      f'{DrugBankService._atc.count:,} ATC classes, '
+                      f'{DrugBankService._aliases.count:,} aliases)')
+                
                 total_elapsed = time.time() - start_time
+                metrics = Metrics()
+                metrics.set_gauge('drugbank_load_phase_seconds', parse_elapsed, phase='parse')
+                metrics.set_gauge('drugbank_load_phase_seconds', cache_elapsed, phase='cache')
+                metrics.set_gauge('drugbank_load_phase_seconds', index_elapsed, phase='index')
+                metrics.set_gauge('drugbank_load_phase_seconds', total_elapsed, phase='total')
+                metrics.set_gauge('drugbank_drugs', len(DrugBankService._shared_drugs_cache))
+                metrics.set_gauge('drugbank_interactions', DrugBankService._interactions.count)
+                metrics.set_gauge('drugbank_aliases', DrugBankService._aliases.count)
                 print(f'{"="*70}')
                 print(f'✅ DATABASE LOADED SUCCESSFULLY!')
                 print(f'⏱️  Total loading time: {total_elapsed:.2f} seconds ({total_elapsed/60:.2f} minutes)')
@@ -117,6 +208,41 @@ class DrugBankService:
                 print(f'\n❌ Error loading database: {e}\n')
                 raise
     
+    def _open_database(self):
+        """Open the prebuilt SQLite store and expose it through the shared index attributes"""
+        if DrugBankService._database is not None:
+            Metrics().cache_lookup('drugbank_dataset', hit=True)
+            return
+        Metrics().cache_lookup('drugbank_dataset', hit=False)
+        
+        with DrugBankService._loading_lock:
+            if DrugBankService._database is not None:
+                return
+            
+            path = Path(settings.DRUGBANK_SQLITE_PATH)
+            if not path.exists():
+                raise FileNotFoundError(
+                    f"DrugBank SQLite store not found at {path}. "
+                    "Build it with: python manage.py build_drugbank_sqlite"
+                )
+            
+            start_time = time.time()
+            database = DrugBankDatabase(path, getattr(settings, 'DRUGBANK_SQLITE_POOL_SIZE', 4))
+            DrugBankService._shared_drugs_cache = database.drugs
+            DrugBankService._drugs_by_id = database.drugs
+            DrugBankService._dataset_generation = database.generation
+            DrugBankService._interactions = database.interactions
+            DrugBankService._food_index = database.food
+            DrugBankService._mechanisms = database.mechanisms
+            DrugBankService._atc = database.atc
+            DrugBankService._aliases = database.aliases
+            DrugBankService._database = database
+            DrugBankService._is_loaded = True
+            
+            Metrics().set_gauge('drugbank_drugs', len(database.drugs))
+            print(f'🗄️  Opened DrugBank SQLite store {path} ({len(database.drugs):,} drugs) '
+                  f'in {time.time() - start_time:.2f}s')
+    
     def _cache_all_drugs(self):
         """Cache all drugs with essential info for instant filtering"""
         if DrugBankService._shared_drugs_cache is not None:
@@ -168,56 +294,95 @@ class DrugBankService:
             })
         
         DrugBankService._shared_drugs_cache = drugs
+        DrugBankService._drugs_by_id = {drug['drugbank_id']: drug for drug in drugs}
+    
+    def _build_interaction_index(self):
+        """Move every <drug-interactions> list out of the XML tree into an InteractionStore"""
+        root = DrugBankService._shared_root
+        DrugBankService._interactions = InteractionStore.from_root(root, self.namespace)
+        # The store now answers all interaction queries; dropping the elements
+        # frees the bulk of the tree's memory
+        for drug in root.findall('db:drug', self.namespace):
+            interactions_elem = drug.find('db:drug-interactions', self.namespace)
+            if interactions_elem is not None:
+                drug.remove(interactions_elem)
+    
+    def _build_food_index(self):
+        """Index <food-interactions> per drug and by food keyword"""
+        DrugBankService._food_index = FoodInteractionIndex.from_root(DrugBankService._shared_root, self.namespace)
     
+    def _build_alias_index(self):
+        """Index names, IDs, brands, products and synonyms for search and autocomplete"""
+        DrugBankService._aliases = AliasIndex.from_root(DrugBankService._shared_root, self.namespace)
+    
+    def _build_atc_index(self):
+        """Index ATC codes as a prefix tree and count interactions between classes"""
+        atc = ATCIndex.from_root(DrugBankService._shared_root, self.namespace)
+        atc.summarize(DrugBankService._interactions.pairs())
+        DrugBankService._atc = atc
+    
+    def _build_mechanism_index(self):
+        """Index targets, enzymes, carriers and transporters by protein and action"""
+        DrugBankService._mechanisms = MechanismIndex.from_root(DrugBankService._shared_root, self.namespace)
+    
+    @traced('DrugBankService.get_all_drugs')
     def get_all_drugs(self):
         """Get all cached drugs (triggers loading if not loaded)"""
         # Ensure root is loaded (which also caches drugs)
         _ = self.root
         return DrugBankService._shared_drugs_cache if DrugBankService._shared_drugs_cache else []
     
+    def dataset_generation(self):
+        """Token identifying the loaded XML file, for keying caches derived from it"""
+        _ = self.root
+        return DrugBankService._dataset_generation
+    
+    def brand_names(self):
+        """Drug ID -> brand and product names, for the client-side search index"""
+        _ = self.root
+        return DrugBankService._aliases.aliases_of(('brand', 'product'))
+    
+    def match_drugs(self, query, limit=100):
+        """Cached drug records whose name, ID, brand, product or synonym matches, best first"""
+        # Ensure database (and alias index) is loaded
+        _ = self.root
+        
+        matches = []
+        for drugbank_id, alias, alias_type in DrugBankService._aliases.search(query, limit):
+            drug = DrugBankService._drugs_by_id.get(drugbank_id)
+            if drug is None:
+                continue
+            if alias_type in ('name', 'id'):
+                matches.append(drug)
+            else:
+                # Annotate a copy; cached records are shared between requests
+                matches.append({**drug, 'matched': alias, 'match_type': alias_type})
+        return matches
+    
+    def drug_fragments(self, drugs):
+        """Pre-encoded JSON for cached drug records, as FragmentJsonResponse expects"""
+        generation = self.dataset_generation()
+        fragments = DrugBankService._fragments
+        if fragments is None or fragments.generation != generation:
+            fragments = DrugBankService._fragments = DrugFragments(generation)
+        return [fragments.encode(drug) for drug in drugs]
+    
+    @timed('search_drugs')
+    @traced('DrugBankService.search_drugs')
     def search_drugs(self, query):
-        """Search for drugs by name (uses shared singleton cache)"""
+        """Search for drugs by name, brand, product or synonym (uses shared alias index)"""
         try:
-            # Ensure database is loaded
-            _ = self.root
-            
-            query_lower = query.lower()
             results = []
-            
-            for drug in DrugBankService._shared_root.findall('db:drug', self.namespace):
-                # Get drug name
-                name_elem = drug.find('db:name', self.namespace)
-                if name_elem is None:
-                    continue
-                
-                drug_name = name_elem.text or ''
-                
-                # Check if query matches name
-                if query_lower in drug_name.lower():
-                    drugbank_id_elem = drug.find('db:drugbank-id[@primary="true"]', self.namespace)
-                    drugbank_id = drugbank_id_elem.text if drugbank_id_elem is not None else 'N/A'
-                    
-                    # Get synonyms for better matching
-                    synonyms = []
-                    synonyms_elem = drug.find('db:synonyms', self.namespace)
-                    if synonyms_elem is not None:
-                        for synonym in synonyms_elem.findall('db:synonym', self.namespace):
-                            if synonym.text:
-                                synonyms.append(synonym.text)
-                    
-                    # Get drug type
-                    drug_type = drug.get('type', 'small molecule')
-                    
-                    results.append({
-                        'name': drug_name,
-                        'drugbank_id': drugbank_id,
-                        'prescribable_name': drug_name,
-                        'synonyms': synonyms[:3],  # First 3 synonyms
-                        'type': drug_type
-                    })
-                    
-                    if len(results) >= 20:  # Limit results
-                        break
+            for drug in self.match_drugs(query, limit=20):
+                results.append({
+                    'name': drug['name'],
+                    'drugbank_id': drug['drugbank_id'],
+                    'prescribable_name': drug['name'],
+                    'synonyms': drug['synonyms'][:3],  # First 3 synonyms
+                    'type': drug['type'],
+                    'matched': drug.get('matched', drug['name']),
+                    'match_type': drug.get('match_type', 'name')
+                })
             
             return {
                 'success': True,
@@ -229,48 +394,39 @@ class DrugBankService:
                 'error': str(e)
             }
     
+    @timed('get_drug_details')
+    @traced('DrugBankService.get_drug_details')
     def get_drug_details(self, drugbank_id):
         """Get detailed information about a specific drug"""
         try:
-            # Find drug by DrugBank ID
-            drug = None
-            for d in DrugBankService._shared_root.findall('db:drug', self.namespace):
-                db_id = d.find('db:drugbank-id[@primary="true"]', self.namespace)
-                if db_id is not None and db_id.text == drugbank_id:
-                    drug = d
-                    break
+            # Ensure database is loaded
+            _ = self.root
             
-            if drug is None:
+            if DrugBankService._database is not None:
+                data = DrugBankService._database.drug_details(drugbank_id)
+            else:
+                # Find drug by DrugBank ID
+                drug = None
+                for d in DrugBankService._shared_root.findall('db:drug', self.namespace):
+                    db_id = d.find('db:drugbank-id[@primary="true"]', self.namespace)
+                    if db_id is not None and db_id.text == drugbank_id:
+                        drug = d
+                        break
+                data = self._details(drug, drugbank_id) if drug is not None else None
+            
+            if data is None:
                 return {
                     'success': False,
                     'error': 'Drug not found'
                 }
             
-            # Extract drug information
-            name = self._get_text(drug, 'db:name')
-            description = self._get_text(drug, 'db:description')
-            indication = self._get_text(drug, 'db:indication')
-            cas_number = self._get_text(drug, 'db:cas-number')
-            
-            # Get categories
-            categories = []
-            categories_elem = drug.find('db:categories', self.namespace)
-            if categories_elem is not None:
-                for cat in categories_elem.findall('db:category', self.namespace):
-                    cat_name = self._get_text(cat, 'db:category')
-                    if cat_name:
-                        categories.append({'name': cat_name})
+            # ATC codes, from the index built at load
+            atc = DrugBankService._atc
+            data['atc_codes'] = [{'code': code, 'label': atc.label(code[:5])} for code in atc.codes_of(drugbank_id)]
             
             return {
                 'success': True,
-                'data': {
-                    'drugbank_id': drugbank_id,
-                    'name': name,
-                    'description': description,
-                    'indication': indication,
-                    'cas_number': cas_number,
-                    'categories': categories
-                }
+                'data': data
             }
         except Exception as e:
             return {
@@ -278,87 +434,72 @@ class DrugBankService:
                 'error': str(e)
             }
     
+    def _details(self, drug, drugbank_id):
+        """Detail fields of one <drug> element"""
+        # Extract drug information
+        name = self._get_text(drug, 'db:name')
+        description = self._get_text(drug, 'db:description')
+        indication = self._get_text(drug, 'db:indication')
+        cas_number = self._get_text(drug, 'db:cas-number')
+        
+        # Get categories
+        categories = []
+        categories_elem = drug.find('db:categories', self.namespace)
+        if categories_elem is not None:
+            for cat in categories_elem.findall('db:category', self.namespace):
+                cat_name = self._get_text(cat, 'db:category')
+                if cat_name:
+                    categories.append({'name': cat_name})
+        
+        return {
+            'drugbank_id': drugbank_id,
+            'name': name,
+            'description': description,
+            'indication': indication,
+            'cas_number': cas_number,
+            'categories': categories
+        }
+    
+    @timed('check_drug_interactions')
+    @traced('DrugBankService.check_drug_interactions')
     def check_drug_interactions(self, drugbank_id_1, drugbank_id_2):
         """Check for interactions between two drugs"""
         try:
-            interactions = []
-            
-            # Find first drug
-            drug1 = None
-            for d in DrugBankService._shared_root.findall('db:drug', self.namespace):
-                db_id = d.find('db:drugbank-id[@primary="true"]', self.namespace)
-                if db_id is not None and db_id.text == drugbank_id_1:
-                    drug1 = d
-                    break
+            # Ensure database (and interaction index) is loaded
+            _ = self.root
+            store = DrugBankService._interactions
             
-            if drug1 is None:
+            if not store.has_drug(drugbank_id_1):
                 return {
                     'success': False,
                     'error': f'Drug {drugbank_id_1} not found'
                 }
             
-            # Get drug1 name
-            drug1_name = self._get_text(drug1, 'db:name')
+            drug1_name = store.name(drugbank_id_1)
+            drug2_name = store.name(drugbank_id_2)
+            interactions = []
             
             # Check drug1's interactions for drug2
-            interactions_elem = drug1.find('db:drug-interactions', self.namespace)
-            if interactions_elem is not None:
-                for interaction in interactions_elem.findall('db:drug-interaction', self.namespace):
-                    interacting_id_elem = interaction.find('db:drugbank-id', self.namespace)
-                    if interacting_id_elem is not None and interacting_id_elem.text == drugbank_id_2:
-                        description = self._get_text(interaction, 'db:description')
-                        drug2_name = self._get_text(interaction, 'db:name')
-                        
-                        # Determine severity based on keywords in description
-                        severity = 'minor'
-                        if description:
-                            desc_lower = description.lower()
-                            if any(word in desc_lower for word in ['severe', 'serious', 'major']):
-                                severity = 'major'
-                            elif any(word in desc_lower for word in ['moderate', 'caution']):
-                                severity = 'moderate'
-                        
+            for description in store.between(drugbank_id_1, drugbank_id_2):
+                interactions.append({
+                    'drug1': drug1_name,
+                    'drug2': drug2_name,
+                    'description': description,
+                    'severity': self._severity(description)
+                })
+            
+            # Also check the reverse (drug2's interactions with drug1)
+            if store.has_drug(drugbank_id_2):
+                for description in store.between(drugbank_id_2, drugbank_id_1):
+                    # Check if we already have this interaction
+                    if not any(i['description'] == description for i in interactions):
                         interactions.append({
-                            'drug1': drug1_name,
-                            'drug2': drug2_name,
+                            'drug1': drug2_name,
+                            'drug2': drug1_name,
                             'description': description,
-                            'severity': severity
+                            'severity': self._severity(description)
                         })
             
-            # Also check the reverse (drug2's interactions with drug1)
-            drug2 = None
-            for d in DrugBankService._shared_root.findall('db:drug', self.namespace):
-                db_id = d.find('db:drugbank-id[@primary="true"]', self.namespace)
-                if db_id is not None and db_id.text == drugbank_id_2:
-                    drug2 = d
-                    break
-            
-            if drug2 is not None:
-                drug2_name = self._get_text(drug2, 'db:name')
-                interactions_elem = drug2.find('db:drug-interactions', self.namespace)
-                if interactions_elem is not None:
-                    for interaction in interactions_elem.findall('db:drug-interaction', self.namespace):
-                        interacting_id_elem = interaction.find('db:drugbank-id', self.namespace)
-                        if interacting_id_elem is not None and interacting_id_elem.text == drugbank_id_1:
-                            # Check if we already have this interaction
-                            description = self._get_text(interaction, 'db:description')
-                            if not any(i['description'] == description for i in interactions):
-                                # Determine severity
-                                severity = 'minor'
-                                if description:
-                                    desc_lower = description.lower()
-                                    if any(word in desc_lower for word in ['severe', 'serious', 'major']):
-                                        severity = 'major'
-                                    elif any(word in desc_lower for word in ['moderate', 'caution']):
-                                        severity = 'moderate'
-                                
-                                interactions.append({
-                                    'drug1': drug2_name,
-                                    'drug2': drug1_name,
-                                    'description': description,
-                                    'severity': severity
-                                })
-            
             return {
                 'success': True,
                 'data': interactions,
@@ -370,6 +511,247 @@ class DrugBankService:
                 'error': str(e)
             }
     
+    @timed('check_drug_against')
+    @traced('DrugBankService.check_drug_against')
+    def check_drug_against(self, drugbank_id, drugbank_ids):
+        """Interactions between one drug and each of a set of others, e.g. a newly saved drug and the rest"""
+        try:
+            # Ensure database (and interaction index) is loaded
+            _ = self.root
+            store = DrugBankService._interactions
+            
+            # One partner lookup for the new drug, then only the reverse
+            # listing per other drug; text is rendered for hits alone
+            partners = set(store.partner_ids(drugbank_id))
+            conflicts = []
+            for other_id in dict.fromkeys(drugbank_ids):
+                if other_id == drugbank_id:
+                    continue
+                if other_id not in partners and not store.lists(other_id, drugbank_id):
+                    continue
+                result = self.check_drug_interactions(drugbank_id, other_id)
+                if not result['success'] or not result['data']:
+                    result = self.check_drug_interactions(other_id, drugbank_id)
+                if not result['success'] or not result['data']:
+                    continue
+                worst = min(result['data'], key=lambda i: SEVERITY_ORDER.index(i['severity']))
+                conflicts.append({
+                    'drugbank_id': other_id,
+                    'name': store.name(other_id),
+                    'severity': worst['severity'],
+                    'description': worst['description'],
+                    'interactions': result['data']
+                })
+            
+            return {
+                'success': True,
+                'data': conflicts,
+                'total': len(conflicts)
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    @timed('check_food_interactions')
+    @traced('DrugBankService.check_food_interactions')
+    def check_food_interactions(self, drugbank_ids, foods=None):
+        """Food interactions for every drug in a regimen, grouped by food"""
+        try:
+            # Ensure database (and food index) is loaded
+            _ = self.root
+            store = DrugBankService._interactions
+            
+            known = [drugbank_id for drugbank_id in dict.fromkeys(drugbank_ids) if store.has_drug(drugbank_id)]
+            missing = [drugbank_id for drugbank_id in drugbank_ids if not store.has_drug(drugbank_id)]
+            advice, by_food = DrugBankService._food_index.check(known, foods)
+            
+            return {
+                'success': True,
+                'data': {
+                    'drugs': [{
+                        'drugbank_id': drugbank_id,
+                        'name': store.name(drugbank_id),
+                        'food_interactions': list(advice[drugbank_id])
+                    } for drugbank_id in known],
+                    'by_food': [{
+                        'food': food,
+                        'label': FOOD_KEYWORDS[food][0],
+                        'drugs': [{'drugbank_id': drugbank_id, 'name': store.name(drugbank_id)} for drugbank_id in affected]
+                    } for food, affected in by_food],
+                    'not_found': missing
+                },
+                'total': sum(len(sentences) for sentences in advice.values())
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    @timed('get_atc_class')
+    @traced('DrugBankService.get_atc_class')
+    def get_atc_class(self, atc_code):
+        """All drugs under an ATC class (e.g. B01A) or any of its subclasses"""
+        try:
+            # Ensure database (and ATC index) is loaded
+            _ = self.root
+            atc = DrugBankService._atc
+            store = DrugBankService._interactions
+            atc_code = atc_code.strip().upper()
+            
+            if not atc.has_class(atc_code):
+                return {
+                    'success': False,
+                    'error': f'ATC class {atc_code} not found'
+                }
+            
+            drugs = [{'drugbank_id': drugbank_id, 'name': store.name(drugbank_id)}
+                     for drugbank_id in atc.drugs_under(atc_code)]
+            return {
+                'success': True,
+                'data': {
+                    'code': atc_code,
+                    'label': atc.label(atc_code),
+                    'level': level_of(atc_code),
+                    'drugs': drugs
+                },
+                'total': len(drugs)
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    @timed('group_interactions_by_class')
+    @traced('DrugBankService.group_interactions_by_class')
+    def group_interactions_by_class(self, drugbank_id, level=3):
+        """A drug's interaction partners grouped by their ATC class at ``level``"""
+        try:
+            # Ensure database (and ATC index) is loaded
+            _ = self.root
+            atc = DrugBankService._atc
+            store = DrugBankService._interactions
+            
+            groups = {}
+            for partner_id in store.partner_ids(drugbank_id):
+                for code in atc.classes_of(partner_id, level) or ['']:
+                    groups.setdefault(code, []).append({'drugbank_id': partner_id, 'name': store.name(partner_id)})
+            
+            data = [{
+                'code': code,
+                'label': atc.label(code) if code else 'Unclassified',
+                'drugs': drugs,
+                'count': len(drugs)
+            } for code, drugs in groups.items()]
+            # Largest classes first, unclassified partners last
+            data.sort(key=lambda group: (not group['code'], -group['count'], group['code']))
+            
+            return {
+                'success': True,
+                'data': data,
+                'total': len(data)
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    @timed('check_class_interactions')
+    @traced('DrugBankService.check_class_interactions')
+    def check_class_interactions(self, atc_code, drugbank_id):
+        """Drugs in an ATC class that interact with one drug, plus class-to-class pair counts"""
+        try:
+            class_result = self.get_atc_class(atc_code)
+            if not class_result['success']:
+                return class_result
+            atc = DrugBankService._atc
+            store = DrugBankService._interactions
+            
+            if not store.has_drug(drugbank_id):
+                return {
+                    'success': False,
+                    'error': f'Drug {drugbank_id} not found'
+                }
+            
+            atc_code = class_result['data']['code']
+            listed = set(store.partner_ids(drugbank_id))
+            interacting = [
+                drug for drug in class_result['data']['drugs']
+                if drug['drugbank_id'] in listed or store.lists(drug['drugbank_id'], drugbank_id)
+            ]
+            # Precomputed counts against each of the drug's own classes at the same level
+            level = level_of(atc_code)
+            class_pairs = [{
+                'code': code,
+                'label': atc.label(code),
+                'pairs': atc.pairs_between(atc_code, code)
+            } for code in atc.classes_of(drugbank_id, level)] if level in SUMMARY_LEVELS else []
+            
+            return {
+                'success': True,
+                'data': {
+                    'class': {'code': atc_code, 'label': class_result['data']['label']},
+                    'drug': {'drugbank_id': drugbank_id, 'name': store.name(drugbank_id)},
+                    'interacting': interacting,
+                    'class_pairs': class_pairs
+                },
+                'total': len(interacting)
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    @timed('check_mechanism_overlap')
+    @traced('DrugBankService.check_mechanism_overlap')
+    def check_mechanism_overlap(self, drugbank_ids):
+        """Predicted interactions: inhibitors/inducers and substrates of the same enzyme or transporter"""
+        try:
+            # Ensure database (and mechanism index) is loaded
+            _ = self.root
+            store = DrugBankService._interactions
+            mechanisms = DrugBankService._mechanisms
+            
+            overlaps = []
+            for key, action, perpetrator, substrate in mechanisms.overlap(drugbank_ids):
+                protein = mechanisms.proteins[key]
+                overlaps.append({
+                    'protein': key,
+                    'protein_name': protein['name'],
+                    'kind': protein['kind'],
+                    'action': action,
+                    'perpetrator': {'drugbank_id': perpetrator, 'name': store.name(perpetrator)},
+                    'substrate': {'drugbank_id': substrate, 'name': store.name(substrate)},
+                    'description': f'{store.name(perpetrator)} ({key} {action}) may cause '
+                                   f'{EFFECTS[action]} levels of {store.name(substrate)} ({key} substrate).'
+                })
+            
+            return {
+                'success': True,
+                'data': overlaps,
+                'total': len(overlaps)
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    @staticmethod
+    def _severity(description):
+        """Determine severity based on keywords in description"""
+        desc_lower = description.lower()
+        if any(word in desc_lower for word in ['severe', 'serious', 'major']):
+            return 'major'
+        if any(word in desc_lower for word in ['moderate', 'caution']):
+            return 'moderate'
+        return 'minor'
+    
     def _get_text(self, element, tag):
         """Helper method to safely get text from XML element"""
         elem = element.find(tag, self.namespace)
@@ -0,0 +1,484 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+from .aliases import ALIAS_TYPES, rank_matches
+from .atc import LEVEL_LENGTHS
+from .food import FoodInteractionIndex
+from .interactions import render
+from .mechanisms import MechanismIndex
+
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT) WITHOUT ROWID;
+-- Every interaction node; drugs in the dataset also have a catalog position
+CREATE TABLE drugs (
+    node INTEGER PRIMARY KEY,
+    drugbank_id TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    position INTEGER UNIQUE,
+    in_dataset INTEGER NOT NULL,
+    type TEXT,
+    synonyms TEXT,
+    summary TEXT,
+    details TEXT,
+    food TEXT
+);
+CREATE TABLE templates (id INTEGER PRIMARY KEY, text TEXT NOT NULL);
+CREATE TABLE interactions (
+    drug INTEGER NOT NULL,
+    partner INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    template INTEGER NOT NULL,
+    PRIMARY KEY (drug, partner, seq)
+) WITHOUT ROWID;
+CREATE TABLE alias_keys (id INTEGER PRIMARY KEY, key TEXT NOT NULL UNIQUE);
+CREATE TABLE aliases (
+    key_id INTEGER NOT NULL,
+    drug INTEGER NOT NULL,
+    rank INTEGER NOT NULL,
+    alias TEXT NOT NULL,
+    PRIMARY KEY (key_id, drug)
+) WITHOUT ROWID;
+CREATE VIRTUAL TABLE alias_fts USING fts5(key, content='alias_keys', content_rowid='id', tokenize='trigram');
+CREATE TABLE food_keywords (keyword TEXT NOT NULL, drug INTEGER NOT NULL, PRIMARY KEY (drug, keyword)) WITHOUT ROWID;
+CREATE TABLE proteins (key TEXT PRIMARY KEY, kind TEXT, name TEXT, gene TEXT) WITHOUT ROWID;
+CREATE TABLE mechanisms (
+    drug INTEGER NOT NULL,
+    protein TEXT NOT NULL,
+    action TEXT NOT NULL,
+    PRIMARY KEY (drug, protein, action)
+) WITHOUT ROWID;
+CREATE TABLE atc_codes (code TEXT NOT NULL, drug INTEGER NOT NULL);
+CREATE INDEX atc_codes_code ON atc_codes (code);
+CREATE INDEX atc_codes_drug ON atc_codes (drug);
+CREATE TABLE atc_labels (code TEXT PRIMARY KEY, label TEXT) WITHOUT ROWID;
+CREATE TABLE atc_summary (a TEXT, b TEXT, pairs INTEGER, PRIMARY KEY (a, b)) WITHOUT ROWID;
+"""
+
+# Upper bound for "every key starting with" range scans
+_KEY_END = '\U0010ffff'
+
+
+def build_database(path, service):
+    """Write the dataset loaded by an in-memory DrugBankService to a SQLite file
+
+    Builds next to ``path`` and renames into place, so workers reading the
+    previous file are never handed a half-written one.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + '.tmp')
+    if tmp.exists():
+        tmp.unlink()
+
+    store = service._interactions
+    cache = service._shared_drugs_cache
+    details = {}
+    for drug in service._shared_root.findall('db:drug', service.namespace):
+        id_elem = drug.find('db:drugbank-id[@primary="true"]', service.namespace)
+        if id_elem is not None and id_elem.text:
+            details.setdefault(id_elem.text, service._details(drug, id_elem.text))
+
+    conn = sqlite3.connect(tmp)
+    try:
+        conn.executescript(SCHEMA)
+        nodes = {drugbank_id: node for node, drugbank_id in enumerate(store.ids)}
+        summaries = {}
+        for drug in cache:
+            summaries.setdefault(drug['drugbank_id'], (len(summaries), drug))
+            nodes.setdefault(drug['drugbank_id'], len(nodes))
+        names = dict(zip(store.ids, store.names))
+
+        def drug_rows():
+            for drugbank_id, node in nodes.items():
+                position, drug = summaries.get(drugbank_id, (None, None))
+                yield (
+                    node, drugbank_id, drug['name'] if drug else names.get(drugbank_id, ''), position,
+                    store.has_drug(drugbank_id),
+                    drug['type'] if drug else None,
+                    json.dumps(drug['synonyms']) if drug else None,
+                    json.dumps({key: drug[key] for key in ('description', 'indication', 'categories')}) if drug else None,
+                    json.dumps(details[drugbank_id]) if drugbank_id in details else None,
+                    json.dumps(service._food_index.advice.get(drugbank_id, ())),
+                )
+
+        conn.executemany('INSERT INTO drugs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', drug_rows())
+        conn.executemany('INSERT INTO templates VALUES (?, ?)', enumerate(store.templates))
+        # seq is the entry's position in the in-memory store: it keeps repeated
+        # identical entries apart and preserves their order
+        conn.executemany('INSERT INTO interactions VALUES (?, ?, ?, ?)', (
+            (node, store.partners[index], index, store.template_ids[index])
+            for node in range(len(store.ids))
+            for index in range(store.row_start[node], store.row_end[node])
+        ))
+
+        key_ids = {}
+        alias_rows = []
+        for key, drugbank_id, rank, alias in service._aliases.rows():
+            key_id = key_ids.setdefault(key, len(key_ids) + 1)
+            alias_rows.append((key_id, nodes[drugbank_id], rank, alias))
+        conn.executemany('INSERT INTO alias_keys VALUES (?, ?)', ((key_id, key) for key, key_id in key_ids.items()))
+        conn.executemany('INSERT INTO aliases VALUES (?, ?, ?, ?)', alias_rows)
+        conn.execute("INSERT INTO alias_fts (alias_fts) VALUES ('rebuild')")
+
+        conn.executemany('INSERT INTO food_keywords VALUES (?, ?)', (
+            (keyword, nodes[drugbank_id])
+            for keyword, drugbank_ids in service._food_index.by_keyword.items()
+            for drugbank_id in drugbank_ids
+        ))
+
+        mechanisms = service._mechanisms
+        conn.executemany('INSERT INTO proteins VALUES (?, ?, ?, ?)', (
+            (key, protein['kind'], protein['name'], protein['gene']) for key, protein in mechanisms.proteins.items()
+        ))
+        conn.executemany('INSERT INTO mechanisms VALUES (?, ?, ?)', (
+            (nodes[drugbank_id], key, action)
+            for key, actions in mechanisms.by_action.items()
+            for action, drugbank_ids in actions.items()
+            for drugbank_id in drugbank_ids
+        ))
+
+        atc = service._atc
+        conn.executemany('INSERT INTO atc_codes VALUES (?, ?)', (
+            (code, nodes[drugbank_id]) for drugbank_id, codes in atc.codes.items() for code in codes
+        ))
+        conn.executemany('INSERT INTO atc_labels VALUES (?, ?)', atc.labels.items())
+        conn.executemany('INSERT INTO atc_summary VALUES (?, ?, ?)', (
+            (a, b, pairs) for (a, b), pairs in atc.summary.items()
+        ))
+
+        conn.executemany('INSERT INTO meta VALUES (?, ?)', {
+            'generation': service._dataset_generation,
+            'built_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'drugs': len(summaries),
+            'interactions': store.count,
+            'food_interactions': service._food_index.count,
+            'atc_classes': atc.count,
+            'aliases': service._aliases.count,
+        }.items())
+        conn.commit()
+        conn.execute('ANALYZE')
+        conn.execute('VACUUM')
+    finally:
+        conn.close()
+    os.replace(tmp, path)
+    return path
+
+
+class ConnectionPool:
+    """Read-only connections to one SQLite file, shared between threads"""
+
+    def __init__(self, path, size=4):
+        self.uri = f'{Path(path).resolve().as_uri()}?mode=ro'
+        self.size = max(1, size)
+        self._idle = queue.LifoQueue()
+        self._opened = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connection(self):
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if len(self._opened) < self.size:
+                conn = sqlite3.connect(self.uri, uri=True, check_same_thread=False)
+                conn.execute('PRAGMA query_only = ON')
+                self._opened.append(conn)
+                return conn
+        # Pool exhausted: wait for a connection to come back
+        return self._idle.get()
+
+    def close(self):
+        with self._lock:
+            for conn in self._opened:
+                conn.close()
+            self._opened = []
+        self._idle = queue.LifoQueue()
+
+
+class DrugBankDatabase:
+    """A DrugBank SQLite store exposed through the same interfaces as the in-memory indexes"""
+
+    def __init__(self, path, pool_size=4):
+        self.path = Path(path)
+        self.pool = ConnectionPool(self.path, pool_size)
+        self.meta = dict(self.query('SELECT key, value FROM meta'))
+        self.generation = self.meta.get('generation')
+        self.drugs = DrugRows(self)
+        self.interactions = SQLiteInteractions(self)
+        self.food = SQLiteFoodIndex(self)
+        self.mechanisms = SQLiteMechanisms(self)
+        self.atc = SQLiteATC(self)
+        self.aliases = SQLiteAliases(self)
+
+    def query(self, sql, params=()):
+        with self.pool.connection() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def query_one(self, sql, params=()):
+        rows = self.query(sql, params)
+        return rows[0] if rows else None
+
+    def drug_details(self, drugbank_id):
+        row = self.query_one('SELECT details FROM drugs WHERE drugbank_id = ?', (drugbank_id,))
+        return json.loads(row[0]) if row and row[0] else None
+
+    def close(self):
+        self.pool.close()
+
+
+def _placeholders(values):
+    return ', '.join('?' * len(values))
+
+
+class DrugRows:
+    """The drug summary cache as a lazy sequence (by catalog position) and mapping (by ID)"""
+
+    COLUMNS = 'drugbank_id, name, type, synonyms, summary'
+
+    def __init__(self, database):
+        self.database = database
+        self._count = int(database.meta.get('drugs', 0))
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._count)
+            rows = self.database.query(
+                f'SELECT {self.COLUMNS} FROM drugs WHERE position >= ? AND position < ? ORDER BY position',
+                (start, stop),
+            )
+            return [self._drug(row) for row in rows][::step]
+        if index < 0:
+            index += self._count
+        row = self.database.query_one(f'SELECT {self.COLUMNS} FROM drugs WHERE position = ?', (index,))
+        if row is None:
+            raise IndexError(index)
+        return self._drug(row)
+
+    def __iter__(self):
+        for start in range(0, self._count, 1000):
+            yield from self[start:start + 1000]
+
+    def get(self, drugbank_id, default=None):
+        row = self.database.query_one(
+            f'SELECT {self.COLUMNS} FROM drugs WHERE drugbank_id = ? AND position IS NOT NULL', (drugbank_id,)
+        )
+        return self._drug(row) if row else default
+
+    @staticmethod
+    def _drug(row):
+        drugbank_id, name, drug_type, synonyms, summary = row
+        return {'name': name, 'drugbank_id': drugbank_id, 'type': drug_type,
+                'synonyms': json.loads(synonyms), **json.loads(summary)}
+
+
+class SQLiteInteractions:
+    """InteractionStore lookups answered from the interactions pair index"""
+
+    def __init__(self, database):
+        self.database = database
+        self.count = int(database.meta.get('interactions', 0))
+
+    def _node(self, drugbank_id):
+        return self.database.query_one('SELECT node, name FROM drugs WHERE drugbank_id = ?', (drugbank_id,))
+
+    def has_drug(self, drugbank_id):
+        return self.database.query_one(
+            'SELECT 1 FROM drugs WHERE drugbank_id = ? AND in_dataset', (drugbank_id,)
+        ) is not None
+
+    def name(self, drugbank_id):
+        row = self._node(drugbank_id)
+        return row[1] if row else ''
+
+    def between(self, drugbank_id, partner_id):
+        subject, partner = self._node(drugbank_id), self._node(partner_id)
+        if subject is None or partner is None:
+            return []
+        rows = self.database.query(
+            'SELECT t.text FROM interactions i JOIN templates t ON t.id = i.template '
+            'WHERE i.drug = ? AND i.partner = ? ORDER BY i.seq',
+            (subject[0], partner[0]),
+        )
+        return [render(text, subject[1], partner[1]) for text, in rows]
+
+    def partners_of(self, drugbank_id):
+        subject = self._node(drugbank_id)
+        if subject is None:
+            return
+        rows = self.database.query(
+            'SELECT d.drugbank_id, d.name, t.text FROM interactions i '
+            'JOIN drugs d ON d.node = i.partner JOIN templates t ON t.id = i.template '
+            'WHERE i.drug = ? ORDER BY i.seq',
+            (subject[0],),
+        )
+        for partner_id, partner_name, text in rows:
+            yield partner_id, partner_name, render(text, subject[1], partner_name)
+
+    def partner_ids(self, drugbank_id):
+        return [partner_id for partner_id, in self.database.query(
+            'SELECT DISTINCT d.drugbank_id FROM drugs s JOIN interactions i ON i.drug = s.node '
+            'JOIN drugs d ON d.node = i.partner WHERE s.drugbank_id = ? ORDER BY i.partner',
+            (drugbank_id,),
+        )]
+
+    def lists(self, drugbank_id, partner_id):
+        return self.database.query_one(
+            'SELECT 1 FROM drugs s JOIN drugs p JOIN interactions i ON i.drug = s.node AND i.partner = p.node '
+            'WHERE s.drugbank_id = ? AND p.drugbank_id = ? LIMIT 1',
+            (drugbank_id, partner_id),
+        ) is not None
+
+
+class SQLiteFoodIndex:
+    """FoodInteractionIndex.check over the regimen's rows only"""
+
+    def __init__(self, database):
+        self.database = database
+        self.count = int(database.meta.get('food_interactions', 0))
+
+    def check(self, drugbank_ids, foods=None):
+        index = FoodInteractionIndex()
+        if drugbank_ids:
+            marks = _placeholders(drugbank_ids)
+            for drugbank_id, food in self.database.query(
+                f'SELECT drugbank_id, food FROM drugs WHERE drugbank_id IN ({marks})', drugbank_ids
+            ):
+                index.advice[drugbank_id] = tuple(json.loads(food))
+            for keyword, drugbank_id in self.database.query(
+                f'SELECT f.keyword, d.drugbank_id FROM food_keywords f JOIN drugs d ON d.node = f.drug '
+                f'WHERE d.drugbank_id IN ({marks})', drugbank_ids
+            ):
+                index.by_keyword[keyword].add(drugbank_id)
+        return index.check(drugbank_ids, foods)
+
+
+class SQLiteProteins:
+    def __init__(self, database):
+        self.database = database
+
+    def __getitem__(self, key):
+        row = self.database.query_one('SELECT kind, name, gene FROM proteins WHERE key = ?', (key,))
+        if row is None:
+            raise KeyError(key)
+        return {'kind': row[0], 'name': row[1], 'gene': row[2]}
+
+
+class SQLiteMechanisms:
+    """MechanismIndex.overlap over the regimen's rows only"""
+
+    def __init__(self, database):
+        self.database = database
+        self.proteins = SQLiteProteins(database)
+
+    def overlap(self, drugbank_ids, kinds=None):
+        index = MechanismIndex()
+        if drugbank_ids:
+            for drugbank_id, key, action, kind, name, gene in self.database.query(
+                'SELECT d.drugbank_id, m.protein, m.action, p.kind, p.name, p.gene FROM mechanisms m '
+                'JOIN drugs d ON d.node = m.drug JOIN proteins p ON p.key = m.protein '
+                f'WHERE d.drugbank_id IN ({_placeholders(drugbank_ids)})', list(drugbank_ids)
+            ):
+                index.link(drugbank_id, key, {'kind': kind, 'name': name, 'gene': gene}, [action])
+        return index.overlap(drugbank_ids, kinds)
+
+
+class SQLiteATC:
+    """ATCIndex queries as range scans over the code index"""
+
+    def __init__(self, database):
+        self.database = database
+        self.count = int(database.meta.get('atc_classes', 0))
+
+    def has_class(self, code):
+        code = code.strip().upper()
+        if not code:
+            return False
+        row = self.database.query_one('SELECT code FROM atc_codes WHERE code >= ? AND code < ? LIMIT 1',
+                                      (code, code + _KEY_END))
+        return row is not None and (len(code) in LEVEL_LENGTHS or row[0] == code)
+
+    def drugs_under(self, code):
+        code = code.strip().upper()
+        if not code:
+            return []
+        rows = self.database.query(
+            'SELECT d.drugbank_id FROM atc_codes a JOIN drugs d ON d.node = a.drug '
+            'WHERE a.code >= ? AND a.code < ? ORDER BY a.code, a.rowid',
+            (code, code + _KEY_END),
+        )
+        return list(dict.fromkeys(drugbank_id for drugbank_id, in rows))
+
+    def label(self, code):
+        row = self.database.query_one('SELECT label FROM atc_labels WHERE code = ?', (code,))
+        return row[0] if row else ''
+
+    def codes_of(self, drugbank_id):
+        return tuple(code for code, in self.database.query(
+            'SELECT a.code FROM atc_codes a JOIN drugs d ON d.node = a.drug WHERE d.drugbank_id = ? ORDER BY a.rowid',
+            (drugbank_id,),
+        ))
+
+    def classes_of(self, drugbank_id, level):
+        length = LEVEL_LENGTHS[level - 1]
+        return sorted({code[:length] for code in self.codes_of(drugbank_id) if len(code) >= length})
+
+    def pairs_between(self, code_1, code_2):
+        row = self.database.query_one('SELECT pairs FROM atc_summary WHERE a = ? AND b = ?',
+                                      (code_1, code_2) if code_1 <= code_2 else (code_2, code_1))
+        return row[0] if row else 0
+
+
+class SQLiteAliases:
+    """AliasIndex.search with key range scans for prefixes and FTS5 trigrams for substrings"""
+
+    SELECT = ('SELECT k.key, d.drugbank_id, a.rank, a.alias FROM alias_keys k '
+              'JOIN aliases a ON a.key_id = k.id JOIN drugs d ON d.node = a.drug ')
+
+    def __init__(self, database):
+        self.database = database
+        self.count = int(database.meta.get('aliases', 0))
+
+    def search(self, query, limit=None):
+        needle = query.strip().lower()
+        if not needle:
+            return []
+        candidates = self.database.query(self.SELECT + 'WHERE k.key >= ? AND k.key < ?', (needle, needle + _KEY_END))
+        # Prefix matches outrank any substring match, so stop if there are enough
+        if limit is None or len({drugbank_id for _, drugbank_id, _, _ in candidates}) < limit:
+            if len(needle) >= 3:
+                phrase = '"' + needle.replace('"', '""') + '"'
+                candidates += self.database.query(
+                    self.SELECT + 'WHERE k.id IN (SELECT rowid FROM alias_fts WHERE alias_fts MATCH ?)', (phrase,)
+                )
+            else:
+                # Trigrams can't answer one- or two-character needles
+                candidates += self.database.query(self.SELECT + 'WHERE instr(k.key, ?) > 0', (needle,))
+        return rank_matches(needle, candidates, limit)
+
+    def aliases_of(self, types=ALIAS_TYPES):
+        ranks = [ALIAS_TYPES.index(alias_type) for alias_type in types]
+        aliases = {}
+        for _, drugbank_id, _, alias in self.database.query(
+            self.SELECT + f'WHERE a.rank IN ({_placeholders(ranks)}) ORDER BY k.key', ranks
+        ):
+            aliases.setdefault(drugbank_id, []).append(alias)
+        return aliases
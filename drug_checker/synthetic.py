@@ -0,0 +1,216 @@
+import random
+from xml.sax.saxutils import escape
+
+
+NAMESPACE = 'http://www.drugbank.ca'
+
+# Wording modelled on real DrugBank interaction text; severity keywords match
+# the ones DrugBankService.check_drug_interactions scores
+INTERACTION_TEMPLATES = [
+    'The risk or severity of bleeding can be increased when {a} is combined with {b}.',
+    'The risk or severity of serious adverse effects can be increased when {a} is combined with {b}.',
+    '{a} may decrease the excretion rate of {b} which could result in a higher serum level.',
+    'The metabolism of {b} can be decreased when combined with {a}.',
+    '{a} may increase the hypotensive activities of {b}. Use with caution.',
+    'The therapeutic efficacy of {b} can be decreased when used in combination with {a}.',
+    'The serum concentration of {b} can be increased when it is combined with {a}; monitor for moderate toxicity.',
+]
+FOOD_INTERACTIONS = [
+    'Take with food.',
+    'Avoid alcohol.',
+    'Avoid grapefruit products.',
+    'Take on an empty stomach.',
+    'Avoid St. John\'s Wort.',
+    'Limit caffeine intake.',
+]
+CATEGORIES = [
+    'Anticoagulants', 'Analgesics', 'Anti-Inflammatory Agents', 'Antihypertensive Agents',
+    'Cytochrome P-450 CYP3A Substrates', 'Cytochrome P-450 CYP2C9 Inhibitors', 'Antibacterial Agents',
+    'Hypoglycemic Agents', 'Central Nervous System Depressants', 'Diuretics', 'Antineoplastic Agents',
+    'Platelet Aggregation Inhibitors', 'Vasodilating Agents', 'Immunosuppressive Agents',
+]
+ATC_LEVELS = [
+    ('B', 'BLOOD AND BLOOD FORMING ORGANS'), ('C', 'CARDIOVASCULAR SYSTEM'),
+    ('J', 'ANTIINFECTIVES FOR SYSTEMIC USE'), ('N', 'NERVOUS SYSTEM'), ('M', 'MUSCULO-SKELETAL SYSTEM'),
+]
+ENZYMES = [
+    ('BE0002793', 'Cytochrome P450 3A4', 'CYP3A4'), ('BE0002363', 'Cytochrome P450 2C9', 'CYP2C9'),
+    ('BE0002638', 'Cytochrome P450 2D6', 'CYP2D6'), ('BE0003536', 'Cytochrome P450 1A2', 'CYP1A2'),
+]
+TRANSPORTERS = [
+    ('BE0001032', 'Multidrug resistance protein 1', 'ABCB1'),
+    ('BE0003647', 'Solute carrier organic anion transporter family member 1B1', 'SLCO1B1'),
+]
+# Mostly substrates, as in the real export, so inhibitor-substrate overlaps are common
+ENZYME_ACTIONS = ['substrate', 'substrate', 'substrate', 'inhibitor', 'inducer']
+TRANSPORTER_ACTIONS = ['substrate', 'substrate', 'inhibitor']
+SYLLABLES = ['ab', 'ac', 'al', 'am', 'an', 'ar', 'ba', 'ce', 'da', 'di', 'fen', 'ga', 'in', 'lo',
+             'mi', 'na', 'ol', 'pra', 'ri', 'sa', 'te', 'to', 'va', 'xi', 'zo']
+SUFFIXES = ['mab', 'pril', 'olol', 'statin', 'azole', 'cillin', 'mycin', 'sartan', 'vir', 'tide',
+            'parin', 'oxacin', 'dipine', 'afil', 'ine']
+EMPTY_REFERENCES = '<articles/><textbooks/><links/><attachments/>'
+
+
+def drug_name(rng, index):
+    """Pronounceable unique drug name such as 'Ribatestatin 42'"""
+    stem = ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3)))
+    return f'{stem.capitalize()}{rng.choice(SUFFIXES)} {index}'
+
+
+def interaction_pairs(rng, drugs, interactions):
+    """Symmetric adjacency lists giving each drug about ``interactions`` partners"""
+    partners = [set() for _ in range(drugs)]
+    if drugs < 2:
+        return partners
+    for _ in range(drugs * interactions // 2):
+        a, b = rng.randrange(drugs), rng.randrange(drugs)
+        if a != b:
+            partners[a].add(b)
+            partners[b].add(a)
+    return partners
+
+
+def generate_drugbank_xml(out, drugs=5000, interactions=20, seed=0):
+    """Stream a synthetic DrugBank export valid against static/drugbank.xsd to ``out``
+
+    ``out`` is a text file object. Drug ``i`` gets id ``DB{i+1:05d}`` so
+    callers can pick ids without parsing; every interaction is listed on
+    both drugs, as in the real export. Returns the generated (id, name) list
+    and, per drug, the set of catalog indexes it interacts with.
+    """
+    if not 0 < drugs <= 99999:
+        raise ValueError('drugs must be between 1 and 99999 (DB IDs have five digits)')
+
+    rng = random.Random(seed)
+    catalog = [(f'DB{i + 1:05d}', drug_name(rng, i + 1)) for i in range(drugs)]
+    partners = interaction_pairs(rng, drugs, interactions)
+
+    out.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+    out.write(f'<drugbank xmlns="{NAMESPACE}" version="synthetic" exported-on="2024-01-01">\n')
+    for index, (drugbank_id, name) in enumerate(catalog):
+        out.write(_drug_xml(rng, index, drugbank_id, name, catalog, partners[index]))
+    out.write('</drugbank>\n')
+    return catalog, partners
+
+
+def _drug_xml(rng, index, drugbank_id, name, catalog, partners):
+    drug_type = 'biotech' if index % 10 == 0 else 'small molecule'
+    text = escape(name)
+    parts = [
+        f'<drug type="{drug_type}" created="2005-06-13" updated="2024-01-01">',
+        f'<drugbank-id primary="true">{drugbank_id}</drugbank-id>',
+        f'<drugbank-id>APRD{index % 100000:05d}</drugbank-id>',
+        f'<name>{text}</name>',
+        f'<description>{text} is a synthetic {drug_type} generated for benchmarking. '
+        f'It has no therapeutic use and exists only to exercise the drug checker.</description>',
+        f'<cas-number>{index}-{index % 97:02d}-{index % 10}</cas-number>',
+        f'<unii>SYN{index:07d}</unii>',
+        '<state>solid</state>' if drug_type == 'small molecule' else '',
+        '<groups><group>approved</group></groups>',
+        f'<general-references>{EMPTY_REFERENCES}</general-references>',
+        '<synthesis-reference/>',
+        f'<indication>Used as a stand-in indication for {text} in performance tests.</indication>',
+        '<pharmacodynamics/><mechanism-of-action/><toxicity/><metabolism/><absorption/>',
+        '<half-life/><protein-binding/><route-of-elimination/><volume-of-distribution/><clearance/>',
+        '<salts/>',
+        '<synonyms>',
+        *(f'<synonym language="english" coder="">{text} {suffix}</synonym>'
+          for suffix in rng.sample(['sodium', 'hydrochloride', 'acetate', 'base', 'anhydrous'], 3)),
+        '</synonyms>',
+        '<products>',
+        *(_product_xml(rng, f'{brand}{index}', index) for brand in rng.sample(['Zen', 'Calm', 'Viva', 'Pro'], 2)),
+        '</products>',
+        f'<international-brands><international-brand><name>Intl{index}</name>'
+        f'<company>Synthetic Pharma</company></international-brand></international-brands>',
+        '<mixtures/><packagers/><manufacturers/><prices/>',
+        '<categories>',
+        *(f'<category><category>{escape(category)}</category><mesh-id>D{index % 1000000:06d}</mesh-id></category>'
+          for category in rng.sample(CATEGORIES, 3)),
+        '</categories>',
+        '<affected-organisms><affected-organism>Humans and other mammals</affected-organism></affected-organisms>',
+        '<dosages/>',
+        '<atc-codes>',
+        _atc_xml(rng, index),
+        '</atc-codes>',
+        '<ahfs-codes/><pdb-entries/><patents/>',
+        '<food-interactions>',
+        *(f'<food-interaction>{escape(food)}</food-interaction>'
+          for food in rng.sample(FOOD_INTERACTIONS, rng.randint(0, 2))),
+        '</food-interactions>',
+        '<drug-interactions>',
+        *(_interaction_xml(rng, name, catalog[partner]) for partner in sorted(partners)),
+        '</drug-interactions>',
+        '<experimental-properties/><external-identifiers/><external-links/><pathways/><reactions/>',
+        '<snp-effects/><snp-adverse-drug-reactions/><targets/>',
+        '<enzymes>',
+        *(_interactant_xml(enzyme, position, rng.choice(ENZYME_ACTIONS), enzyme=True)
+          for position, enzyme in enumerate(rng.sample(ENZYMES, rng.randint(0, 2)), 1)),
+        '</enzymes>',
+        '<carriers/>',
+        '<transporters>',
+        *(_interactant_xml(transporter, position, rng.choice(TRANSPORTER_ACTIONS))
+          for position, transporter in enumerate(rng.sample(TRANSPORTERS, rng.randint(0, 1)), 1)),
+        '</transporters>',
+        '</drug>\n',
+    ]
+    return ''.join(parts)
+
+
+def _product_xml(rng, brand, index):
+    return (
+        f'<product><name>{brand}</name><labeller>Synthetic Labs</labeller>'
+        f'<ndc-id/><ndc-product-code>{index % 10000:04d}-{rng.randint(0, 999):03d}</ndc-product-code>'
+        '<dpd-id/><ema-product-code/><ema-ma-number/>'
+        '<started-marketing-on>2010-01-01</started-marketing-on><ended-marketing-on/>'
+        f'<dosage-form>Tablet</dosage-form><strength>{rng.choice([5, 10, 25, 50, 100])} mg</strength>'
+        '<route>Oral</route><fda-application-number/>'
+        '<generic>false</generic><over-the-counter>false</over-the-counter><approved>true</approved>'
+        '<country>US</country><source>FDA NDC</source></product>'
+    )
+
+
+def _atc_xml(rng, index):
+    group, description = rng.choice(ATC_LEVELS)
+    code = f'{group}{index % 100:02d}A{chr(65 + index % 26)}{index % 100:02d}'
+    levels = [
+        (code[:5], f'{description} SUBGROUP {code[:5]}'),
+        (code[:4], f'{description} GROUP {code[:4]}'),
+        (code[:3], f'{description} CLASS {code[:3]}'),
+        (code[:1], description),
+    ]
+    return f'<atc-code code="{code}">' + ''.join(
+        f'<level code="{level_code}">{level}</level>' for level_code, level in levels
+    ) + '</atc-code>'
+
+
+def _interaction_xml(rng, name, partner):
+    partner_id, partner_name = partner
+    description = rng.choice(INTERACTION_TEMPLATES).format(a=name, b=partner_name)
+    return (
+        f'<drug-interaction><drugbank-id>{partner_id}</drugbank-id>'
+        f'<name>{escape(partner_name)}</name><description>{escape(description)}</description></drug-interaction>'
+    )
+
+
+def _interactant_xml(interactant, position, action, enzyme=False):
+    be_id, name, gene = interactant
+    tag = 'enzyme' if enzyme else 'transporter'
+    strengths = '<inhibition-strength/><induction-strength/>' if enzyme else ''
+    return (
+        f'<{tag} position="{position}"><id>{be_id}</id><name>{escape(name)}</name>'
+        f'<organism>Humans</organism><actions><action>{action}</action></actions>'
+        f'<references>{EMPTY_REFERENCES}</references><known-action>unknown</known-action>'
+        f'{_polypeptide_xml(name, gene)}{strengths}</{tag}>'
+    )
+
+
+def _polypeptide_xml(name, gene):
+    return (
+        f'<polypeptide id="SYN-{gene}" source="Swiss-Prot"><name>{escape(name)}</name>'
+        '<general-function/><specific-function/>'
+        f'<gene-name>{gene}</gene-name><locus/><cellular-location/><transmembrane-regions/>'
+        '<signal-regions/><theoretical-pi/><molecular-weight/><chromosome-location/>'
+        '<organism ncbi-taxonomy-id="9606">Humans</organism><external-identifiers/><synonyms/>'
+        '<amino-acid-sequence format="FASTA"/><gene-sequence format="FASTA"/><pfams/><go-classifiers/>'
+        '</polypeptide>'
+    )
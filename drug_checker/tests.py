@@ -1,3 +1,661 @@
-from django.test import TestCase
+import contextlib
+import io
+import json
+import tempfile
+import unittest
+import unittest.mock
+from pathlib import Path
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from authentication.models import CaregiverPatientRelationship, UserProfile
+from main.metrics import Metrics
+from main.testing import plain_static_storage
+from .aliases import AliasIndex
+from .atc import ATCIndex
+from .client_index import build_index, index_url, write_index
+from .food import FoodInteractionIndex
+from . import fragments
+from .fragments import DrugFragments, FragmentJsonResponse
+from .history_logger import HistoryLogger
+from .interactions import InteractionStore
+from .mechanisms import MechanismIndex
+from .models import DrugSearch, DrugInteractionCheck, InteractionAlert, SavedDrug
+from .services import DrugBankService
+from .synthetic import generate_drugbank_xml
+
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+
+@override_settings(DRUG_HISTORY_FLUSH_SIZE=3, DRUG_HISTORY_FLUSH_INTERVAL=0)
+class HistoryLoggerTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', 'alice@example.com', 'pw')
+        self.logger = HistoryLogger()
+
+    def tearDown(self):
+        HistoryLogger._shared_pending = []
+
+    def test_events_are_buffered_until_flush(self):
+        with self.assertNumQueries(0):
+            self.logger.log_search(self.user, 'Warfarin', 'DB00682')
+            self.logger.log_search(self.user, 'aspirin')
+        self.assertEqual(self.logger.pending_count(), 2)
+        self.assertFalse(DrugSearch.objects.exists())
+
+        self.assertEqual(self.logger.flush(), 2)
+        self.assertEqual(self.logger.pending_count(), 0)
+        self.assertEqual(DrugSearch.objects.filter(user=self.user).count(), 2)
+
+    def test_full_batch_is_written_with_one_insert_per_model(self):
+        self.logger.log_search(self.user, 'Warfarin', 'DB00682')
+        self.logger.log_interaction(
+            self.user, 'Warfarin', 'DB00682', 'Aspirin', 'DB00945',
+            severity='major', description='Increased bleeding risk'
+        )
+        with self.assertNumQueries(2):
+            self.logger.log_search(self.user, 'Aspirin', 'DB00945')
+
+        self.assertEqual(DrugSearch.objects.count(), 2)
+        check = DrugInteractionCheck.objects.get()
+        self.assertEqual(check.user, self.user)
+        self.assertEqual(check.severity, 'major')
+
+    def test_failed_write_is_logged_and_counted(self):
+        Metrics.reset()
+        self.addCleanup(Metrics.reset)
+        self.logger.log_search(self.user, 'Warfarin', 'DB00682')
+        self.logger.log_search(self.user, 'Aspirin', 'DB00945')
+        with unittest.mock.patch.object(DrugSearch.objects, 'bulk_create', side_effect=RuntimeError('disk full')), \
+                self.assertLogs('drug_checker.history_logger', 'ERROR') as logs:
+            self.assertEqual(self.logger.flush(), 0)
+
+        self.assertIn('Dropped 2 DrugSearch history rows', logs.output[0])
+        self.assertIn('drug_history_dropped_total{model="DrugSearch"} 2', Metrics().render())
+
+    def test_history_benchmark_refuses_the_default_database(self):
+        from django.core.management.base import CommandError
+
+        for alias in ('default', 'missing'):
+            with self.assertRaises(CommandError):
+                call_command('bench_history', database=alias, rows=10, stdout=io.StringIO())
+        self.assertFalse(User.objects.filter(username__startswith='bench_history_').exists())
+
+    @override_settings(DRUG_HISTORY_FLUSH_PER_REQUEST=True, DRUG_HISTORY_FLUSH_INTERVAL=5)
+    def test_serverless_requests_write_their_own_history(self):
+        self.addCleanup(setattr, HistoryLogger, '_flush_thread', HistoryLogger._flush_thread)
+        HistoryLogger._flush_thread = None
+        self.client.force_login(self.user)
+        self.client.post(reverse('log_search'), {'q': 'warfarin'})
+
+        self.assertEqual(list(DrugSearch.objects.values_list('drug_name', flat=True)), ['warfarin'])
+        self.assertEqual(self.logger.pending_count(), 0)
+        self.assertIsNone(HistoryLogger._flush_thread)
+
+
+class DrugBankStateMixin:
+    """Snapshot DrugBankService's class-level dataset and restore it after each test"""
+    STATE = (
+        '_shared_root', '_shared_drugs_cache', '_drugs_by_id', '_dataset_generation', '_interactions',
+        '_food_index', '_mechanisms', '_atc', '_aliases', '_database', '_fragments', '_is_loaded',
+    )
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(self.restore_state, {name: getattr(DrugBankService, name) for name in self.STATE})
+
+    def restore_state(self, saved_state):
+        for name, value in saved_state.items():
+            setattr(DrugBankService, name, value)
+
+
+class SyntheticDatasetMixin(DrugBankStateMixin):
+    """Generate a small synthetic DrugBank XML and start each test from an unloaded service"""
+
+    def setUp(self):
+        super().setUp()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.xml_path = Path(tmp.name) / 'drugbank.xml'
+        with open(self.xml_path, 'w', encoding='utf-8') as out:
+            self.catalog, self.partners = generate_drugbank_xml(out, drugs=50, interactions=6, seed=3)
+        DrugBankService.reset()
+
+    @contextlib.contextmanager
+    def dataset(self, **overrides):
+        """Point the service at the generated XML, keeping the loader's output quiet"""
+        with self.settings(DRUGBANK_XML_PATH=str(self.xml_path), **overrides), \
+                contextlib.redirect_stdout(io.StringIO()):
+            yield
+
+
+@plain_static_storage
+class TemplateFragmentCacheTests(DrugBankStateMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.load_dataset('gen-1', ['Warfarin'])
+
+    def load_dataset(self, generation, names):
+        DrugBankService._shared_root = object()
+        DrugBankService._shared_drugs_cache = [
+            {'name': name, 'drugbank_id': f'DB{i:05d}', 'type': 'small molecule',
+             'synonyms': [], 'description': '', 'indication': '', 'categories': []}
+            for i, name in enumerate(names)
+        ]
+        DrugBankService._dataset_generation = generation
+        DrugBankService._is_loaded = True
+
+    def test_drug_table_is_reused_until_the_dataset_changes(self):
+        self.assertContains(self.client.get(reverse('search_drugs')), 'Warfarin')
+
+        # Same generation: the cached fragment is served
+        DrugBankService._shared_drugs_cache[0]['name'] = 'Aspirin'
+        self.assertContains(self.client.get(reverse('search_drugs')), 'Warfarin')
+
+        self.load_dataset('gen-2', ['Aspirin'])
+        response = self.client.get(reverse('search_drugs'))
+        self.assertContains(response, 'Aspirin')
+        self.assertNotContains(response, 'Warfarin')
+
+    def test_navigation_fragment_varies_by_role(self):
+        for username, role, link in (('pat', 'patient', 'record_symptom'), ('carol', 'caregiver', 'caregiver_dashboard')):
+            user = User.objects.create_user(username)
+            UserProfile.objects.create(user=user, role=role, disclaimer_accepted=True)
+            self.client.force_login(user)
+            response = self.client.get(reverse('interaction_checker'))
+            self.assertContains(response, f'href="{reverse(link)}"')
+
+
+@override_settings(DRUG_HISTORY_FLUSH_SIZE=50, DRUG_HISTORY_FLUSH_INTERVAL=0)
+@plain_static_storage
+class ClientDrugIndexTests(TestCase):
+    drugs = [
+        {'name': 'Warfarin', 'drugbank_id': 'DB00682', 'type': 'small molecule',
+         'synonyms': ['Coumadin'], 'description': 'Anticoagulant', 'categories': ['Coumarins']},
+        {'name': 'Insulin', 'drugbank_id': 'DB00030', 'type': 'biotech',
+         'synonyms': [], 'description': '', 'categories': []},
+    ]
+
+    def setUp(self):
+        self.static_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.static_dir.cleanup)
+
+    def tearDown(self):
+        HistoryLogger._shared_pending = []
+
+    def test_index_keeps_only_search_fields(self):
+        index = build_index(self.drugs, 'gen-1', {'DB00682': ['Jantoven']})
+        self.assertEqual(index, {
+            'generation': 'gen-1',
+            'types': ['biotech', 'small molecule'],
+            'drugs': [['DB00682', 'Warfarin', ['Coumadin'], 1, ['Jantoven']], ['DB00030', 'Insulin', [], 0, []]],
+        })
+
+        path = write_index(index, self.static_dir.name)
+        self.assertEqual(json.loads(path.read_text(encoding='utf-8')), index)
+        self.assertNotIn(' ', path.read_text(encoding='utf-8').replace('small molecule', ''))
+
+    def test_url_is_only_exposed_when_enabled_and_built(self):
+        with self.settings(STATICFILES_DIRS=[self.static_dir.name], DRUG_CLIENT_INDEX=True):
+            self.assertIsNone(index_url())
+            write_index(build_index(self.drugs), self.static_dir.name)
+            self.assertEqual(index_url(), '/static/drugs/drug-index.json')
+
+            with self.settings(DRUG_CLIENT_INDEX=False):
+                self.assertIsNone(index_url())
+
+    def test_locally_filtered_searches_are_still_logged(self):
+        url = reverse('log_search')
+        self.assertEqual(self.client.get(url).status_code, 405)
+        self.assertEqual(self.client.post(url, {'q': 'warf'}).json(), {'logged': False})
+
+        user = User.objects.create_user('bob')
+        self.client.force_login(user)
+        self.assertEqual(self.client.post(url, {'q': 'warf'}).json(), {'logged': True})
+        HistoryLogger().flush()
+        self.assertEqual(DrugSearch.objects.get().drug_name, 'warf')
+
+
+class InteractionStoreTests(SimpleTestCase):
+    def setUp(self):
+        self.store = InteractionStore()
+        self.store.add_drug('DB00001', 'Insulin')
+        self.store.add_drug('DB00002', 'Insulin glargine')
+        self.store.add_drug('DB00003', 'Warfarin')
+        self.store.add_interactions('DB00001', [
+            ('DB00003', 'Warfarin', 'Insulin may increase the anticoagulant activities of Warfarin.'),
+            ('DB00002', 'Insulin glargine', 'Insulin may increase the hypoglycemic activities of Insulin glargine.'),
+            ('DB09999', 'Unlisted', 'The risk of serious bleeding rises when Insulin is combined with Unlisted.'),
+        ])
+        self.store.add_interactions('DB00003', [
+            ('DB00001', 'Insulin', 'Warfarin may increase the anticoagulant activities of Insulin.'),
+        ])
+
+    def test_descriptions_are_rendered_back_exactly(self):
+        self.assertEqual(self.store.between('DB00001', 'DB00002'),
+                         ['Insulin may increase the hypoglycemic activities of Insulin glargine.'])
+        self.assertEqual(self.store.between('DB00003', 'DB00001'),
+                         ['Warfarin may increase the anticoagulant activities of Insulin.'])
+        self.assertEqual(self.store.between('DB00002', 'DB00001'), [])
+        self.assertEqual(list(self.store.partners_of('DB00001'))[-1],
+                         ('DB09999', 'Unlisted', 'The risk of serious bleeding rises when Insulin is combined with Unlisted.'))
+
+    def test_repeated_sentences_share_one_template(self):
+        self.assertEqual(self.store.count, 4)
+        self.assertEqual(len(self.store.templates), 3)
+        self.assertIn('\x001 may increase the anticoagulant activities of \x002.', self.store.templates)
+
+    def test_pairs_lists_each_interacting_pair_once(self):
+        self.assertEqual(sorted(self.store.pairs()), [
+            ('DB00001', 'DB00002'), ('DB00001', 'DB00003'), ('DB00001', 'DB09999'),
+        ])
+        self.assertTrue(self.store.lists('DB00003', 'DB00001'))
+        self.assertFalse(self.store.lists('DB00002', 'DB00001'))
+
+    def test_partners_outside_the_dataset_are_not_drugs(self):
+        self.assertTrue(self.store.has_drug('DB00001'))
+        self.assertFalse(self.store.has_drug('DB09999'))
+        self.assertEqual(self.store.name('DB09999'), 'Unlisted')
+
+
+class FoodInteractionIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = FoodInteractionIndex()
+        self.index.add('DB00001', ['Avoid grapefruit products.', 'Avoid alcohol.'])
+        self.index.add('DB00002', ['Take with food.', ' Avoid alcohol. '])
+        self.index.add('DB00003', ['', None])
+
+    def test_sentences_are_indexed_by_food_keyword(self):
+        self.assertEqual(self.index.drugs_for('alcohol'), {'DB00001', 'DB00002'})
+        self.assertEqual(self.index.drugs_for('grapefruit'), {'DB00001'})
+        self.assertEqual(self.index.drugs_for('with_food'), {'DB00002'})
+        self.assertNotIn('DB00003', self.index.advice)
+        self.assertIs(self.index.advice['DB00001'][1], self.index.advice['DB00002'][1])
+
+    def test_check_groups_regimen_drugs_by_food(self):
+        advice, by_food = self.index.check(['DB00002', 'DB00001', 'DB00009'])
+        self.assertEqual(advice['DB00009'], ())
+        self.assertEqual(advice['DB00002'], ('Take with food.', 'Avoid alcohol.'))
+        self.assertIn(('alcohol', ['DB00001', 'DB00002']), by_food)
+
+        _, by_food = self.index.check(['DB00001', 'DB00002'], ['grapefruit', 'unknown'])
+        self.assertEqual(by_food, [('grapefruit', ['DB00001'])])
+
+
+class DrugFragmentsTests(SimpleTestCase):
+    drug = {'name': 'Warfarin', 'drugbank_id': 'DB00682', 'type': 'small molecule', 'synonyms': ['Coumadin é']}
+
+    def test_fragments_are_encoded_once_and_annotated_per_match(self):
+        drug_fragments = DrugFragments('gen-1')
+        first = drug_fragments.encode(self.drug)
+        self.assertIs(drug_fragments.encode(self.drug), first)
+        self.assertEqual(json.loads(first), self.drug)
+
+        annotated = {**self.drug, 'matched': 'Coumadin', 'match_type': 'brand'}
+        self.assertEqual(json.loads(drug_fragments.encode(annotated)), annotated)
+        self.assertEqual(len(drug_fragments), 1)
+
+    def test_response_matches_json_response_with_either_encoder(self):
+        for encoder in (fragments.orjson, None):
+            with self.subTest(orjson=encoder is not None), unittest.mock.patch.object(fragments, 'orjson', encoder):
+                response = FragmentJsonResponse(
+                    {'total': 1, 'query': 'wár'}, results=[DrugFragments('gen-1').encode(self.drug)]
+                )
+                self.assertEqual(response['Content-Type'], 'application/json')
+                self.assertEqual(json.loads(response.content), {'results': [self.drug], 'total': 1, 'query': 'wár'})
+        self.assertEqual(json.loads(FragmentJsonResponse({}, results=[]).content), {'results': []})
+
+
+class AliasIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = AliasIndex()
+        self.index.add('DB00682', 'Warfarin', 'name')
+        self.index.add('DB00682', 'DB00682', 'id')
+        for _ in range(3):  # one <product> per package in the real export
+            self.index.add('DB00682', 'Coumadin', 'product')
+        self.index.add('DB00682', 'Coumadin', 'brand')
+        self.index.add('DB00682', 'Warfarin sodium', 'synonym')
+        self.index.add('DB00945', 'Aspirin', 'name')
+        self.index.add('DB00945', 'Acetylsalicylic acid', 'synonym')
+        self.index.add('DB00945', 'Ecotrin', 'product')
+        self.index.add('DB01050', 'Ibuprofen', 'name')
+        self.index.add('DB01050', 'Advil', 'brand')
+        self.index.add('DB09999', 'Ecotrinol', 'name')
+        self.index.add('DB08888', 'Dimecotrin', 'name')
+        self.index.finish()
+
+    def test_aliases_are_deduplicated_with_their_best_type(self):
+        self.assertEqual(self.index.count, 11)
+        self.assertEqual(self.index.search('coumadin'), [('DB00682', 'Coumadin', 'brand')])
+        self.assertEqual(self.index.aliases_of(('brand', 'product')), {
+            'DB01050': ['Advil'], 'DB00682': ['Coumadin'], 'DB00945': ['Ecotrin'],
+        })
+
+    def test_search_ranks_exact_then_prefix_then_substring(self):
+        self.assertEqual([drug for drug, _, _ in self.index.search('ECOTRIN')], ['DB00945', 'DB09999', 'DB08888'])
+        self.assertEqual(self.index.search('ecotrin', limit=2), [
+            ('DB00945', 'Ecotrin', 'product'), ('DB09999', 'Ecotrinol', 'name'),
+        ])
+        self.assertEqual(self.index.search('salicyl'), [('DB00945', 'Acetylsalicylic acid', 'synonym')])
+        self.assertEqual(self.index.search('  '), [])
+
+
+class ATCIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = ATCIndex()
+        self.index.add('DB00682', 'B01AA03', {'B01AA': 'Vitamin K antagonists', 'B01A': 'ANTITHROMBOTIC AGENTS'})
+        self.index.add('DB01109', 'B01AB01', {'B01AB': 'Heparin group'})
+        self.index.add('DB00945', 'B01AC06', {})
+        self.index.add('DB00945', 'N02BA01', {'N02B': 'OTHER ANALGESICS AND ANTIPYRETICS'})
+        self.index.add('DB01050', 'M01AE01', {'M01A': 'ANTIINFLAMMATORY AND ANTIRHEUMATIC PRODUCTS, NON-STEROIDS'})
+        self.index.finish()
+
+    def test_class_queries_return_every_drug_below_the_prefix(self):
+        self.assertEqual(self.index.drugs_under('b01a'), ['DB00682', 'DB01109', 'DB00945'])
+        self.assertEqual(self.index.drugs_under('B01AB'), ['DB01109'])
+        self.assertEqual(self.index.drugs_under('B'), self.index.drugs_under('B01A'))
+        self.assertEqual(self.index.drugs_under('B0'), [])
+        self.assertFalse(self.index.has_class('B0'))
+        self.assertEqual(self.index.label('B01A'), 'ANTITHROMBOTIC AGENTS')
+
+    def test_summary_counts_pairs_between_classes(self):
+        self.assertEqual(self.index.classes_of('DB00945', 3), ['B01A', 'N02B'])
+        self.index.summarize([('DB00682', 'DB01050'), ('DB00945', 'DB01050'), ('DB00682', 'DB01109')])
+        self.assertEqual(self.index.pairs_between('M01A', 'B01A'), 2)
+        self.assertEqual(self.index.pairs_between('B01A', 'B01A'), 1)
+        self.assertEqual(self.index.pairs_between('N02', 'M01'), 1)
+        self.assertEqual(self.index.pairs_between('N02B', 'B01A'), 0)
+
+
+class MechanismIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = MechanismIndex()
+        self.index.add('DB00001', 'enzyme', 'BE0002793', 'Cytochrome P450 3A4', 'CYP3A4', ['Inhibitor'])
+        self.index.add('DB00002', 'enzyme', 'BE0002793', 'Cytochrome P450 3A4', 'CYP3A4', ['substrate'])
+        self.index.add('DB00003', 'enzyme', 'BE0002793', 'Cytochrome P450 3A4', 'CYP3A4', ['substrate', 'inducer'])
+        self.index.add('DB00004', 'target', 'BE0000048', 'Prothrombin', 'F2', ['inhibitor'])
+        self.index.add('DB00005', 'target', 'BE0000048', 'Prothrombin', 'F2', ['substrate'])
+        self.index.add('DB00006', 'transporter', 'BE0001032', 'Multidrug resistance protein 1', '', [])
+
+    def test_proteins_are_keyed_by_gene_name_and_grouped_by_action(self):
+        self.assertEqual(self.index.drugs_with('CYP3A4', 'substrate'), {'DB00002', 'DB00003'})
+        self.assertEqual(self.index.drugs_with('CYP3A4', 'inhibitor'), {'DB00001'})
+        self.assertEqual(self.index.drugs_with('BE0001032', 'unknown'), {'DB00006'})
+        self.assertEqual(self.index.proteins['F2']['kind'], 'target')
+
+    def test_overlap_pairs_perpetrators_with_substrates_in_the_regimen(self):
+        self.assertEqual(self.index.overlap(['DB00001', 'DB00002', 'DB00003', 'DB00004', 'DB00005']), [
+            ('CYP3A4', 'inhibitor', 'DB00001', 'DB00002'),
+            ('CYP3A4', 'inhibitor', 'DB00001', 'DB00003'),
+            ('CYP3A4', 'inducer', 'DB00003', 'DB00002'),
+        ])
+        self.assertEqual(self.index.overlap(['DB00002', 'DB00003']), [('CYP3A4', 'inducer', 'DB00003', 'DB00002')])
+        self.assertEqual(self.index.overlap(['DB00004', 'DB00005'], kinds=['target']),
+                         [('F2', 'inhibitor', 'DB00004', 'DB00005')])
+
+
+class SyntheticDrugBankTests(SyntheticDatasetMixin, TestCase):
+    @unittest.skipIf(etree is None, 'lxml is not installed')
+    def test_generated_xml_is_valid_against_the_schema(self):
+        schema = etree.XMLSchema(etree.parse(str(Path(settings.BASE_DIR) / 'static' / 'drugbank.xsd')))
+        self.assertTrue(schema.validate(etree.parse(str(self.xml_path))), schema.error_log.last_error)
+
+    def test_service_reads_generated_drugs_and_interactions(self):
+        service = DrugBankService()
+        with self.dataset():
+            self.assertEqual(len(service.get_all_drugs()), 50)
+
+        first = next(i for i, partners in enumerate(self.partners) if partners)
+        second = min(self.partners[first])
+        result = service.check_drug_interactions(self.catalog[first][0], self.catalog[second][0])
+        self.assertTrue(result['success'])
+        self.assertEqual(result['total'], 2)
+        self.assertEqual(result['data'][0]['drug2'], self.catalog[second][1])
+
+    def test_benchmark_writes_json_results(self):
+        output = self.xml_path.with_name('results.json')
+        call_command('bench_drugbank', drugs=30, interactions=4, samples=5,
+                     output=str(output), stdout=io.StringIO())
+        results = json.loads(output.read_text(encoding='utf-8'))
+        self.assertEqual(results['meta']['drugs'], 30)
+        self.assertEqual(set(results['latency_ms']), {
+            'search_drugs', 'search_drugs_api', 'get_drug_details', 'check_drug_interactions', 'check_mechanism_overlap',
+            'encode_json_stdlib', 'encode_json_fragments',
+        })
+        self.assertGreater(results['load']['total_seconds'], 0)
+
+        call_command('bench_drugbank', drugs=30, interactions=4, samples=5, output=str(output),
+                     baseline=str(output), stdout=io.StringIO())
+
+    def test_traced_search_records_load_and_service_spans(self):
+        trace_file = self.xml_path.with_name('traces.jsonl')
+        with self.dataset(REQUEST_TRACING=True, REQUEST_TRACE_FILE=str(trace_file)):
+            self.client.get(reverse('search_drugs_api'), {'q': self.catalog[0][1][:4]})
+
+        trace = json.loads(trace_file.read_text(encoding='utf-8'))
+        self.assertEqual(trace['view'], 'search_drugs_api')
+        names = [record['name'] for record in trace['spans']]
+        for name in ('DrugBankService.get_all_drugs', 'DrugBankService.parse', 'DrugBankService.cache',
+                     'search_drugs_api.filter', 'json.encode'):
+            self.assertIn(name, names)
+
+
+@plain_static_storage
+class FoodCheckerTests(SyntheticDatasetMixin, TestCase):
+    def test_food_checker_reports_food_and_drug_interactions(self):
+        first = next(i for i, partners in enumerate(self.partners) if partners)
+        second = min(self.partners[first])
+        regimen = [self.catalog[first][0], self.catalog[second][0], 'DB99999']
+        with self.dataset():
+            response = self.client.post(reverse('food_checker'), {'drugs': regimen})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([drug['drugbank_id'] for drug in response.context['regimen']], regimen[:2])
+        self.assertEqual(response.context['not_found'], ['DB99999'])
+        self.assertEqual(len(response.context['drug_interactions']), 2)
+
+        result = DrugBankService().check_food_interactions([drug_id for drug_id, *_ in self.catalog])
+        food_index = DrugBankService._food_index
+        for group in result['data']['by_food']:
+            self.assertEqual({drug['drugbank_id'] for drug in group['drugs']}, food_index.drugs_for(group['food']))
+        self.assertEqual(result['total'], food_index.count)
+
+
+class MechanismOverlapTests(SyntheticDatasetMixin, TestCase):
+    def test_mechanism_overlap_matches_a_pairwise_scan(self):
+        service = DrugBankService()
+        regimen = [drug_id for drug_id, _ in self.catalog[:12]]
+        with self.dataset():
+            result = service.check_mechanism_overlap(regimen)
+        self.assertTrue(result['success'])
+
+        mechanisms = DrugBankService._mechanisms
+        expected = {
+            (key, action, perpetrator, substrate)
+            for key, actions in mechanisms.by_action.items()
+            for action in ('inhibitor', 'inducer')
+            for perpetrator in regimen for substrate in regimen
+            if perpetrator != substrate
+            and perpetrator in actions.get(action, ()) and substrate in actions.get('substrate', ())
+        }
+        self.assertEqual({
+            (o['protein'], o['action'], o['perpetrator']['drugbank_id'], o['substrate']['drugbank_id'])
+            for o in result['data']
+        }, expected)
+        self.assertTrue(expected)
+
+
+class ATCClassTests(SyntheticDatasetMixin, TestCase):
+    def test_atc_class_queries_match_the_generated_codes(self):
+        service = DrugBankService()
+        with self.dataset():
+            service.get_all_drugs()
+        atc = DrugBankService._atc
+        code = atc.codes[self.catalog[0][0]][0]
+
+        result = service.get_atc_class(code[:1])
+        self.assertEqual(
+            {drug['drugbank_id'] for drug in result['data']['drugs']},
+            {drug_id for drug_id, codes in atc.codes.items() if any(c.startswith(code[:1]) for c in codes)},
+        )
+
+        pairs = {tuple(sorted(pair)) for pair in DrugBankService._interactions.pairs()}
+        self.assertEqual(len(pairs), sum(len(partners) for partners in self.partners) // 2)
+        first, second = code[:3], atc.codes[self.catalog[1][0]][0][:3]
+        self.assertEqual(atc.pairs_between(first, second), sum(
+            1 for a, b in pairs
+            if (first in atc.classes_of(a, 2) and second in atc.classes_of(b, 2))
+            or (second in atc.classes_of(a, 2) and first in atc.classes_of(b, 2))
+        ))
+
+        drug_id = self.catalog[0][0]
+        response = self.client.get(reverse('atc_class', args=[code[:1]]), {'drug': drug_id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            {drug['drugbank_id'] for drug in response.json()['interacting']},
+            set(DrugBankService._interactions.partner_ids(drug_id)) & set(atc.drugs_under(code[:1])),
+        )
+        self.assertEqual(self.client.get(reverse('atc_class', args=['Z99'])).status_code, 404)
+
+        groups = service.group_interactions_by_class(drug_id)['data']
+        self.assertEqual(sum(group['count'] for group in groups), len(self.partners[0]))
+
+
+class AliasSearchTests(SyntheticDatasetMixin, TestCase):
+    def test_search_and_autocomplete_match_brand_and_product_names(self):
+        drug_id, name = self.catalog[7]
+        with self.dataset():
+            results = self.client.get(reverse('search_drugs_api'), {'q': 'intl7'}).json()['results']
+        self.assertEqual(results[0]['drugbank_id'], drug_id)
+        self.assertEqual((results[0]['matched'], results[0]['match_type']), ('Intl7', 'brand'))
+
+        products = DrugBankService().brand_names()[drug_id]
+        product = next(alias for alias in products if alias != 'Intl7')
+        suggestions = self.client.get(reverse('autocomplete_drugs'), {'q': product.lower()}).json()['results']
+        self.assertEqual(suggestions[0], {
+            'name': name, 'drugbank_id': drug_id, 'type': 'small molecule',
+            'matched': product, 'match_type': 'product',
+        })
+
+
+class SearchApiFragmentTests(SyntheticDatasetMixin, TestCase):
+    def test_search_api_splices_cached_fragments(self):
+        drug_id, name = self.catalog[7]
+        with self.dataset():
+            response = self.client.get(reverse('search_drugs_api'), {'q': 'zen'}).json()
+        self.assertEqual(response['results'], DrugBankService().match_drugs('zen'))
+        self.assertEqual((response['total'], response['total_in_db']), (len(response['results']), 50))
+        by_name = self.client.get(reverse('search_drugs_api'), {'q': name}).json()['results'][0]
+        self.assertEqual(by_name['drugbank_id'], drug_id)
+        self.assertNotIn('matched', by_name)
+
+
+class SQLiteBackendTests(SyntheticDatasetMixin, TestCase):
+    def test_sqlite_backend_returns_the_same_results_as_memory(self):
+        service = DrugBankService()
+        sqlite_path = self.xml_path.with_name('drugbank.sqlite3')
+        # List the first drug's first interaction twice; both entries must survive
+        xml = self.xml_path.read_text(encoding='utf-8')
+        start, end = xml.index('<drug-interaction>'), xml.index('</drug-interaction>') + len('</drug-interaction>')
+        self.xml_path.write_text(xml[:end] + xml[start:end] + xml[end:], encoding='utf-8')
+        with self.dataset():
+            call_command('build_drugbank_sqlite', output=str(sqlite_path), stdout=io.StringIO())
+
+        drug_id = self.catalog[0][0]
+        partner_id = self.catalog[min(self.partners[0])][0]
+        regimen = [drug_id for drug_id, _ in self.catalog[:12]]
+
+        def run():
+            code = service.get_drug_details(drug_id)['data']['atc_codes'][0]['code']
+            return [
+                [drug['drugbank_id'] for drug in service.get_all_drugs()],
+                service.get_all_drugs()[3:6],
+                service.search_drugs(self.catalog[5][1][:4]),
+                service.search_drugs('intl1'),
+                service.search_drugs('d'),
+                service.match_drugs('zen', limit=5),
+                service.brand_names(),
+                service.get_drug_details(drug_id),
+                service.get_drug_details('DB99999'),
+                service.check_drug_interactions(drug_id, partner_id),
+                service.check_food_interactions(regimen),
+                service.check_mechanism_overlap(regimen),
+                service.get_atc_class(code[:3]),
+                service.get_atc_class(code),
+                service.get_atc_class('Z99'),
+                service.group_interactions_by_class(drug_id),
+                service.check_class_interactions(code[:1], drug_id),
+            ]
+
+        DrugBankService.reset()
+        with self.dataset():
+            expected = run()
+        self.assertEqual(expected[9]['total'], 3)
+        DrugBankService.reset()
+        try:
+            with self.settings(DRUGBANK_BACKEND='sqlite', DRUGBANK_SQLITE_PATH=str(sqlite_path)), \
+                    contextlib.redirect_stdout(io.StringIO()):
+                self.assertEqual(run(), expected)
+                self.assertIsNone(DrugBankService._shared_root)
+        finally:
+            DrugBankService.reset()
+
+        with self.settings(DRUGBANK_BACKEND='sqlite', DRUGBANK_SQLITE_PATH=str(sqlite_path.with_name('missing'))):
+            self.assertFalse(service.search_drugs('zen')['success'])
+
+
+@plain_static_storage
+class InteractionAlertTests(SyntheticDatasetMixin, TestCase):
+    def test_saving_a_drug_alerts_on_interactions_with_saved_drugs(self):
+        patient = User.objects.create_user('pat')
+        UserProfile.objects.create(user=patient, role='patient', disclaimer_accepted=True)
+        self.client.force_login(patient)
+
+        first = next(i for i, partners in enumerate(self.partners) if partners)
+        second = min(self.partners[first])
+        unrelated = next(
+            i for i in range(len(self.catalog))
+            if i not in (first, second) and not {first, second} & (self.partners[i] | {
+                j for j, partners in enumerate(self.partners) if i in partners
+            })
+        )
+        with self.dataset():
+            for index in (first, unrelated, second):
+                drug_id, name = self.catalog[index]
+                self.client.post(reverse('save_drug'), {'drugbank_id': drug_id, 'drug_name': name})
+
+        alert = InteractionAlert.objects.get()
+        self.assertEqual((alert.saved_drug.drugbank_id, alert.other_drug.drugbank_id),
+                         (self.catalog[second][0], self.catalog[first][0]))
+        self.assertEqual(alert.interaction_count, 2)
+        self.assertEqual(alert.severity, DrugBankService._severity(alert.description))
+
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('saved_drugs'))
+            self.assertEqual(list(response.context['interaction_alerts']), [alert])
+
+        caregiver = User.objects.create_user('carol')
+        UserProfile.objects.create(user=caregiver, role='caregiver', disclaimer_accepted=True)
+        CaregiverPatientRelationship.objects.create(caregiver=caregiver, patient=patient, status='active')
+        self.client.force_login(caregiver)
+        response = self.client.get(reverse('patient_activity', args=[patient.pk]))
+        self.assertContains(response, alert.description)
+
+        # Replaying the saves finds the same pair and keeps the existing alert
+        InteractionAlert.objects.all().delete()
+        with self.settings(DRUGBANK_XML_PATH=str(self.xml_path)):
+            call_command('backfill_interaction_alerts', stdout=io.StringIO())
+            call_command('backfill_interaction_alerts', stdout=io.StringIO())
+        self.assertEqual(InteractionAlert.objects.get().other_drug.drugbank_id, self.catalog[first][0])
+
+        SavedDrug.objects.get(user=patient, drugbank_id=self.catalog[first][0]).delete()
+        self.assertFalse(InteractionAlert.objects.exists())
@@ -1,9 +1,16 @@
+from itertools import combinations
+
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse
+from main.tracing import span
 from .services import DrugBankService
-from .models import DrugSearch, DrugInteractionCheck, SavedDrug
+from .food import FOOD_KEYWORDS
+from .models import DrugSearch, DrugInteractionCheck, InteractionAlert, SavedDrug
+from .history_logger import HistoryLogger
+from .client_index import index_url
+from .fragments import FragmentJsonResponse
 
 
 def home(request):
@@ -24,9 +31,12 @@ def autocomplete_drugs(request):
         suggestions = [{
             'name': drug['name'],
             'drugbank_id': drug['drugbank_id'],
-            'type': drug.get('type', 'small molecule')
+            'type': drug.get('type', 'small molecule'),
+            # Brand, product or synonym the query hit
+            'matched': drug['matched'],
+            'match_type': drug['match_type']
         } for drug in result['data'][:10]]
-        return JsonResponse({'results': suggestions})
+        return FragmentJsonResponse({'results': suggestions})
     else:
         return JsonResponse({'results': [], 'error': result.get('error')})
 
@@ -41,22 +51,20 @@ def search_drugs_api(request):
     service = DrugBankService()
     all_drugs = service.get_all_drugs()
     
-    # Filter drugs by query (search in name, synonyms, ID)
-    query_lower = query.lower()
-    filtered = []
-    for drug in all_drugs:
-        if (query_lower in drug['name'].lower() or
-            query_lower in drug['drugbank_id'].lower() or
-            any(query_lower in syn.lower() for syn in drug.get('synonyms', []))):
-            filtered.append(drug)
-            if len(filtered) >= 100:  # Limit to 100 results
-                break
+    # Match the query against names, IDs, brands, products and synonyms
+    with span('search_drugs_api.filter'):
+        filtered = service.match_drugs(query, limit=100)  # Limit to 100 results
+    
+    if request.user.is_authenticated:
+        HistoryLogger().log_search(request.user, query)
     
-    return JsonResponse({
-        'results': filtered,
-        'total': len(filtered),
-        'total_in_db': len(all_drugs)
-    })
+    # Each drug's JSON is encoded once per dataset generation; only the
+    # match annotations and counts are encoded per request
+    with span('json.encode'):
+        return FragmentJsonResponse(
+            {'total': len(filtered), 'total_in_db': len(all_drugs)},
+            results=service.drug_fragments(filtered),
+        )
 
 
 def search_drugs(request):
@@ -71,10 +79,26 @@ def search_drugs(request):
     context['all_drugs'] = all_drugs[:100]
     context['total_drugs'] = len(all_drugs)
     context['showing_partial'] = len(all_drugs) > 100
+    # Keys the cached drug table fragment; changes when the XML is replaced
+    context['dataset_generation'] = service.dataset_generation()
+    # Hashed static URL of the client-side index, None to search via the API
+    context['drug_index_url'] = index_url()
     
     return render(request, 'drug_checker/search.html', context)
 
 
+def log_search(request):
+    """Record a search filtered in the browser against the client-side index"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST required'}, status=405)
+    
+    query = request.POST.get('q', '').strip()
+    if request.user.is_authenticated and len(query) >= 2:
+        HistoryLogger().log_search(request.user, query)
+    
+    return JsonResponse({'logged': request.user.is_authenticated})
+
+
 def drug_detail(request, drugbank_id):
     service = DrugBankService()
     result = service.get_drug_details(drugbank_id)
@@ -83,12 +107,31 @@ def drug_detail(request, drugbank_id):
     
     if result['success']:
         context['drug'] = result['data']
+        grouped = service.group_interactions_by_class(drugbank_id)
+        context['interaction_classes'] = grouped['data'] if grouped['success'] else []
+        if request.user.is_authenticated:
+            HistoryLogger().log_search(request.user, result['data']['name'], drugbank_id)
     else:
         context['error'] = result.get('error', 'Failed to load drug details')
     
     return render(request, 'drug_checker/drug_detail.html', context)
 
 
+def atc_class(request, atc_code):
+    """API endpoint listing drugs in an ATC class; with ?drug= only those interacting with it"""
+    service = DrugBankService()
+    drugbank_id = request.GET.get('drug', '').strip()
+    
+    if drugbank_id:
+        result = service.check_class_interactions(atc_code, drugbank_id)
+    else:
+        result = service.get_atc_class(atc_code)
+    
+    if not result['success']:
+        return JsonResponse({'error': result.get('error')}, status=404)
+    return JsonResponse({**result['data'], 'total': result['total']})
+
+
 def interaction_checker(request):
     context = {'page_title': 'Check Drug Interactions'}
     
@@ -119,8 +162,8 @@ def interaction_checker(request):
                 
                 if request.user.is_authenticated and result['data']:
                     for interaction in result['data'][:1]:
-                        DrugInteractionCheck.objects.create(
-                            user=request.user,
+                        HistoryLogger().log_interaction(
+                            request.user,
                             drug1_name=interaction.get('drug1', drug1),
                             drug1_id=drug1,
                             drug2_name=interaction.get('drug2', drug2),
@@ -134,10 +177,64 @@ def interaction_checker(request):
     return render(request, 'drug_checker/interaction_checker.html', context)
 
 
+# Drugs accepted in one regimen check (pairs grow quadratically)
+MAX_REGIMEN_SIZE = 10
+
+
+def food_checker(request):
+    """Regimen check: food interactions of every drug plus known and predicted drug-drug interactions"""
+    context = {
+        'page_title': 'Check Food Interactions',
+        'foods': [(food, label) for food, (label, _) in FOOD_KEYWORDS.items()],
+        'max_regimen_size': MAX_REGIMEN_SIZE,
+    }
+    
+    if request.method == 'POST':
+        drug_ids = list(dict.fromkeys(
+            drug_id.strip() for drug_id in request.POST.getlist('drugs') if drug_id.strip()
+        ))[:MAX_REGIMEN_SIZE]
+        selected_foods = [food for food in request.POST.getlist('foods') if food in FOOD_KEYWORDS]
+        context['selected_foods'] = selected_foods
+        
+        if not drug_ids:
+            context['error'] = 'Add at least one drug to your regimen.'
+            return render(request, 'drug_checker/food_checker.html', context)
+        
+        service = DrugBankService()
+        result = service.check_food_interactions(drug_ids, selected_foods or None)
+        
+        if result['success']:
+            regimen = result['data']['drugs']
+            drug_interactions = []
+            for drug1, drug2 in combinations([drug['drugbank_id'] for drug in regimen], 2):
+                pair = service.check_drug_interactions(drug1, drug2)
+                if pair['success']:
+                    drug_interactions.extend(pair['data'])
+            
+            context['regimen'] = regimen
+            context['by_food'] = result['data']['by_food']
+            context['not_found'] = result['data']['not_found']
+            context['total'] = result['total']
+            context['drug_interactions'] = drug_interactions
+            
+            # Shared enzyme/transporter overlaps, including undocumented pairs
+            overlap = service.check_mechanism_overlap([drug['drugbank_id'] for drug in regimen])
+            context['predicted_interactions'] = overlap['data'] if overlap['success'] else []
+        else:
+            context['error'] = result.get('error', 'Check failed. Please verify drug IDs.')
+    
+    return render(request, 'drug_checker/food_checker.html', context)
+
+
 @login_required
 def history(request):
-    searches = DrugSearch.objects.filter(user=request.user)[:20]
-    interactions = DrugInteractionCheck.objects.filter(user=request.user)[:20]
+    # Served by the (user, -timestamp) indexes; only load the columns the page renders
+    searches = DrugSearch.objects.filter(user=request.user).only(
+        'drug_name', 'searched_at'
+    )[:20]
+    interactions = DrugInteractionCheck.objects.filter(user=request.user).only(
+        'drug1_name', 'drug2_name', 'severity', 'description', 'checked_at'
+    )[:20]
     
     context = {
         'page_title': 'My History',
@@ -154,12 +251,26 @@ def saved_drugs(request):
     
     context = {
         'page_title': 'Saved Drugs',
-        'saved_drugs': saved
+        'saved_drugs': saved,
+        # Precomputed when each drug was saved
+        'interaction_alerts': InteractionAlert.for_user(request.user)
     }
     
     return render(request, 'drug_checker/saved_drugs.html', context)
 
 
+def _alert_saved_drug_interactions(request, saved):
+    """Check only the newly saved drug against the user's other saved drugs and store alerts"""
+    others = SavedDrug.objects.filter(user=request.user).exclude(pk=saved.pk).values_list('drugbank_id', flat=True)
+    result = DrugBankService().check_drug_against(saved.drugbank_id, list(others))
+    if not result['success'] or not result['data']:
+        return
+    
+    InteractionAlert.record(saved, result['data'])
+    names = ', '.join(conflict['name'] for conflict in result['data'])
+    messages.warning(request, f'⚠️ {saved.drug_name} interacts with your saved {names}.')
+
+
 @login_required
 def save_drug(request):
     if request.method == 'POST':
@@ -168,11 +279,13 @@ def save_drug(request):
         notes = request.POST.get('notes', '')
         
         if drugbank_id and drug_name:
-            SavedDrug.objects.get_or_create(
+            saved, created = SavedDrug.objects.get_or_create(
                 user=request.user,
                 drugbank_id=drugbank_id,
                 defaults={'drug_name': drug_name, 'notes': notes}
             )
             messages.success(request, f'{drug_name} saved successfully!')
+            if created:
+                _alert_saved_drug_interactions(request, saved)
         
     return redirect('saved_drugs')
@@ -14,11 +14,51 @@ load_dotenv(BASE_DIR / '.env')
 
 SECRET_KEY = os.getenv('DJANGO_SECRET_KEY', 'django-insecure-lq$9%d3p%runkda2o8-#&ht6^9eows35h@cx=vi)5tlaw2gq-$')
 DEBUG = os.getenv('DEBUG', 'False') == 'True'
+# Running as a Vercel function: no long-lived worker processes or threads
+SERVERLESS = bool(os.getenv('VERCEL'))
 ALLOWED_HOSTS = ['127.0.0.1', 'localhost', '10.0.2.2', 'happyhealthy.vercel.app', '.vercel.app']
 
 # DrugBank API Configuration
 DRUGBANK_API_KEY = os.getenv('DRUGBANK_API_KEY', '')
 DRUGBANK_API_URL = 'https://api.drugbank.com/v1'
+# Explicit DrugBank XML export; when empty the usual static/ and data/ locations are searched
+DRUGBANK_XML_PATH = os.getenv('DRUGBANK_XML_PATH', '')
+# 'memory' parses the XML into RAM on first use; 'sqlite' queries a file written
+# once by `manage.py build_drugbank_sqlite`, for instances too small to hold the tree
+DRUGBANK_BACKEND = os.getenv('DRUGBANK_BACKEND', 'memory')
+DRUGBANK_SQLITE_PATH = os.getenv('DRUGBANK_SQLITE_PATH', str(BASE_DIR / 'data' / 'drugbank.sqlite3'))
+DRUGBANK_SQLITE_POOL_SIZE = int(os.getenv('DRUGBANK_SQLITE_POOL_SIZE', '4'))
+
+# Search / interaction history is buffered in memory and written in batches
+# every N events or T seconds (0 disables the background writer). Serverless
+# deploys write each request's events before responding instead, since a
+# frozen function never runs the writer thread or the exit hook
+DRUG_HISTORY_FLUSH_SIZE = int(os.getenv('DRUG_HISTORY_FLUSH_SIZE', '50'))
+DRUG_HISTORY_FLUSH_INTERVAL = float(os.getenv('DRUG_HISTORY_FLUSH_INTERVAL', '5'))
+DRUG_HISTORY_FLUSH_PER_REQUEST = os.getenv('DRUG_HISTORY_FLUSH_PER_REQUEST', str(SERVERLESS)) == 'True'
+
+# Search page filters a static name/synonym/ID index in the browser instead of
+# calling /drugs/search/api/ per query (build it with `manage.py build_drug_index`)
+DRUG_CLIENT_INDEX = os.getenv('DRUG_CLIENT_INDEX', 'False') == 'True'
+
+# Prometheus metrics at /metrics. Set METRICS_MULTIPROC_DIR to a directory shared
+# by all workers to aggregate across them. Scrapers authenticate with
+# `Authorization: Bearer $METRICS_TOKEN`; staff can always read it, and without
+# a token it is only open to everyone under DEBUG
+METRICS_MULTIPROC_DIR = os.getenv('METRICS_MULTIPROC_DIR', '')
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', '1'))
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Per-request tracing (DrugBankService, SQL and template spans) appended as JSON
+# lines to REQUEST_TRACE_FILE, and a sampling profiler keeping collapsed stacks of
+# the slowest REQUEST_PROFILE_TOP_N requests. Both are off unless enabled here or
+# asked for with an X-Trace: 1 / X-Profile: 1 header by staff (anyone under DEBUG)
+REQUEST_TRACING = os.getenv('REQUEST_TRACING', 'False') == 'True'
+REQUEST_TRACE_FILE = os.getenv('REQUEST_TRACE_FILE', str(BASE_DIR / 'traces' / 'requests.jsonl'))
+REQUEST_PROFILING = os.getenv('REQUEST_PROFILING', 'False') == 'True'
+REQUEST_PROFILE_DIR = os.getenv('REQUEST_PROFILE_DIR', str(BASE_DIR / 'traces' / 'profiles'))
+REQUEST_PROFILE_TOP_N = int(os.getenv('REQUEST_PROFILE_TOP_N', '10'))
+REQUEST_PROFILE_INTERVAL = float(os.getenv('REQUEST_PROFILE_INTERVAL', '0.005'))
 
 INSTALLED_APPS = [
     'django.contrib.admin',
@@ -37,33 +77,53 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'main.metrics.MetricsMiddleware',
+    'drug_checker.history_logger.HistoryFlushMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
+    'authentication.backends.SessionBackendMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'main.profiling.ProfilingMiddleware',
+    'main.tracing.TracingMiddleware',
+    'authentication.access.AccessPolicyMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 ROOT_URLCONF = 'happyhealthy.urls'
 
+# Templates are compiled once per process in production; DEBUG re-reads them
+# from disk so edits show up without a restart
+template_loaders = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+if not DEBUG:
+    template_loaders = [('django.template.loaders.cached.Loader', template_loaders)]
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'main.context_processors.fragment_cache',
             ],
+            'loaders': template_loaders,
         },
     },
 ]
 
+# Lifetime of {% cache %} fragments (nav bar, drug table). Keys already vary
+# on role and DrugBank dataset generation, so this only bounds memory.
+TEMPLATE_FRAGMENT_CACHE_SECONDS = int(os.getenv('TEMPLATE_FRAGMENT_CACHE_SECONDS', '3600'))
+
 WSGI_APPLICATION = 'happyhealthy.wsgi.application'
 
 # Database configuration
@@ -84,6 +144,11 @@ else:
         }
     }
 
+# Scratch database for `manage.py bench_history --database bench`, which
+# seeds synthetic rows and drops/recreates indexes
+if os.getenv('BENCH_DATABASE_URL'):
+    DATABASES['bench'] = dj_database_url.parse(os.getenv('BENCH_DATABASE_URL'))
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
@@ -100,8 +165,12 @@ STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 STATICFILES_DIRS = [BASE_DIR / 'static']
 
-# Whitenoise configuration for static files
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+# Whitenoise serves content-hashed, pre-compressed files (e.g. the
+# build_css output) with far-future cache headers
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage'},
+}
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
@@ -116,11 +185,41 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': ['rest_framework.permissions.IsAuthenticatedOrReadOnly'],
 }
 
+# Loads request.user and its profile in one query. Sessions created under
+# plain ModelBackend are moved over by SessionBackendMiddleware
+AUTHENTICATION_BACKENDS = [
+    'authentication.backends.ProfileModelBackend',
+]
+
+# Cache shared by every worker when REDIS_URL is set (needs the redis
+# package); otherwise Django's per-process memory cache
+REDIS_URL = os.getenv('REDIS_URL', '')
+if REDIS_URL:
+    CACHES = {
+        'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': REDIS_URL},
+    }
+
+# Seconds a session may reuse its cached role/disclaimer state. Profile
+# changes invalidate it through the cache, which only reaches other workers
+# when the cache is shared, so without one the state is reloaded per request.
+ACCESS_STATE_TTL = int(os.getenv('ACCESS_STATE_TTL', '300' if REDIS_URL else '0'))
+
 LOGIN_URL = '/auth/login'
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/'
 
 # Email Configuration
+# Views queue mail in authentication.OutboundEmail; deliver it with
+# `python manage.py send_outbox --loop` (or run it from cron without --loop).
+# Serverless deploys have no worker: the vercel.json cron calls
+# /auth/outbox/send/ (with `Authorization: Bearer $CRON_SECRET`) every 10
+# minutes, which needs a Vercel Pro plan. Hobby plans only allow a daily
+# cron; there set OUTBOX_SEND_ON_COMMIT=True as well, which sends each
+# message at commit time. Requests aren't atomic, so that is inside the
+# request and adds the SMTP round trip to its latency
+OUTBOX_SEND_ON_COMMIT = os.getenv('OUTBOX_SEND_ON_COMMIT', 'False') == 'True'
+OUTBOX_CRON_BATCH_SIZE = int(os.getenv('OUTBOX_CRON_BATCH_SIZE', '50'))
+CRON_SECRET = os.getenv('CRON_SECRET', '')
 # EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'  # For development - prints to console
 # For production, use SMTP:
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
@@ -3,11 +3,14 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from main.views import metrics
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('main.urls')),
     path('auth/', include('authentication.urls')),
     path('drugs/', include('drug_checker.urls')),
+    path('metrics', metrics, name='metrics'),
 ]
 
 if settings.DEBUG:
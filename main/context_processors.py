@@ -0,0 +1,6 @@
+from django.conf import settings
+
+
+def fragment_cache(request):
+    """Expose the {% cache %} fragment lifetime to every template"""
+    return {'fragment_cache_seconds': getattr(settings, 'TEMPLATE_FRAGMENT_CACHE_SECONDS', 3600)}
@@ -0,0 +1,74 @@
+import re
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from main.utility_css import build_stylesheet, resolve, scan
+
+
+OUTPUT = Path(settings.BASE_DIR) / 'static' / 'css' / 'app.css'
+BANNER = '/* Generated by `python manage.py build_css` from templates/**/*.html. Do not edit. */\n'
+
+# Classes styled by the inline <style> in base.html or used only as JS hooks
+CUSTOM_CLASSES = {
+    'mobile-container', 'bottom-nav', 'nav-item', 'active', 'selected', 'peer',
+    'drug-row', 'autocomplete-item', 'role-card', 'regimen-chip',
+}
+
+
+def template_files():
+    """Every .html file under the configured template directories"""
+    dirs = [Path(d) for engine in settings.TEMPLATES for d in engine.get('DIRS', [])]
+    return sorted(path for d in dirs for path in d.glob('**/*.html'))
+
+
+class Command(BaseCommand):
+    help = (
+        'Scan templates/**/*.html for Tailwind utility classes and write a purged, minified '
+        'static/css/app.css. Run before collectstatic; --check fails if the file is stale.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Exit with an error if app.css is out of date instead of writing it')
+
+    def handle(self, *args, **options):
+        start = time.time()
+        files = template_files()
+        texts = [path.read_text(encoding='utf-8') for path in files]
+        classes = scan(texts)
+        css = BANNER + build_stylesheet(classes) + '\n'
+
+        self._warn_unknown(files, texts)
+
+        if options['check']:
+            current = OUTPUT.read_text(encoding='utf-8') if OUTPUT.exists() else ''
+            if current != css:
+                raise CommandError(f'{OUTPUT} is out of date; run `python manage.py build_css`')
+            self.stdout.write(self.style.SUCCESS(f'✅ {OUTPUT.name} is up to date'))
+            return
+
+        OUTPUT.parent.mkdir(parents=True, exist_ok=True)
+        OUTPUT.write_text(css, encoding='utf-8')
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Wrote {OUTPUT.relative_to(settings.BASE_DIR)}: {len(classes)} utilities from '
+            f'{len(files)} templates, {len(css.encode()):,} bytes in {time.time() - start:.2f}s'
+        ))
+
+    def _warn_unknown(self, files, texts):
+        """Report class attribute tokens the generator has no rule for"""
+        for path, text in zip(files, texts):
+            unknown = set()
+            text = re.sub(r'{%.*?%}|{{.*?}}|\$\{.*?\}', ' ', text, flags=re.S)
+            for attribute in re.findall(r'class(?:Name)?\s*=\s*["`\']([^"`\']*)', text):
+                unknown.update(
+                    token for token in attribute.split()
+                    if re.fullmatch(r'[a-z][a-z0-9:./-]*', token)
+                    and token not in CUSTOM_CLASSES and resolve(token) is None
+                )
+            if unknown:
+                self.stdout.write(self.style.WARNING(
+                    f'⚠️  {path.relative_to(settings.BASE_DIR)}: no rule for {", ".join(sorted(unknown))}'
+                ))
@@ -0,0 +1,355 @@
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from functools import wraps
+from pathlib import Path
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Not on Windows; pruning dead workers is then skipped
+    fcntl = None
+
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# name -> (type, help, histogram buckets); only metrics declared here are exported
+METRICS = {
+    'http_requests_total': ('counter', 'Requests by view, method and status code', None),
+    'http_request_duration_seconds': ('histogram', 'Request latency by view', DEFAULT_BUCKETS),
+    'drugbank_load_phase_seconds': ('gauge', 'Duration of the last DrugBank load, by phase', None),
+    'drugbank_calls_total': ('counter', 'DrugBankService calls by method and outcome', None),
+    'drugbank_call_duration_seconds': ('histogram', 'DrugBankService call latency by method', DEFAULT_BUCKETS),
+    'cache_requests_total': ('counter', 'Cache lookups by cache and result (hit/miss)', None),
+    'cache_hit_ratio': ('gauge', 'Hits / lookups since start, by cache', None),
+    'drugbank_drugs': ('gauge', 'Drugs in the loaded DrugBank dataset', None),
+    'drugbank_interactions': ('gauge', 'Drug-drug interaction entries in the loaded dataset', None),
+    'drug_history_dropped_total': ('counter', 'History rows dropped after a failed write, by model', None),
+}
+
+
+class Metrics:
+    """In-process metrics registry rendered in the Prometheus text format (Singleton Pattern)
+
+    Counters and histograms are cumulative for the life of the process.
+    With METRICS_MULTIPROC_DIR set, every worker also writes its snapshot to
+    ``metrics-<pid>-<token>.json`` in that directory (at most once per
+    METRICS_FLUSH_INTERVAL seconds, and at exit); ``/metrics`` then sums the
+    counters and histograms of all files and reports the most recently set
+    value of each gauge. The token keeps a recycled PID from overwriting a
+    dead worker's file. Files of dead workers are folded into
+    ``dead-workers.json`` (counters and histograms only, so totals never go
+    backwards) and removed.
+    """
+
+    # Class-level shared state (singleton pattern)
+    _counters = {}
+    _histograms = {}
+    _gauges = {}
+    _lock = threading.Lock()
+    _last_write = 0.0
+    _atexit_registered = False
+    _token = None  # (pid, random token) naming this process's file
+
+    @classmethod
+    def reset(cls):
+        with cls._lock:
+            cls._counters = {}
+            cls._histograms = {}
+            cls._gauges = {}
+            cls._last_write = 0.0
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with Metrics._lock:
+            Metrics._counters[key] = Metrics._counters.get(key, 0) + value
+        self._maybe_write()
+
+    def set_gauge(self, name, value, **labels):
+        with Metrics._lock:
+            Metrics._gauges[(name, _label_key(labels))] = (value, time.time())
+        self._maybe_write()
+
+    def observe(self, name, seconds, **labels):
+        buckets = METRICS[name][2]
+        key = (name, _label_key(labels))
+        with Metrics._lock:
+            series = Metrics._histograms.get(key)
+            if series is None:
+                series = Metrics._histograms[key] = {'buckets': [0] * len(buckets), 'sum': 0.0, 'count': 0}
+            for index, bound in enumerate(buckets):
+                if seconds <= bound:
+                    series['buckets'][index] += 1
+                    break
+            series['sum'] += seconds
+            series['count'] += 1
+        self._maybe_write()
+
+    def cache_lookup(self, cache_name, hit):
+        self.inc('cache_requests_total', cache=cache_name, result='hit' if hit else 'miss')
+
+    def snapshot(self):
+        """JSON-serialisable copy of this process's series"""
+        with Metrics._lock:
+            return {
+                'counters': [[name, list(labels), value] for (name, labels), value in Metrics._counters.items()],
+                'gauges': [
+                    [name, list(labels), value, set_at]
+                    for (name, labels), (value, set_at) in Metrics._gauges.items()
+                ],
+                'histograms': [
+                    [name, list(labels), list(series['buckets']), series['sum'], series['count']]
+                    for (name, labels), series in Metrics._histograms.items()
+                ],
+            }
+
+    def collect(self):
+        """Snapshots of every worker when running multiprocess, else just this one"""
+        own = self.snapshot()
+        directory = _multiproc_dir()
+        if directory is None:
+            return [own]
+        self.write()
+        self._prune(directory)
+        snapshots = [own]
+        for path in directory.glob('*.json'):
+            if path == _own_file(directory):
+                continue
+            try:
+                snapshots.append(json.loads(path.read_text(encoding='utf-8')))
+            except (OSError, ValueError):
+                continue  # Being replaced by its worker right now
+        return snapshots
+
+    def _prune(self, directory):
+        """Fold the files of exited workers into dead-workers.json and delete them
+
+        A worker is gone when its PID no longer exists, or when the PID has
+        been recycled: of several files for one PID only the newest is live.
+        """
+        if fcntl is None:
+            return
+        by_pid = {}
+        for path in directory.glob('metrics-*.json'):
+            pid = _file_pid(path)
+            try:
+                mtime = path.stat().st_mtime
+            except OSError:
+                continue
+            if pid is not None:
+                by_pid.setdefault(pid, []).append((mtime, path))
+        dead = []
+        for pid, files in by_pid.items():
+            files.sort()
+            dead.extend(path for _, path in (files if not _pid_alive(pid) else files[:-1]))
+        if not dead:
+            return
+
+        # One scraper at a time, so a dead file is folded in exactly once
+        with open(directory / '.dead-workers.lock', 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            archive_path = directory / 'dead-workers.json'
+            try:
+                archive = json.loads(archive_path.read_text(encoding='utf-8'))
+            except (OSError, ValueError):
+                archive = {'counters': [], 'gauges': [], 'histograms': []}
+            folded = []
+            for path in dead:
+                try:
+                    snapshot = json.loads(path.read_text(encoding='utf-8'))
+                except (OSError, ValueError):
+                    continue  # Already folded in by another scraper
+                archive = _merge_totals(archive, snapshot)
+                folded.append(path)
+            if folded:
+                _write_json(directory, archive_path, archive)
+                for path in folded:
+                    path.unlink(missing_ok=True)
+
+    def render(self):
+        """All series in the Prometheus text exposition format"""
+        counters, gauges, histograms = {}, {}, {}
+        gauge_times = {}
+        for snapshot in self.collect():
+            for name, labels, value in snapshot['counters']:
+                key = (name, tuple(map(tuple, labels)))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, value, set_at in snapshot['gauges']:
+                key = (name, tuple(map(tuple, labels)))
+                if key not in gauge_times or set_at > gauge_times[key]:
+                    gauges[key], gauge_times[key] = value, set_at
+            for name, labels, buckets, total, count in snapshot['histograms']:
+                key = (name, tuple(map(tuple, labels)))
+                merged = histograms.setdefault(key, {'buckets': [0] * len(buckets), 'sum': 0.0, 'count': 0})
+                merged['buckets'] = [a + b for a, b in zip(merged['buckets'], buckets)]
+                merged['sum'] += total
+                merged['count'] += count
+
+        # Derived from the merged counters so the ratio covers every worker
+        lookups = {}
+        for (name, labels), value in counters.items():
+            if name == 'cache_requests_total':
+                label_map = dict(labels)
+                hits, total = lookups.get(label_map['cache'], (0, 0))
+                lookups[label_map['cache']] = (hits + (value if label_map['result'] == 'hit' else 0), total + value)
+        for cache_name, (hits, total) in lookups.items():
+            gauges[('cache_hit_ratio', (('cache', cache_name),))] = hits / total if total else 0
+
+        lines = []
+        for name, (kind, help_text, buckets) in METRICS.items():
+            series = {'counter': counters, 'gauge': gauges, 'histogram': histograms}[kind]
+            keys = sorted(key for key in series if key[0] == name)
+            if not keys:
+                continue
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for key in keys:
+                labels = key[1]
+                if kind != 'histogram':
+                    lines.append(f'{name}{_format_labels(labels)} {_format_value(series[key])}')
+                    continue
+                cumulative = 0
+                for bound, count in zip(buckets, series[key]['buckets']):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{_format_labels(labels + (("le", repr(float(bound))),))} {cumulative}')
+                lines.append(f'{name}_bucket{_format_labels(labels + (("le", "+Inf"),))} {series[key]["count"]}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(series[key]["sum"])}')
+                lines.append(f'{name}_count{_format_labels(labels)} {series[key]["count"]}')
+        return '\n'.join(lines) + '\n'
+
+    def write(self):
+        """Publish this process's snapshot to METRICS_MULTIPROC_DIR"""
+        directory = _multiproc_dir()
+        if directory is None:
+            return
+        directory.mkdir(parents=True, exist_ok=True)
+        Metrics._last_write = time.monotonic()
+        _write_json(directory, _own_file(directory), self.snapshot())
+
+    def _maybe_write(self):
+        if _multiproc_dir() is None:
+            return
+        if not Metrics._atexit_registered:
+            Metrics._atexit_registered = True
+            atexit.register(self.write)
+        if time.monotonic() - Metrics._last_write >= getattr(settings, 'METRICS_FLUSH_INTERVAL', 1.0):
+            self.write()
+
+
+def timed(method_name):
+    """Count and time calls of a DrugBankService method; dict results with success=False count as errors"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            outcome = 'error'
+            try:
+                result = func(*args, **kwargs)
+                if not (isinstance(result, dict) and result.get('success') is False):
+                    outcome = 'ok'
+                return result
+            finally:
+                metrics = Metrics()
+                metrics.observe('drugbank_call_duration_seconds', time.perf_counter() - start, method=method_name)
+                metrics.inc('drugbank_calls_total', method=method_name, outcome=outcome)
+        return wrapper
+    return decorator
+
+
+class MetricsMiddleware:
+    """Record latency and status of every request, labelled by URL name"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        response = self.get_response(request)
+        match = getattr(request, 'resolver_match', None)
+        # URL names keep the label set bounded; raw paths would not
+        view = (match.view_name or match._func_path) if match else 'unresolved'
+        metrics = Metrics()
+        metrics.observe('http_request_duration_seconds', time.perf_counter() - start, view=view)
+        metrics.inc('http_requests_total', view=view, method=request.method, status=str(response.status_code))
+        return response
+
+
+def _multiproc_dir():
+    directory = getattr(settings, 'METRICS_MULTIPROC_DIR', '')
+    return Path(directory) if directory else None
+
+
+def _own_file(directory):
+    # Checked per call: a worker forked after the first write needs its own token
+    pid = os.getpid()
+    if Metrics._token is None or Metrics._token[0] != pid:
+        Metrics._token = (pid, uuid.uuid4().hex[:12])
+    return directory / f'metrics-{pid}-{Metrics._token[1]}.json'
+
+
+def _file_pid(path):
+    try:
+        return int(path.stem.split('-')[1])
+    except (IndexError, ValueError):
+        return None
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # Exists, owned by someone else
+    return True
+
+
+def _write_json(directory, path, data):
+    """Replace ``path`` atomically so readers never see a partial file"""
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix='.metrics-', suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as out:
+        json.dump(data, out)
+    os.replace(tmp, path)
+
+
+def _merge_totals(archive, snapshot):
+    """Add a snapshot's counters and histograms into ``archive``; gauges are dropped"""
+    counters = {(name, json.dumps(labels)): value for name, labels, value in archive['counters']}
+    for name, labels, value in snapshot['counters']:
+        key = (name, json.dumps(labels))
+        counters[key] = counters.get(key, 0) + value
+    histograms = {(name, json.dumps(labels)): [buckets, total, count]
+                  for name, labels, buckets, total, count in archive['histograms']}
+    for name, labels, buckets, total, count in snapshot['histograms']:
+        merged = histograms.setdefault((name, json.dumps(labels)), [[0] * len(buckets), 0.0, 0])
+        merged[0] = [a + b for a, b in zip(merged[0], buckets)]
+        merged[1] += total
+        merged[2] += count
+    return {
+        'counters': [[name, json.loads(labels), value] for (name, labels), value in counters.items()],
+        'gauges': [],
+        'histograms': [[name, json.loads(labels), *series] for (name, labels), series in histograms.items()],
+    }
+
+
+def _label_key(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
@@ -0,0 +1,101 @@
+import heapq
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+
+from .tracing import requested
+
+
+def frame_stack(frame):
+    """Root-first ``module:function`` names for a frame and its callers"""
+    names = []
+    while frame is not None:
+        names.append(f'{frame.f_globals.get("__name__", "?")}:{frame.f_code.co_name}')
+        frame = frame.f_back
+    names.reverse()
+    return ';'.join(names)
+
+
+def collapse(samples):
+    """Brendan Gregg's collapsed-stack format, as read by flamegraph.pl and speedscope"""
+    return ''.join(f'{stack} {count}\n' for stack, count in sorted(samples.items()))
+
+
+class SamplingProfiler:
+    """Sample one thread's Python stack every ``interval`` seconds from a helper thread"""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.samples[frame_stack(frame)] += 1
+
+
+class ProfilingMiddleware:
+    """Keep collapsed-stack profiles of the slowest N sampled requests (Singleton Pattern)
+
+    Requests are sampled when REQUEST_PROFILING=True, or when staff (anyone
+    under DEBUG) send ``X-Profile: 1``. The REQUEST_PROFILE_TOP_N slowest
+    are kept as ``<ms>ms-<view>-<id>.folded`` files in REQUEST_PROFILE_DIR;
+    a file is deleted when a slower request pushes it out.
+    """
+
+    # Class-level shared state (singleton pattern)
+    _slowest = []  # min-heap of (duration, path) so the fastest kept profile is evicted first
+    _lock = threading.Lock()
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not (getattr(settings, 'REQUEST_PROFILING', False) or requested(request, 'X-Profile')):
+            return self.get_response(request)
+
+        interval = getattr(settings, 'REQUEST_PROFILE_INTERVAL', 0.005)
+        start = time.perf_counter()
+        with SamplingProfiler(threading.get_ident(), interval) as profiler:
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        match = getattr(request, 'resolver_match', None)
+        self._keep(duration, match.view_name if match else 'unresolved', profiler.samples)
+        return response
+
+    def _keep(self, duration, view, samples):
+        if not samples:
+            return
+        top_n = getattr(settings, 'REQUEST_PROFILE_TOP_N', 10)
+        with ProfilingMiddleware._lock:
+            slowest = ProfilingMiddleware._slowest
+            if len(slowest) >= top_n and duration <= slowest[0][0]:
+                return
+
+            directory = Path(getattr(settings, 'REQUEST_PROFILE_DIR', 'profiles'))
+            directory.mkdir(parents=True, exist_ok=True)
+            path = directory / f'{duration * 1000:.0f}ms-{view.replace(":", "-")}-{uuid.uuid4().hex[:8]}.folded'
+            path.write_text(collapse(samples), encoding='utf-8')
+
+            heapq.heappush(slowest, (duration, str(path)))
+            while len(slowest) > top_n:
+                _, evicted = heapq.heappop(slowest)
+                Path(evicted).unlink(missing_ok=True)
@@ -0,0 +1,9 @@
+from django.test import override_settings
+
+
+# Tests render templates without running collectstatic, so there is no
+# manifest for the hashed storage to read; decorate classes that render pages
+plain_static_storage = override_settings(STORAGES={
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+})
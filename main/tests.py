@@ -1,3 +1,211 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+import threading
+import time
+from io import StringIO
+from pathlib import Path
 
-# Create your tests here.
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.contrib.auth.models import User
+from django.urls import reverse
+
+from main.testing import plain_static_storage
+from .metrics import Metrics, timed
+from .profiling import ProfilingMiddleware, SamplingProfiler, collapse
+from .tracing import Trace, _current_trace, span, traced
+from .utility_css import build_stylesheet, scan
+
+
+class UtilityCssTests(SimpleTestCase):
+    def test_only_used_classes_are_emitted(self):
+        classes = scan(['<div class="p-4 text-blue-600 hover:bg-blue-600 md:grid-cols-3 w-1/3">'])
+        self.assertEqual(classes, {'p-4', 'text-blue-600', 'hover:bg-blue-600', 'md:grid-cols-3', 'w-1/3'})
+
+        css = build_stylesheet(classes)
+        self.assertIn('.p-4{padding:1rem}', css)
+        self.assertIn('.hover\\:bg-blue-600:hover{', css)
+        self.assertIn('.w-1\\/3{width:33.3333%}', css)
+        self.assertIn('@media (min-width:768px){.md\\:grid-cols-3{', css)
+        self.assertNotIn('.p-6', css)
+
+    def test_later_utilities_win_the_cascade(self):
+        css = build_stylesheet(scan(['class="hidden flex bg-white bg-opacity-20 hover:bg-blue-50"']))
+        self.assertLess(css.index('.flex{'), css.index('.hidden{'))
+        self.assertLess(css.index('.bg-white{'), css.index('.bg-opacity-20{'))
+        self.assertLess(css.index('.bg-opacity-20{'), css.index('.hover\\:bg-blue-50'))
+
+    def test_committed_stylesheet_matches_templates(self):
+        # Fails when a template gains classes without `manage.py build_css`
+        call_command('build_css', '--check', stdout=StringIO())
+
+
+@override_settings(METRICS_MULTIPROC_DIR='', METRICS_TOKEN='')
+@plain_static_storage
+class MetricsTests(TestCase):
+    def setUp(self):
+        Metrics.reset()
+        self.addCleanup(Metrics.reset)
+
+    def test_histograms_are_cumulative_in_prometheus_text(self):
+        metrics = Metrics()
+        for seconds in (0.003, 0.003, 0.2, 30):
+            metrics.observe('drugbank_call_duration_seconds', seconds, method='search_drugs')
+        text = metrics.render()
+        self.assertIn('# TYPE drugbank_call_duration_seconds histogram', text)
+        self.assertIn('drugbank_call_duration_seconds_bucket{method="search_drugs",le="0.0025"} 0', text)
+        self.assertIn('drugbank_call_duration_seconds_bucket{method="search_drugs",le="0.005"} 2', text)
+        self.assertIn('drugbank_call_duration_seconds_bucket{method="search_drugs",le="10.0"} 3', text)
+        self.assertIn('drugbank_call_duration_seconds_bucket{method="search_drugs",le="+Inf"} 4', text)
+        self.assertIn('drugbank_call_duration_seconds_count{method="search_drugs"} 4', text)
+
+    def test_service_calls_and_cache_lookups_are_counted(self):
+        @timed('get_drug_details')
+        def lookup(found):
+            return {'success': found}
+
+        lookup(True)
+        lookup(False)
+        metrics = Metrics()
+        for hit in (True, True, True, False):
+            metrics.cache_lookup('access_state', hit)
+
+        text = metrics.render()
+        self.assertIn('drugbank_calls_total{method="get_drug_details",outcome="ok"} 1', text)
+        self.assertIn('drugbank_calls_total{method="get_drug_details",outcome="error"} 1', text)
+        self.assertIn('cache_hit_ratio{cache="access_state"} 0.75', text)
+
+    def write_worker(self, directory, pid, token, counters=(), gauges=()):
+        Path(directory, f'metrics-{pid}-{token}.json').write_text(json.dumps({
+            'counters': [list(counter) for counter in counters],
+            'gauges': [list(gauge) for gauge in gauges],
+            'histograms': [],
+        }))
+
+    def test_workers_are_aggregated_through_the_shared_directory(self):
+        about = ['http_requests_total', [['method', 'GET'], ['status', '200'], ['view', 'about']], 4]
+        with tempfile.TemporaryDirectory() as tmp, self.settings(METRICS_MULTIPROC_DIR=tmp):
+            # A live worker whose gauge was set before ours
+            self.write_worker(tmp, os.getppid(), 'other', [about], [['drugbank_drugs', [], 120, 0.0]])
+            metrics = Metrics()
+            metrics.inc('http_requests_total', method='GET', status='200', view='about')
+            metrics.set_gauge('drugbank_drugs', 100)
+
+            text = metrics.render()
+            self.assertEqual(len(list(Path(tmp).glob(f'metrics-{os.getpid()}-*.json'))), 1)
+        self.assertIn('http_requests_total{method="GET",status="200",view="about"} 5', text)
+        self.assertIn('drugbank_drugs 100', text)
+
+    def test_dead_workers_are_pruned_without_losing_counts(self):
+        about = ['http_requests_total', [['method', 'GET'], ['status', '200'], ['view', 'about']], 4]
+        with tempfile.TemporaryDirectory() as tmp, self.settings(METRICS_MULTIPROC_DIR=tmp):
+            # PID 2**22 + 1 is above Linux's pid_max, so never alive
+            dead_pid = 2 ** 22 + 1
+            self.write_worker(tmp, dead_pid, 'gone', [about], [['drugbank_drugs', [], 120, 9e12]])
+            # Two files for one live PID: the older one belonged to a previous owner
+            self.write_worker(tmp, os.getppid(), 'old', [about])
+            os.utime(Path(tmp, f'metrics-{os.getppid()}-old.json'), (0, 0))
+            self.write_worker(tmp, os.getppid(), 'new', [about])
+            metrics = Metrics()
+            metrics.inc('http_requests_total', method='GET', status='200', view='about')
+
+            first = metrics.render()
+            second = metrics.render()
+            remaining = sorted(path.name for path in Path(tmp).glob('metrics-*.json'))
+        self.assertIn('http_requests_total{method="GET",status="200",view="about"} 13', first)
+        self.assertEqual(first, second)
+        self.assertNotIn('drugbank_drugs', first)
+        self.assertEqual(len(remaining), 2)
+        self.assertIn(f'metrics-{os.getppid()}-new.json', remaining)
+
+    def test_endpoint_reports_view_latency(self):
+        self.client.get(reverse('about'))
+        self.client.force_login(User.objects.create_user('ops', password='pw', is_staff=True))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        text = response.content.decode()
+        self.assertIn('http_requests_total{method="GET",status="200",view="about"} 1', text)
+        self.assertIn('http_request_duration_seconds_count{view="about"} 1', text)
+
+    def test_endpoint_is_closed_outside_debug_without_a_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 401)
+        with self.settings(DEBUG=True):
+            self.assertEqual(self.client.get(reverse('metrics')).status_code, 200)
+
+    @override_settings(METRICS_TOKEN='s3cret')
+    def test_endpoint_requires_the_configured_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 401)
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer s3cret')
+        self.assertEqual(response.status_code, 200)
+
+
+@plain_static_storage
+class TracingTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.trace_file = Path(tmp.name) / 'requests.jsonl'
+        self.profile_dir = Path(tmp.name) / 'profiles'
+        self.enterContext(self.settings(REQUEST_TRACE_FILE=str(self.trace_file),
+                                        REQUEST_PROFILE_DIR=str(self.profile_dir)))
+
+    def traces(self):
+        return [json.loads(line) for line in self.trace_file.read_text(encoding='utf-8').splitlines()]
+
+    def test_requests_are_not_traced_by_default(self):
+        self.client.get(reverse('about'), HTTP_X_TRACE='1')
+        self.assertFalse(self.trace_file.exists())
+
+    def test_staff_can_trace_a_single_request(self):
+        user = User.objects.create_user('ops', is_staff=True)
+        self.client.force_login(user)
+        response = self.client.get(reverse('history'), HTTP_X_TRACE='1')
+
+        trace, = self.traces()
+        self.assertEqual(response['X-Trace-Id'], trace['trace_id'])
+        self.assertEqual(trace['view'], 'history')
+        names = [record['name'] for record in trace['spans']]
+        self.assertEqual(names[0], 'request')
+        self.assertIn('drug_checker_drugsearch', ' '.join(
+            record['attrs']['sql'] for record in trace['spans'] if record['name'] == 'sql'
+        ))
+        templates = [record['attrs']['template'] for record in trace['spans'] if record['name'] == 'template']
+        self.assertIn('drug_checker/history.html', templates)
+        self.assertTrue(all(record['parent'] for record in trace['spans'][1:]))
+
+    def test_spans_nest_under_the_active_span(self):
+        @traced('outer')
+        def outer():
+            with span('inner', size=3):
+                pass
+
+        outer()  # No active trace: nothing is recorded
+        trace = Trace()
+        token = _current_trace.set(trace)
+        try:
+            outer()
+        finally:
+            _current_trace.reset(token)
+
+        self.assertEqual([(record['id'], record['parent'], record['name']) for record in trace.spans],
+                         [(1, None, 'outer'), (2, 1, 'inner')])
+        self.assertEqual(trace.spans[1]['attrs'], {'size': 3})
+
+    def test_collapsed_stacks_of_the_slowest_requests_are_kept(self):
+        with SamplingProfiler(threading.get_ident(), 0.001) as profiler:
+            deadline = time.perf_counter() + 0.05
+            while time.perf_counter() < deadline:
+                pass
+        self.assertTrue(any('test_collapsed_stacks_of_the_slowest_requests_are_kept' in stack
+                            for stack in profiler.samples))
+        self.assertRegex(collapse(profiler.samples), r'^\S+ \d+\n')
+
+        ProfilingMiddleware._slowest = []
+        self.addCleanup(setattr, ProfilingMiddleware, '_slowest', [])
+        middleware = ProfilingMiddleware(lambda request: None)
+        with self.settings(REQUEST_PROFILE_TOP_N=2):
+            for duration in (0.3, 0.1, 0.5):
+                middleware._keep(duration, 'search_drugs_api', {'a;b': 1})
+        kept = sorted(path.name.split('ms-')[0] for path in self.profile_dir.glob('*.folded'))
+        self.assertEqual(kept, ['300', '500'])
@@ -0,0 +1,160 @@
+import contextvars
+import json
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from functools import wraps
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.template.base import Template
+
+
+_current_trace = contextvars.ContextVar('current_trace', default=None)
+
+
+class Trace:
+    """Spans recorded while handling one request"""
+
+    def __init__(self, trace_id=None):
+        self.trace_id = trace_id or uuid.uuid4().hex[:16]
+        self.started = time.perf_counter()
+        self.spans = []
+        self._stack = []
+
+    @contextmanager
+    def span(self, name, **attrs):
+        record = {
+            'id': len(self.spans) + 1,
+            'parent': self._stack[-1]['id'] if self._stack else None,
+            'name': name,
+            'start_ms': round((time.perf_counter() - self.started) * 1000, 3),
+            'duration_ms': None,
+        }
+        if attrs:
+            record['attrs'] = attrs
+        self.spans.append(record)
+        self._stack.append(record)
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['duration_ms'] = round((time.perf_counter() - start) * 1000, 3)
+            self._stack.pop()
+
+
+@contextmanager
+def span(name, **attrs):
+    """Time a block as a child of the active span; free when the request isn't traced"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+    with trace.span(name, **attrs) as record:
+        yield record
+
+
+def traced(name):
+    """Record every call of the decorated function as a span named ``name``"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_trace.get() is None:
+                return func(*args, **kwargs)
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def install_template_spans():
+    """Wrap Template.render so each template and include becomes a span"""
+    if getattr(Template.render, '_traced', False):
+        return
+    original = Template.render
+
+    @wraps(original)
+    def render(self, context):
+        if _current_trace.get() is None:
+            return original(self, context)
+        with span('template', template=self.origin.template_name if self.origin else self.name):
+            return original(self, context)
+
+    render._traced = True
+    Template.render = render
+
+
+def requested(request, header):
+    """True if an opt-in header is set and this requester may use it (DEBUG or staff)"""
+    if request.headers.get(header, '') not in ('1', 'true', 'on'):
+        return False
+    user = getattr(request, 'user', None)
+    return settings.DEBUG or bool(user is not None and user.is_staff)
+
+
+class TracingMiddleware:
+    """Write a JSONL trace of DrugBankService, SQL and template spans per request
+
+    Enabled for every request with REQUEST_TRACING=True, or for a single
+    request with an ``X-Trace: 1`` header from staff (or anyone under DEBUG).
+    """
+
+    _write_lock = threading.Lock()
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        install_template_spans()
+
+    def __call__(self, request):
+        if not (getattr(settings, 'REQUEST_TRACING', False) or requested(request, 'X-Trace')):
+            return self.get_response(request)
+
+        trace = Trace()
+        token = _current_trace.set(trace)
+        started_at = datetime.now(timezone.utc)
+        try:
+            with trace.span('request', method=request.method, path=request.path):
+                with self._query_spans():
+                    response = self.get_response(request)
+        finally:
+            _current_trace.reset(token)
+
+        match = getattr(request, 'resolver_match', None)
+        self._write({
+            'trace_id': trace.trace_id,
+            'started_at': started_at.isoformat(timespec='milliseconds'),
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'duration_ms': trace.spans[0]['duration_ms'],
+            'spans': trace.spans,
+        })
+        response['X-Trace-Id'] = trace.trace_id
+        return response
+
+    @contextmanager
+    def _query_spans(self):
+        def record_query(execute, sql, params, many, context):
+            with span('sql', alias=context['connection'].alias, sql=sql[:300], many=many):
+                return execute(sql, params, many, context)
+
+        wrappers = [connections[alias].execute_wrapper(record_query) for alias in connections]
+        for wrapper in wrappers:
+            wrapper.__enter__()
+        try:
+            yield
+        finally:
+            for wrapper in reversed(wrappers):
+                wrapper.__exit__(None, None, None)
+
+    def _write(self, record):
+        path = Path(getattr(settings, 'REQUEST_TRACE_FILE', 'traces.jsonl'))
+        line = json.dumps(record, default=str) + '\n'
+        with TracingMiddleware._write_lock:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, 'a', encoding='utf-8') as out:
+                out.write(line)
@@ -0,0 +1,448 @@
+"""Tailwind-compatible utility CSS generator used by ``manage.py build_css``
+
+Covers the subset of Tailwind v3 utilities and variants the templates use,
+with Tailwind's default theme values. Only classes that actually appear in
+the scanned sources are emitted, so the output is purged by construction.
+"""
+import re
+
+
+PALETTE = {
+    'gray': ['#f9fafb', '#f3f4f6', '#e5e7eb', '#d1d5db', '#9ca3af', '#6b7280', '#4b5563', '#374151', '#1f2937', '#111827'],
+    'red': ['#fef2f2', '#fee2e2', '#fecaca', '#fca5a5', '#f87171', '#ef4444', '#dc2626', '#b91c1c', '#991b1b', '#7f1d1d'],
+    'orange': ['#fff7ed', '#ffedd5', '#fed7aa', '#fdba74', '#fb923c', '#f97316', '#ea580c', '#c2410c', '#9a3412', '#7c2d12'],
+    'yellow': ['#fefce8', '#fef9c3', '#fef08a', '#fde047', '#facc15', '#eab308', '#ca8a04', '#a16207', '#854d0e', '#713f12'],
+    'green': ['#f0fdf4', '#dcfce7', '#bbf7d0', '#86efac', '#4ade80', '#22c55e', '#16a34a', '#15803d', '#166534', '#14532d'],
+    'blue': ['#eff6ff', '#dbeafe', '#bfdbfe', '#93c5fd', '#60a5fa', '#3b82f6', '#2563eb', '#1d4ed8', '#1e40af', '#1e3a8a'],
+    'indigo': ['#eef2ff', '#e0e7ff', '#c7d2fe', '#a5b4fc', '#818cf8', '#6366f1', '#4f46e5', '#4338ca', '#3730a3', '#312e81'],
+    'purple': ['#faf5ff', '#f3e8ff', '#e9d5ff', '#d8b4fe', '#c084fc', '#a855f7', '#9333ea', '#7e22ce', '#6b21a8', '#581c87'],
+    'pink': ['#fdf2f8', '#fce7f3', '#fbcfe8', '#f9a8d4', '#f472b6', '#ec4899', '#db2777', '#be185d', '#9d174d', '#831843'],
+}
+SHADES = ['50', '100', '200', '300', '400', '500', '600', '700', '800', '900']
+
+COLORS = {'white': '#ffffff', 'black': '#000000'}
+for _name, _values in PALETTE.items():
+    COLORS.update({f'{_name}-{shade}': value for shade, value in zip(SHADES, _values)})
+
+KEYWORD_COLORS = {'transparent': 'transparent', 'current': 'currentColor', 'inherit': 'inherit'}
+
+FONT_SIZES = {
+    'xs': ('0.75rem', '1rem'), 'sm': ('0.875rem', '1.25rem'), 'base': ('1rem', '1.5rem'),
+    'lg': ('1.125rem', '1.75rem'), 'xl': ('1.25rem', '1.75rem'), '2xl': ('1.5rem', '2rem'),
+    '3xl': ('1.875rem', '2.25rem'), '4xl': ('2.25rem', '2.5rem'), '5xl': ('3rem', '1'), '6xl': ('3.75rem', '1'),
+}
+FONT_WEIGHTS = {'light': 300, 'normal': 400, 'medium': 500, 'semibold': 600, 'bold': 700, 'extrabold': 800}
+RADII = {'none': '0', 'sm': '0.125rem', '': '0.25rem', 'md': '0.375rem', 'lg': '0.5rem',
+         'xl': '0.75rem', '2xl': '1rem', '3xl': '1.5rem', 'full': '9999px'}
+SHADOWS = {
+    'sm': '0 1px 2px 0 rgb(0 0 0/.05)',
+    '': '0 1px 3px 0 rgb(0 0 0/.1),0 1px 2px -1px rgb(0 0 0/.1)',
+    'md': '0 4px 6px -1px rgb(0 0 0/.1),0 2px 4px -2px rgb(0 0 0/.1)',
+    'lg': '0 10px 15px -3px rgb(0 0 0/.1),0 4px 6px -4px rgb(0 0 0/.1)',
+    'xl': '0 20px 25px -5px rgb(0 0 0/.1),0 8px 10px -6px rgb(0 0 0/.1)',
+    '2xl': '0 25px 50px -12px rgb(0 0 0/.25)',
+    'none': '0 0 #0000',
+}
+MAX_WIDTHS = {'xs': '20rem', 'sm': '24rem', 'md': '28rem', 'lg': '32rem', 'xl': '36rem',
+              '2xl': '42rem', '3xl': '48rem', '4xl': '56rem', '5xl': '64rem', 'full': '100%'}
+GRADIENT_DIRECTIONS = {'t': 'top', 'tr': 'top right', 'r': 'right', 'br': 'bottom right',
+                       'b': 'bottom', 'bl': 'bottom left', 'l': 'left', 'tl': 'top left'}
+SIDES = {'': ('',), 'x': ('-left', '-right'), 'y': ('-top', '-bottom'),
+         't': ('-top',), 'r': ('-right',), 'b': ('-bottom',), 'l': ('-left',)}
+
+STATIC = {
+    # layout
+    'static': 'position:static', 'fixed': 'position:fixed', 'absolute': 'position:absolute',
+    'relative': 'position:relative', 'sticky': 'position:sticky',
+    'block': 'display:block', 'inline-block': 'display:inline-block', 'inline': 'display:inline',
+    'flex': 'display:flex', 'inline-flex': 'display:inline-flex', 'grid': 'display:grid',
+    'table': 'display:table', 'hidden': 'display:none',
+    'mx-auto': 'margin-left:auto;margin-right:auto',
+    'w-full': 'width:100%', 'w-auto': 'width:auto', 'h-full': 'height:100%', 'h-screen': 'height:100vh',
+    'min-h-screen': 'min-height:100vh', 'min-w-0': 'min-width:0px', 'min-w-full': 'min-width:100%',
+    # flexbox
+    'flex-1': 'flex:1 1 0%', 'flex-auto': 'flex:1 1 auto', 'flex-none': 'flex:none',
+    'flex-shrink-0': 'flex-shrink:0', 'shrink-0': 'flex-shrink:0', 'flex-grow': 'flex-grow:1',
+    'flex-row': 'flex-direction:row', 'flex-col': 'flex-direction:column',
+    'flex-wrap': 'flex-wrap:wrap', 'items-start': 'align-items:flex-start', 'items-center': 'align-items:center',
+    'items-end': 'align-items:flex-end', 'justify-start': 'justify-content:flex-start',
+    'justify-center': 'justify-content:center', 'justify-end': 'justify-content:flex-end',
+    'justify-between': 'justify-content:space-between',
+    # overflow / text
+    'overflow-hidden': 'overflow:hidden', 'overflow-auto': 'overflow:auto',
+    'overflow-x-auto': 'overflow-x:auto', 'overflow-y-auto': 'overflow-y:auto',
+    'whitespace-nowrap': 'white-space:nowrap', 'break-words': 'overflow-wrap:break-word',
+    'break-all': 'word-break:break-all', 'truncate': 'overflow:hidden;text-overflow:ellipsis;white-space:nowrap',
+    'line-clamp-2': 'overflow:hidden;display:-webkit-box;-webkit-box-orient:vertical;-webkit-line-clamp:2',
+    'line-clamp-3': 'overflow:hidden;display:-webkit-box;-webkit-box-orient:vertical;-webkit-line-clamp:3',
+    'text-left': 'text-align:left', 'text-center': 'text-align:center', 'text-right': 'text-align:right',
+    'font-sans': 'font-family:ui-sans-serif,system-ui,sans-serif,"Apple Color Emoji","Segoe UI Emoji"',
+    'font-mono': 'font-family:ui-monospace,SFMono-Regular,Menlo,Monaco,Consolas,"Liberation Mono","Courier New",monospace',
+    'italic': 'font-style:italic', 'uppercase': 'text-transform:uppercase',
+    'underline': 'text-decoration-line:underline', 'no-underline': 'text-decoration-line:none',
+    'list-disc': 'list-style-type:disc', 'list-decimal': 'list-style-type:decimal',
+    'list-inside': 'list-style-position:inside',
+    # interaction
+    'cursor-pointer': 'cursor:pointer', 'cursor-not-allowed': 'cursor:not-allowed',
+    'resize-none': 'resize:none', 'outline-none': 'outline:2px solid transparent;outline-offset:2px',
+    'transition': 'transition-property:color,background-color,border-color,text-decoration-color,fill,stroke,'
+                  'opacity,box-shadow,transform,filter,backdrop-filter;'
+                  'transition-timing-function:cubic-bezier(.4,0,.2,1);transition-duration:150ms',
+    'transform': 'transform:translate(var(--tw-translate-x),var(--tw-translate-y)) rotate(var(--tw-rotate)) '
+                 'scale(var(--tw-scale-x),var(--tw-scale-y))',
+    'animate-spin': 'animation:spin 1s linear infinite',
+    'backdrop-blur-sm': 'backdrop-filter:blur(4px)',
+    'sr-only': 'position:absolute;width:1px;height:1px;padding:0;margin:-1px;overflow:hidden;'
+               'clip:rect(0,0,0,0);white-space:nowrap;border-width:0',
+}
+
+# Emitted once when any utility that needs it is used
+KEYFRAMES = {'animate-spin': '@keyframes spin{to{transform:rotate(360deg)}}'}
+
+PSEUDO_VARIANTS = {
+    'hover': ':hover', 'focus': ':focus', 'active': ':active', 'disabled': ':disabled',
+    'first': ':first-child', 'last': ':last-child', 'checked': ':checked',
+}
+RESPONSIVE = {'sm': 640, 'md': 768, 'lg': 1024, 'xl': 1280}
+
+PREFLIGHT = (
+    '*,::before,::after{box-sizing:border-box;border-width:0;border-style:solid;border-color:#e5e7eb;'
+    '--tw-translate-x:0;--tw-translate-y:0;--tw-rotate:0;--tw-scale-x:1;--tw-scale-y:1}'
+    'html{line-height:1.5;-webkit-text-size-adjust:100%;tab-size:4;'
+    'font-family:ui-sans-serif,system-ui,sans-serif,"Apple Color Emoji","Segoe UI Emoji"}'
+    'body{margin:0;line-height:inherit}'
+    'hr{height:0;color:inherit;border-top-width:1px}'
+    'h1,h2,h3,h4,h5,h6{font-size:inherit;font-weight:inherit}'
+    'a{color:inherit;text-decoration:inherit}'
+    'b,strong{font-weight:bolder}'
+    'code,kbd,samp,pre{font-family:ui-monospace,SFMono-Regular,Menlo,Monaco,Consolas,monospace;font-size:1em}'
+    'small{font-size:80%}'
+    'table{text-indent:0;border-color:inherit;border-collapse:collapse}'
+    'button,input,optgroup,select,textarea{font-family:inherit;font-size:100%;font-weight:inherit;'
+    'line-height:inherit;color:inherit;margin:0;padding:0}'
+    'button,select{text-transform:none}'
+    "button,[type='button'],[type='reset'],[type='submit']{-webkit-appearance:button;"
+    'background-color:transparent;background-image:none}'
+    'summary{display:list-item}'
+    'blockquote,dl,dd,h1,h2,h3,h4,h5,h6,hr,figure,p,pre{margin:0}'
+    'fieldset{margin:0;padding:0}legend{padding:0}'
+    'ol,ul,menu{list-style:none;margin:0;padding:0}'
+    'textarea{resize:vertical}'
+    'input::placeholder,textarea::placeholder{opacity:1;color:#9ca3af}'
+    'button,[role="button"]{cursor:pointer}:disabled{cursor:default}'
+    'img,svg,video,canvas,audio,iframe,embed,object{display:block;vertical-align:middle}'
+    'img,video{max-width:100%;height:auto}'
+    '[hidden]{display:none}'
+)
+
+CANDIDATE = re.compile(r'[A-Za-z0-9_:./-]+')
+
+
+def spacing(value):
+    """Tailwind spacing scale: 1 unit = 0.25rem, plus px"""
+    if value == 'px':
+        return '1px'
+    if value == '0':
+        return '0px'
+    if not re.fullmatch(r'\d+(\.5)?', value):
+        return None
+    return f'{float(value) / 4:g}rem'
+
+
+def fraction(value):
+    match = re.fullmatch(r'(\d+)/(\d+)', value)
+    if not match or int(match.group(2)) == 0:
+        return None
+    return f'{int(match.group(1)) / int(match.group(2)) * 100:.6g}%'
+
+
+def hex_to_rgb(value):
+    value = value.lstrip('#')
+    return ' '.join(str(int(value[i:i + 2], 16)) for i in (0, 2, 4))
+
+
+def color(value):
+    if value in KEYWORD_COLORS:
+        return KEYWORD_COLORS[value]
+    return COLORS.get(value)
+
+
+# Each resolver maps a bare utility name to (selector suffix, declarations).
+# Their order is the cascade order of the generated CSS, as in Tailwind.
+
+def _static(name):
+    return ('', STATIC[name]) if name in STATIC else None
+
+
+def _position(name):
+    match = re.fullmatch(r'(-?)(top|right|bottom|left|inset)-(.+)', name)
+    if not match:
+        return None
+    size = spacing(match.group(3)) or fraction(match.group(3))
+    if size is None:
+        return None
+    size = f'-{size}' if match.group(1) else size
+    sides = ('top', 'right', 'bottom', 'left') if match.group(2) == 'inset' else (match.group(2),)
+    return '', ';'.join(f'{side}:{size}' for side in sides)
+
+
+def _z_index(name):
+    match = re.fullmatch(r'z-(\d+|auto)', name)
+    return ('', f'z-index:{match.group(1)}') if match else None
+
+
+def _margin(name):
+    match = re.fullmatch(r'(-?)m([xytrbl]?)-(.+)', name)
+    if not match:
+        return None
+    size = 'auto' if match.group(3) == 'auto' else spacing(match.group(3))
+    if size is None:
+        return None
+    if match.group(1) and size != 'auto':
+        size = f'-{size}'
+    return '', ';'.join(f'margin{side}:{size}' for side in SIDES[match.group(2)])
+
+
+def _sizing(name):
+    match = re.fullmatch(r'(min-h|max-h|min-w|max-w|h|w)-(.+)', name)
+    if not match:
+        return None
+    prop = {'h': 'height', 'w': 'width', 'min-h': 'min-height', 'max-h': 'max-height',
+            'min-w': 'min-width', 'max-w': 'max-width'}[match.group(1)]
+    value = match.group(2)
+    size = spacing(value) or fraction(value)
+    if match.group(1) == 'max-w':
+        size = MAX_WIDTHS.get(value)
+    return ('', f'{prop}:{size}') if size else None
+
+
+def _grid(name):
+    match = re.fullmatch(r'grid-cols-(\d+)', name)
+    if match:
+        return '', f'grid-template-columns:repeat({match.group(1)},minmax(0,1fr))'
+    match = re.fullmatch(r'col-span-(\d+)', name)
+    if match:
+        return '', f'grid-column:span {match.group(1)}/span {match.group(1)}'
+    return None
+
+
+def _gap(name):
+    match = re.fullmatch(r'gap(-[xy])?-(.+)', name)
+    if not match or spacing(match.group(2)) is None:
+        return None
+    prop = {None: 'gap', '-x': 'column-gap', '-y': 'row-gap'}[match.group(1)]
+    return '', f'{prop}:{spacing(match.group(2))}'
+
+
+def _space(name):
+    match = re.fullmatch(r'space-([xy])-(.+)', name)
+    if not match or spacing(match.group(2)) is None:
+        return None
+    side = 'left' if match.group(1) == 'x' else 'top'
+    return '>:not([hidden])~:not([hidden])', f'margin-{side}:{spacing(match.group(2))}'
+
+
+def _divide(name):
+    if name in ('divide-y', 'divide-x'):
+        side = 'top' if name == 'divide-y' else 'left'
+        return '>:not([hidden])~:not([hidden])', f'border-{side}-width:1px'
+    match = re.fullmatch(r'divide-(.+)', name)
+    if match and color(match.group(1)):
+        return '>:not([hidden])~:not([hidden])', f'border-color:{color(match.group(1))}'
+    return None
+
+
+def _rounded(name):
+    match = re.fullmatch(r'rounded(?:-(.+))?', name)
+    if not match:
+        return None
+    radius = RADII.get(match.group(1) or '')
+    return ('', f'border-radius:{radius}') if radius else None
+
+
+def _border_width(name):
+    match = re.fullmatch(r'border(?:-([xytrbl]))?(?:-(\d+))?', name)
+    if not match:
+        return None
+    width = f'{match.group(2) or 1}px'
+    return '', ';'.join(f'border{side}-width:{width}' for side in SIDES[match.group(1) or ''])
+
+
+def _border_color(name):
+    match = re.fullmatch(r'border-(.+)', name)
+    if match and color(match.group(1)):
+        return '', f'border-color:{color(match.group(1))}'
+    return None
+
+
+def _background_color(name):
+    match = re.fullmatch(r'bg-(.+)', name)
+    if not match:
+        return None
+    value = match.group(1)
+    if value in KEYWORD_COLORS:
+        return '', f'background-color:{KEYWORD_COLORS[value]}'
+    if value in COLORS:
+        return '', f'--tw-bg-opacity:1;background-color:rgb({hex_to_rgb(COLORS[value])}/var(--tw-bg-opacity))'
+    return None
+
+
+def _background_opacity(name):
+    match = re.fullmatch(r'bg-opacity-(\d+)', name)
+    return ('', f'--tw-bg-opacity:{int(match.group(1)) / 100:g}') if match else None
+
+
+def _background_image(name):
+    match = re.fullmatch(r'bg-gradient-to-(\w+)', name)
+    if match and match.group(1) in GRADIENT_DIRECTIONS:
+        return '', f'background-image:linear-gradient(to {GRADIENT_DIRECTIONS[match.group(1)]},var(--tw-gradient-stops))'
+    return None
+
+
+def _gradient_from(name):
+    match = re.fullmatch(r'from-(.+)', name)
+    if not match or match.group(1) not in COLORS:
+        return None
+    value = COLORS[match.group(1)]
+    return '', (f'--tw-gradient-from:{value};--tw-gradient-to:rgb({hex_to_rgb(value)}/0);'
+                '--tw-gradient-stops:var(--tw-gradient-from),var(--tw-gradient-to)')
+
+
+def _gradient_to(name):
+    match = re.fullmatch(r'to-(.+)', name)
+    if match and match.group(1) in COLORS:
+        return '', f'--tw-gradient-to:{COLORS[match.group(1)]}'
+    return None
+
+
+def _padding(name):
+    match = re.fullmatch(r'p([xytrbl]?)-(.+)', name)
+    if not match or spacing(match.group(2)) is None:
+        return None
+    return '', ';'.join(f'padding{side}:{spacing(match.group(2))}' for side in SIDES[match.group(1)])
+
+
+def _font_size(name):
+    match = re.fullmatch(r'text-(.+)', name)
+    if match and match.group(1) in FONT_SIZES:
+        size, line_height = FONT_SIZES[match.group(1)]
+        return '', f'font-size:{size};line-height:{line_height}'
+    return None
+
+
+def _font_weight(name):
+    match = re.fullmatch(r'font-(\w+)', name)
+    if match and match.group(1) in FONT_WEIGHTS:
+        return '', f'font-weight:{FONT_WEIGHTS[match.group(1)]}'
+    return None
+
+
+def _text_color(name):
+    match = re.fullmatch(r'text-(.+)', name)
+    if match and color(match.group(1)):
+        return '', f'color:{color(match.group(1))}'
+    return None
+
+
+def _opacity(name):
+    match = re.fullmatch(r'opacity-(\d+)', name)
+    return ('', f'opacity:{int(match.group(1)) / 100:g}') if match else None
+
+
+def _shadow(name):
+    match = re.fullmatch(r'shadow(?:-(.+))?', name)
+    if not match or (match.group(1) or '') not in SHADOWS:
+        return None
+    return '', f'box-shadow:{SHADOWS[match.group(1) or ""]}'
+
+
+def _ring(name):
+    match = re.fullmatch(r'ring(?:-(\d+))?', name)
+    if match:
+        return '', f'box-shadow:0 0 0 {match.group(1) or 3}px var(--tw-ring-color,rgb(59 130 246/.5))'
+    match = re.fullmatch(r'ring-(.+)', name)
+    if match and color(match.group(1)):
+        return '', f'--tw-ring-color:{color(match.group(1))}'
+    return None
+
+
+def _scale(name):
+    match = re.fullmatch(r'scale-(\d+)', name)
+    if not match:
+        return None
+    scale = f'{int(match.group(1)) / 100:g}'
+    return '', f'--tw-scale-x:{scale};--tw-scale-y:{scale};{STATIC["transform"]}'
+
+
+RESOLVERS = [
+    _static, _position, _z_index, _margin, _sizing, _grid, _gap, _space, _divide, _rounded,
+    _border_width, _border_color, _background_color, _background_opacity, _background_image,
+    _gradient_from, _gradient_to, _padding, _font_size, _font_weight, _text_color, _opacity,
+    _shadow, _ring, _scale,
+]
+
+
+def escape(class_name):
+    return re.sub(r'([^A-Za-z0-9_-])', r'\\\1', class_name)
+
+
+def resolve(class_name):
+    """Return (media min-width, has variant, cascade rank, selector, declarations) or None"""
+    *variants, name = class_name.split(':')
+    if not name:
+        return None
+
+    media = None
+    pseudo = ''
+    prefix = ''
+    for variant in variants:
+        if variant in RESPONSIVE and media is None and not pseudo and not prefix:
+            media = RESPONSIVE[variant]
+        elif variant in PSEUDO_VARIANTS:
+            pseudo += PSEUDO_VARIANTS[variant]
+        elif variant.startswith('peer-') and variant[5:] in PSEUDO_VARIANTS:
+            prefix = f'.peer{PSEUDO_VARIANTS[variant[5:]]}~'
+        else:
+            return None
+
+    for rank, resolver in enumerate(RESOLVERS):
+        result = resolver(name)
+        if result is not None:
+            suffix, declarations = result
+            selector = f'{prefix}.{escape(class_name)}{pseudo}{suffix}'
+            # Static utilities keep their table order so e.g. hidden beats flex
+            order = (rank, list(STATIC).index(name) if name in STATIC else 0)
+            return (media or 0, bool(pseudo or prefix), order, selector, declarations)
+    return None
+
+
+def scan(texts):
+    """Every token in the given sources that names a known utility"""
+    classes = set()
+    for text in texts:
+        for token in set(CANDIDATE.findall(text)):
+            if resolve(token) is not None:
+                classes.add(token)
+    return classes
+
+
+def build_stylesheet(classes):
+    """Minified CSS for ``classes``: preflight, then utilities in cascade order"""
+    rules = sorted(
+        (resolve(name) for name in classes),
+        key=lambda rule: (rule[0], rule[1], rule[2], rule[3]),
+    )
+    chunks = [PREFLIGHT]
+    chunks += [KEYFRAMES[name] for name in sorted(classes) if name in KEYFRAMES]
+
+    current_media = 0
+    for media, _, _, selector, declarations in rules:
+        if media != current_media:
+            if current_media:
+                chunks.append('}')
+            chunks.append(f'@media (min-width:{media}px){{')
+            current_media = media
+        chunks.append(f'{selector}{{{declarations}}}')
+    if current_media:
+        chunks.append('}')
+    return ''.join(chunks)
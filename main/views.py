@@ -1,5 +1,11 @@
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse
 from django.shortcuts import render
 
+from .metrics import Metrics
+
 
 def landing(request):
     """Landing page with login/register/guest options"""
@@ -24,3 +30,18 @@ def about(request):
         ]
     }
     return render(request, 'main/about.html', context)
+
+
+def metrics(request):
+    """Prometheus scrape endpoint for `Authorization: Bearer <METRICS_TOKEN>` or staff
+
+    Open to everyone only under DEBUG with no token configured.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token:
+        allowed = hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+    else:
+        allowed = settings.DEBUG
+    if not (allowed or request.user.is_staff):
+        return HttpResponse('Unauthorized', status=401, content_type='text/plain')
+    return HttpResponse(Metrics().render(), content_type='text/plain; version=0.0.4; charset=utf-8')